@@ -0,0 +1,161 @@
+"""
+In-memory stand-in for the MinIO client, for benchmarks that must not need the network.
+
+`install()` replaces the methods of the shared `s3.minio_client.minio_client` that the
+services call with ones backed by a dict, so every module holding a reference to the
+client uses the fake. Presigned URLs are signed offline by the real client and need
+no replacement.
+"""
+import hashlib
+import threading
+import uuid
+from datetime import datetime, timezone
+from types import SimpleNamespace
+from typing import Dict, Tuple
+
+from minio.error import S3Error
+
+from s3.minio_client import minio_client
+
+
+class FakeResponse:
+    """The subset of the urllib3 response returned by `Minio.get_object` the services use."""
+
+    def __init__(self, data: bytes, content_type: str):
+        self.data = data
+        self.position = 0
+        self.headers = {"Content-Type": content_type, "Content-Length": str(len(data))}
+
+    def read(self, amt: int = None) -> bytes:
+        end = len(self.data) if amt is None else self.position + amt
+        chunk = self.data[self.position:end]
+        self.position += len(chunk)
+        return chunk
+
+    def stream(self, amt: int = 64 * 1024):
+        while chunk := self.read(amt):
+            yield chunk
+
+    def close(self) -> None:
+        pass
+
+    def release_conn(self) -> None:
+        pass
+
+
+class FakeMinio:
+    """A thread-safe in-memory object store with the MinIO client's call signatures."""
+
+    def __init__(self):
+        self.buckets = set()
+        self.objects: Dict[Tuple[str, str], Tuple[bytes, str, datetime]] = {}
+        self.multipart: Dict[str, Dict[int, bytes]] = {}
+        self.lock = threading.Lock()
+
+    def no_such_key(self, bucket_name: str, object_name: str) -> S3Error:
+        return S3Error("NoSuchKey", "Object does not exist", object_name, None, None, None)
+
+    def bucket_exists(self, bucket_name: str) -> bool:
+        return bucket_name in self.buckets
+
+    def make_bucket(self, bucket_name: str, *args, **kwargs) -> None:
+        self.buckets.add(bucket_name)
+
+    def put_object(self, bucket_name, object_name, data, length, content_type="application/octet-stream", **kwargs):
+        body = data.read(length) if length >= 0 else data.read()
+        with self.lock:
+            self.buckets.add(bucket_name)
+            self.objects[bucket_name, object_name] = (body, content_type, datetime.now(timezone.utc))
+        return SimpleNamespace(bucket_name=bucket_name, object_name=object_name, etag=None, version_id=None)
+
+    def get_object(self, bucket_name, object_name, offset=0, length=0, **kwargs) -> FakeResponse:
+        with self.lock:
+            entry = self.objects.get((bucket_name, object_name))
+        if entry is None:
+            raise self.no_such_key(bucket_name, object_name)
+        body, content_type, _ = entry
+        end = offset + length if length else len(body)
+        return FakeResponse(body[offset:end], content_type)
+
+    def stat_object(self, bucket_name, object_name, **kwargs):
+        with self.lock:
+            entry = self.objects.get((bucket_name, object_name))
+        if entry is None:
+            raise self.no_such_key(bucket_name, object_name)
+        body, content_type, modified = entry
+        return SimpleNamespace(
+            bucket_name=bucket_name, object_name=object_name, size=len(body),
+            content_type=content_type, last_modified=modified
+        )
+
+    def copy_object(self, bucket_name, object_name, source, metadata=None, **kwargs):
+        with self.lock:
+            entry = self.objects.get((source.bucket_name, source.object_name))
+            if entry is None:
+                raise self.no_such_key(source.bucket_name, source.object_name)
+            content_type = (metadata or {}).get("Content-Type", entry[1])
+            self.objects[bucket_name, object_name] = (entry[0], content_type, datetime.now(timezone.utc))
+
+    def remove_object(self, bucket_name, object_name, **kwargs) -> None:
+        with self.lock:
+            self.objects.pop((bucket_name, object_name), None)
+
+    def remove_objects(self, bucket_name, delete_object_list, **kwargs):
+        with self.lock:
+            for delete_object in delete_object_list:
+                self.objects.pop((bucket_name, delete_object._name), None)
+        return iter(())
+
+    def _create_multipart_upload(self, bucket_name, object_name, headers=None) -> str:
+        upload_id = uuid.uuid4().hex
+        with self.lock:
+            self.multipart[upload_id] = {}
+        return upload_id
+
+    def no_such_upload(self, object_name: str) -> S3Error:
+        return S3Error("NoSuchUpload", "Upload does not exist", object_name, None, None, None)
+
+    def _upload_part(self, bucket_name, object_name, data, headers, upload_id, part_number) -> str:
+        with self.lock:
+            if upload_id not in self.multipart:
+                raise self.no_such_upload(object_name)
+            self.multipart[upload_id][part_number] = bytes(data)
+        return hashlib.md5(data).hexdigest()
+
+    def _complete_multipart_upload(self, bucket_name, object_name, upload_id, parts):
+        with self.lock:
+            stored = self.multipart.pop(upload_id, None)
+            if stored is None:
+                raise self.no_such_upload(object_name)
+            body = b"".join(stored[part.part_number] for part in parts)
+            self.objects[bucket_name, object_name] = (body, "application/octet-stream", datetime.now(timezone.utc))
+        return SimpleNamespace(bucket_name=bucket_name, object_name=object_name, etag=None, version_id=None)
+
+    def _abort_multipart_upload(self, bucket_name, object_name, upload_id) -> None:
+        with self.lock:
+            if self.multipart.pop(upload_id, None) is None:
+                raise self.no_such_upload(object_name)
+
+    def list_objects(self, bucket_name, prefix=None, recursive=False, **kwargs):
+        with self.lock:
+            entries = sorted(
+                (name, body, modified) for (bucket, name), (body, _, modified) in self.objects.items()
+                if bucket == bucket_name and name.startswith(prefix or "")
+            )
+        for name, body, modified in entries:
+            yield SimpleNamespace(object_name=name, size=len(body), last_modified=modified, is_dir=False)
+
+
+PATCHED_METHODS = (
+    "bucket_exists", "make_bucket", "put_object", "get_object", "stat_object",
+    "copy_object", "remove_object", "remove_objects", "list_objects",
+    "_create_multipart_upload", "_upload_part", "_complete_multipart_upload", "_abort_multipart_upload",
+)
+
+
+def install() -> FakeMinio:
+    """Route all calls the services make on the shared MinIO client to a new in-memory store."""
+    fake = FakeMinio()
+    for name in PATCHED_METHODS:
+        setattr(minio_client, name, getattr(fake, name))
+    return fake
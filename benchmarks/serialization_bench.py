@@ -0,0 +1,66 @@
+"""
+Compare rows per second of the ORM + Pydantic list path and the tuple + orjson path.
+
+The old `read_memes` path validated every ORM instance through `List[MemeInfo]`
+and encoded the result with the stdlib JSON encoder. The fast path encodes the
+selected column tuples directly with orjson. Both produce the same JSON. The
+benchmark runs in memory on synthetic rows, so it measures serialization only.
+
+Usage:
+    PYTHONPATH=public_api/app python -m benchmarks.serialization_bench --rows 1000
+"""
+import argparse
+import json
+import time
+from datetime import datetime, timezone
+from typing import List
+
+from pydantic import TypeAdapter
+
+from db.models import Meme
+from db.schemas import MemeInfo
+from routes.serialization import MEME_FIELDS, dump_meme_rows
+
+meme_list_adapter = TypeAdapter(List[MemeInfo])
+
+
+def orm_path(memes: List[Meme]) -> bytes:
+    validated = meme_list_adapter.validate_python(memes, from_attributes=True)
+    return json.dumps(meme_list_adapter.dump_python(validated, mode="json")).encode()
+
+
+def tuple_path(rows: List[tuple]) -> bytes:
+    return dump_meme_rows(rows)
+
+
+def measure(func, data, repeat: int) -> float:
+    started = time.perf_counter()
+    for _ in range(repeat):
+        func(data)
+    return len(data) * repeat / (time.perf_counter() - started)
+
+
+def main(rows: int, repeat: int) -> None:
+    now = datetime.now(timezone.utc)
+    variants = {"thumb.webp": "http://memes/thumb.webp", "medium.webp": "http://memes/medium.webp"}
+    memes = [
+        Meme(id=i, title=f"Meme {i}", image_url=f"http://memes/{i}", description="Benchmark meme",
+             variants=variants, updated_at=now)
+        for i in range(rows)
+    ]
+    tuples = [tuple(getattr(meme, field) for field in MEME_FIELDS) for meme in memes]
+    assert json.loads(orm_path(memes)) == json.loads(tuple_path(tuples))
+
+    orm_rate = measure(orm_path, memes, repeat)
+    tuple_rate = measure(tuple_path, tuples, repeat)
+    print(f"ORM + Pydantic + json: {orm_rate:12.0f} rows/s")
+    print(f"tuples + orjson:       {tuple_rate:12.0f} rows/s")
+    print(f"speedup:               {tuple_rate / orm_rate:12.1f}x")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rows", type=int, default=1000)
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+    main(args.rows, args.repeat)
@@ -0,0 +1,32 @@
+"""
+Run the public or private API under uvicorn with the in-memory S3 stand-in.
+
+Used by `benchmarks.load_bench --target uvicorn` to measure the services over real
+HTTP without a MinIO server. The database is still taken from `DATABASE_URL`.
+
+Usage:
+    PYTHONPATH=public_api/app:private_api/app python -m benchmarks.serve public --port 8100
+"""
+import argparse
+
+import uvicorn
+
+from benchmarks import fake_s3
+
+
+def main(service: str, host: str, port: int) -> None:
+    fake_s3.install()
+    if service == "public":
+        from public_api.app.main import public_app as app
+    else:
+        from private_api.app.main import private_app as app
+    uvicorn.run(app, host=host, port=port, log_level="warning")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("service", choices=["public", "private"])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8100)
+    args = parser.parse_args()
+    main(args.service, args.host, args.port)
@@ -0,0 +1,93 @@
+"""
+Measure near-duplicate search latency and perceptual hash robustness.
+
+The benchmark fills a `HammingIndex` with `--size` random 64-bit hashes (one million
+by default), plants a few hashes a known number of bits away from the query, and
+times `--queries` searches, reporting p50/p99 latency and checking that exactly the
+planted hashes within `--max-distance` are found. It then renders `--images` random
+images, hashes each one and a resized, recompressed and slightly cropped copy, and
+prints the distances between copies next to those between unrelated images, which
+is what `SIMILARITY_DUPLICATE_DISTANCE` has to separate. No database is needed.
+
+Usage:
+    PYTHONPATH=private_api/app python -m benchmarks.similarity_bench --size 1000000
+"""
+import argparse
+import io
+import random
+import statistics
+import time
+
+import numpy as np
+from PIL import Image, ImageFilter
+
+from private_routes.similarity import HammingIndex, perceptual_hash
+
+
+def flip_bits(phash: int, count: int) -> int:
+    for bit in random.sample(range(64), count):
+        phash ^= 1 << bit
+    return phash
+
+
+def search_latency(size: int, queries: int, max_distance: int) -> None:
+    index = HammingIndex()
+    hashes = np.random.default_rng(1).integers(0, 2**64, size=size, dtype=np.uint64)
+    started = time.perf_counter()
+    index.add_many(np.arange(1, size + 1, dtype=np.int64), hashes, replace=False)
+    print(f"loaded {size} hashes in {(time.perf_counter() - started) * 1000:.1f} ms")
+
+    timings, misses = [], 0
+    for query in range(queries):
+        phash = random.getrandbits(64)
+        planted = {size + 1 + query * 3 + n: distance for n, distance in enumerate((0, max_distance, max_distance + 2))}
+        for meme_id, distance in planted.items():
+            index.add(meme_id, flip_bits(phash, distance))
+        started = time.perf_counter()
+        found = index.search(phash, max_distance, limit=10)
+        timings.append(time.perf_counter() - started)
+        expected = {meme_id for meme_id, distance in planted.items() if distance <= max_distance}
+        misses += not expected <= {meme_id for meme_id, _ in found}
+        index.remove(planted)
+
+    cuts = statistics.quantiles(timings, n=100)
+    print(f"search: p50 {cuts[49] * 1000:.2f} ms, p99 {cuts[98] * 1000:.2f} ms, {misses} queries missed a planted hash")
+
+
+def make_image(seed: int) -> Image.Image:
+    rng = np.random.default_rng(seed)
+    noise = rng.integers(0, 256, size=(24, 32, 3), dtype=np.uint8)
+    return Image.fromarray(noise).resize((640, 480), Image.Resampling.BICUBIC).filter(ImageFilter.GaussianBlur(4))
+
+
+def encode(image: Image.Image, format: str, **options) -> bytes:
+    buffer = io.BytesIO()
+    image.save(buffer, format=format, **options)
+    return buffer.getvalue()
+
+
+def robustness(images: int) -> None:
+    originals, copies = [], []
+    for seed in range(images):
+        image = make_image(seed)
+        width, height = image.size
+        copy = image.crop((width // 40, height // 40, width - width // 40, height - height // 40))
+        copy = copy.resize((width * 3 // 4, height * 3 // 4))
+        originals.append(perceptual_hash(encode(image, "PNG")))
+        copies.append(perceptual_hash(encode(copy, "JPEG", quality=50)))
+
+    same = [bin(a ^ b).count("1") for a, b in zip(originals, copies)]
+    different = [bin(a ^ b).count("1") for a, b in zip(originals, originals[1:] + originals[:1])]
+    print(f"copies: median {statistics.median(same)}, max {max(same)} bits apart")
+    print(f"unrelated images: median {statistics.median(different)}, min {min(different)} bits apart")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--size", type=int, default=1_000_000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--max-distance", type=int, default=10)
+    parser.add_argument("--images", type=int, default=100)
+    args = parser.parse_args()
+    search_latency(args.size, args.queries, args.max_distance)
+    robustness(args.images)
@@ -0,0 +1,65 @@
+"""
+Show that MinIO uploads overlap when offloaded to the storage thread pool.
+
+The benchmark uploads `--uploads` objects of `--size` bytes twice: once by calling
+the blocking `minio_client.put_object` directly inside a coroutine (the old
+handler behaviour) and once through `s3.storage.put_object`. With the blocking
+call the uploads run one after another; with the offload they overlap and the
+wall time approaches the time of a single upload.
+
+Usage:
+    MINIO_URL=localhost:9000 MINIO_BUCKET_NAME=test-memes \\
+        python -m benchmarks.upload_concurrency_bench --uploads 32 --size 1048576
+"""
+import argparse
+import asyncio
+import io
+import os
+import time
+
+from s3 import storage
+from s3.minio_client import minio_client
+
+BUCKET = os.getenv("MINIO_BUCKET_NAME", "test-memes")
+
+
+async def blocking_upload(name: str, payload: bytes) -> None:
+    minio_client.put_object(
+        bucket_name=BUCKET, object_name=name, data=io.BytesIO(payload), length=len(payload)
+    )
+
+
+async def offloaded_upload(name: str, payload: bytes) -> None:
+    await storage.put_object(
+        bucket_name=BUCKET, object_name=name, data=io.BytesIO(payload), length=len(payload)
+    )
+
+
+async def run(upload, uploads: int, payload: bytes, prefix: str) -> float:
+    started = time.perf_counter()
+    await asyncio.gather(*(upload(f"{prefix}-{i}", payload) for i in range(uploads)))
+    return time.perf_counter() - started
+
+
+async def main(uploads: int, size: int) -> None:
+    payload = os.urandom(size)
+    single = await run(offloaded_upload, 1, payload, "bench-single")
+    blocking = await run(blocking_upload, uploads, payload, "bench-blocking")
+    offloaded = await run(offloaded_upload, uploads, payload, "bench-offloaded")
+
+    print(f"single upload:          {single * 1000:10.1f} ms")
+    print(f"{uploads} blocking uploads:  {blocking * 1000:10.1f} ms")
+    print(f"{uploads} offloaded uploads: {offloaded * 1000:10.1f} ms")
+    print(f"speedup:                {blocking / offloaded:10.2f}x")
+
+    for prefix in ("bench-single", "bench-blocking", "bench-offloaded"):
+        for i in range(uploads):
+            minio_client.remove_object(BUCKET, f"{prefix}-{i}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--uploads", type=int, default=32)
+    parser.add_argument("--size", type=int, default=1024 * 1024)
+    args = parser.parse_args()
+    asyncio.run(main(args.uploads, args.size))
@@ -0,0 +1,43 @@
+"""
+Measure the throughput of the meme variant pipeline in images per second per core.
+
+The benchmark renders the variants of one image `--images` times on a process pool
+of `--workers` processes, exactly as the private API does on upload, and reports
+the total throughput and the throughput per worker.
+
+Usage:
+    PYTHONPATH=private_api/app python -m benchmarks.variants_bench --image tests/images/test.png
+"""
+import argparse
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from private_routes.variants import render_variants, supported_formats
+
+
+def main(image: str, images: int, workers: int) -> None:
+    with open(image, "rb") as file:
+        data = file.read()
+
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn")) as pool:
+        list(pool.map(render_variants, [data] * workers))
+
+        started = time.perf_counter()
+        list(pool.map(render_variants, [data] * images))
+        elapsed = time.perf_counter() - started
+
+    print(f"formats:        {', '.join(supported_formats())}")
+    print(f"images:         {images} in {elapsed:.2f} s on {workers} workers")
+    print(f"throughput:     {images / elapsed:.1f} images/s")
+    print(f"per core:       {images / elapsed / workers:.1f} images/s/core")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--image", default="tests/images/test.png")
+    parser.add_argument("--images", type=int, default=200)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    args = parser.parse_args()
+    main(args.image, args.images, args.workers)
@@ -0,0 +1,190 @@
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional
+
+try:
+    import redis.asyncio as redis
+except ImportError:
+    redis = None
+
+CLEAR_BATCH_SIZE = 1000
+
+
+class BaseCache:
+    """
+    Common interface and hit/miss accounting for cache backends.
+
+    Values are opaque bytes; the backends never look inside them. Counters are
+    kept apart from cached values so they are never evicted and reading them does
+    not count as a hit or a miss.
+    """
+
+    # Whether every process sees the same entries. Per-process caches are kept in step
+    # with other processes' writes through the change feed instead.
+    shared = False
+
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+
+    def record(self, value: Optional[bytes]) -> Optional[bytes]:
+        if value is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return value
+
+    async def get_many(self, *keys: str) -> List[Optional[bytes]]:
+        """Look up several keys at once; each one counts as a hit or a miss."""
+        return [await self.get(key) for key in keys]
+
+    async def set_many(self, items: Dict[str, bytes]) -> None:
+        for key, value in items.items():
+            await self.set(key, value)
+
+    async def get_counters(self, *keys: str) -> List[int]:
+        """Read several counters at once; missing counters are 0."""
+        return [await self.get_counter(key) for key in keys]
+
+    async def incr_many(self, *keys: str) -> None:
+        for key in keys:
+            await self.incr(key)
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "backend": type(self).__name__,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / total if total else 0.0,
+        }
+
+
+class MemoryCache(BaseCache):
+    """
+    In-process LRU cache with a per-entry time to live.
+
+    Entries only live in the current process, so writes made by another process
+    are not seen here; the public API drops the affected entries when the change
+    feed announces such a write. Use `RedisCache` to share entries between processes.
+    """
+
+    def __init__(self, maxsize: int = 10000, ttl: float = 60):
+        super().__init__()
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.entries = OrderedDict()
+        self.counters = {}
+
+    async def get(self, key: str) -> Optional[bytes]:
+        entry = self.entries.get(key)
+        if entry is not None and entry[0] < time.monotonic():
+            del self.entries[key]
+            entry = None
+        if entry is not None:
+            self.entries.move_to_end(key)
+        return self.record(entry[1] if entry else None)
+
+    async def set(self, key: str, value: bytes) -> None:
+        self.entries[key] = (time.monotonic() + self.ttl, value)
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.maxsize:
+            self.entries.popitem(last=False)
+
+    async def delete(self, *keys: str) -> None:
+        for key in keys:
+            self.entries.pop(key, None)
+
+    async def get_counter(self, key: str) -> int:
+        return self.counters.get(key, 0)
+
+    async def incr(self, key: str) -> int:
+        self.counters[key] = self.counters.get(key, 0) + 1
+        return self.counters[key]
+
+    async def clear(self) -> None:
+        self.entries.clear()
+        self.counters.clear()
+
+    async def close(self) -> None:
+        pass
+
+
+class RedisCache(BaseCache):
+    """
+    Cache backed by a Redis-compatible server shared between processes.
+
+    Any client exposing the `redis.asyncio.Redis` coroutine methods `get`, `mget`, `set`,
+    `delete`, `incr` and `aclose`, its `pipeline` and its `scan_iter` async iterator can
+    be passed in, e.g. a local stand-in in tests. All keys carry `prefix`, so the
+    database can be shared with other data.
+    """
+
+    shared = True
+
+    def __init__(self, client, ttl: float = 60, prefix: str = "memes-cache:"):
+        super().__init__()
+        self.client = client
+        self.ttl = ttl
+        self.prefix = prefix
+
+    @classmethod
+    def from_url(cls, url: str, **kwargs) -> "RedisCache":
+        if redis is None:
+            raise RuntimeError("The redis package is required for the redis cache backend")
+        return cls(redis.from_url(url), **kwargs)
+
+    async def get(self, key: str) -> Optional[bytes]:
+        return self.record(await self.client.get(self.prefix + key))
+
+    async def set(self, key: str, value: bytes) -> None:
+        await self.client.set(self.prefix + key, value, ex=int(self.ttl))
+
+    async def get_many(self, *keys: str) -> List[Optional[bytes]]:
+        if not keys:
+            return []
+        values = await self.client.mget([self.prefix + key for key in keys])
+        return [self.record(value) for value in values]
+
+    async def set_many(self, items: Dict[str, bytes]) -> None:
+        if items:
+            async with self.client.pipeline(transaction=False) as pipeline:
+                for key, value in items.items():
+                    pipeline.set(self.prefix + key, value, ex=int(self.ttl))
+                await pipeline.execute()
+
+    async def delete(self, *keys: str) -> None:
+        if keys:
+            await self.client.delete(*(self.prefix + key for key in keys))
+
+    async def get_counter(self, key: str) -> int:
+        return int(await self.client.get(self.prefix + key) or 0)
+
+    async def incr(self, key: str) -> int:
+        return await self.client.incr(self.prefix + key)
+
+    async def get_counters(self, *keys: str) -> List[int]:
+        if not keys:
+            return []
+        return [int(value or 0) for value in await self.client.mget([self.prefix + key for key in keys])]
+
+    async def incr_many(self, *keys: str) -> None:
+        if keys:
+            async with self.client.pipeline(transaction=False) as pipeline:
+                for key in keys:
+                    pipeline.incr(self.prefix + key)
+                await pipeline.execute()
+
+    async def clear(self) -> None:
+        """Delete the keys of this cache only, in batches, leaving the rest of the database alone."""
+        keys = []
+        async for key in self.client.scan_iter(match=self.prefix + "*", count=CLEAR_BATCH_SIZE):
+            keys.append(key)
+            if len(keys) >= CLEAR_BATCH_SIZE:
+                await self.client.delete(*keys)
+                keys = []
+        if keys:
+            await self.client.delete(*keys)
+
+    async def close(self) -> None:
+        await self.client.aclose()
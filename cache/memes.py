@@ -0,0 +1,136 @@
+import asyncio
+import json
+import logging
+import os
+from typing import Iterable, List, Optional, Set, Tuple
+
+from cache.backends import MemoryCache, RedisCache
+from db.changes import RESYNC
+from db.config import settings
+from db.dependencies import REPLICA_URLS
+
+CACHE_BACKEND = os.getenv("CACHE_BACKEND", "memory")
+CACHE_URL = os.getenv("CACHE_URL", "redis://redis:6379/0")
+CACHE_TTL = float(os.getenv("CACHE_TTL", "60"))
+CACHE_MAXSIZE = int(os.getenv("CACHE_MAXSIZE", "10000"))
+
+LIST_GENERATION_KEY = "memes:list:generation"
+
+# With read replicas, a cache miss right after a write may be served by a replica that
+# has not replayed the write yet and cache the old row. Replicas lagging more than
+# DB_REPLICA_MAX_LAG seconds are out of rotation, so invalidating again after that long
+# drops such entries; cached data is at most that much older than a write.
+REINVALIDATE_DELAY = settings.DB_REPLICA_MAX_LAG if REPLICA_URLS else 0
+
+logger = logging.getLogger(__name__)
+
+# Delayed invalidations that have not run yet.
+pending_invalidations: Set[asyncio.Task] = set()
+
+
+def build_cache():
+    if CACHE_BACKEND == "redis":
+        return RedisCache.from_url(CACHE_URL, ttl=CACHE_TTL)
+    return MemoryCache(maxsize=CACHE_MAXSIZE, ttl=CACHE_TTL)
+
+
+meme_cache = build_cache()
+
+
+def meme_version_key(meme_id: int) -> str:
+    return f"memes:item-version:{meme_id}"
+
+
+async def meme_keys(*meme_ids: int) -> List[str]:
+    """
+    Build the cache keys of memes with one counter lookup.
+
+    Each key embeds the meme's version, a counter bumped on every write to the meme.
+    A reader that loaded the row before a write and fills the cache after it stores
+    the stale row under the old version's key, which no reader asks for any more, so
+    the entry cannot outlive the write.
+    """
+    versions = await meme_cache.get_counters(*(meme_version_key(meme_id) for meme_id in meme_ids))
+    return [f"memes:item:{meme_id}:{version}" for meme_id, version in zip(meme_ids, versions)]
+
+
+async def meme_key(meme_id: int) -> str:
+    """Build the cache key of a meme, see `meme_keys`."""
+    return (await meme_keys(meme_id))[0]
+
+
+async def list_key(**params) -> str:
+    """
+    Build the cache key of a list page.
+
+    The key embeds the current list generation, so bumping the generation on
+    every write makes all previously cached pages unreachable at once.
+    """
+    generation = await meme_cache.get_counter(LIST_GENERATION_KEY)
+    query = "&".join(f"{name}={value}" for name, value in sorted(params.items()))
+    return f"memes:list:{generation}:{query}"
+
+
+def pack(headers: dict, body: bytes) -> bytes:
+    """Serialize response headers and a JSON body into a single cache value."""
+    return json.dumps(headers).encode() + b"\n" + body
+
+
+def unpack(value: bytes) -> Tuple[dict, bytes]:
+    """Split a cache value produced by `pack` back into headers and body."""
+    headers, body = value.split(b"\n", 1)
+    return json.loads(headers), body
+
+
+async def invalidate_later(keys: List[str]) -> None:
+    await asyncio.sleep(REINVALIDATE_DELAY)
+    try:
+        await meme_cache.incr_many(*keys)
+    except Exception:
+        logger.warning("Failed to invalidate the meme cache again after a write", exc_info=True)
+
+
+async def invalidate(keys: List[str]) -> None:
+    """Bump the given versions and, with read replicas, bump them again once replicas have caught up."""
+    await meme_cache.incr_many(*keys)
+    if REINVALIDATE_DELAY:
+        task = asyncio.create_task(invalidate_later(keys))
+        pending_invalidations.add(task)
+        task.add_done_callback(pending_invalidations.discard)
+
+
+async def invalidate_meme(meme_id: Optional[int] = None) -> None:
+    """
+    Drop cached data made stale by a write.
+
+    Args:
+        meme_id (int, optional): The ID of the created, updated or deleted meme.
+    """
+    await invalidate(([] if meme_id is None else [meme_version_key(meme_id)]) + [LIST_GENERATION_KEY])
+
+
+async def invalidate_memes(meme_ids: Iterable[int]) -> None:
+    """
+    Drop cached data made stale by a bulk write.
+
+    Args:
+        meme_ids (Iterable[int]): The IDs of the written memes.
+    """
+    await invalidate([meme_version_key(meme_id) for meme_id in meme_ids] + [LIST_GENERATION_KEY])
+
+
+async def apply_change(change: dict) -> None:
+    """
+    Drop cached data made stale by a write announced on the change feed.
+
+    Writes made by other processes, e.g. the private API or another worker, never
+    touch a per-process cache directly; this handler applies them instead. After a
+    `resync` the whole cache is dropped, since announcements may have been missed.
+
+    Args:
+        change (dict): The decoded notification, `{"event": ..., "id": ...}`.
+    """
+    if change.get("event") == RESYNC:
+        await meme_cache.clear()
+    else:
+        await invalidate_meme(change.get("id"))
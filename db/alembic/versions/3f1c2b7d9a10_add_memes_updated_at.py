@@ -0,0 +1,26 @@
+"""Add memes.updated_at
+
+Revision ID: 3f1c2b7d9a10
+Revises: ec4e5a2ba837
+Create Date: 2026-10-17 10:12:41.208355
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3f1c2b7d9a10'
+down_revision: Union[str, None] = 'ec4e5a2ba837'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('memes', sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False))
+
+
+def downgrade() -> None:
+    op.drop_column('memes', 'updated_at')
@@ -0,0 +1,26 @@
+"""Add memes.variants
+
+Revision ID: 8b4e0c51f2d7
+Revises: 3f1c2b7d9a10
+Create Date: 2026-10-17 11:02:17.530164
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8b4e0c51f2d7'
+down_revision: Union[str, None] = '3f1c2b7d9a10'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('memes', sa.Column('variants', sa.JSON(), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column('memes', 'variants')
@@ -0,0 +1,26 @@
+"""Add perceptual hash to memes
+
+Revision ID: a9d4e6b1c352
+Revises: f3b9d2a7c614
+Create Date: 2026-10-17 17:42:18.903514
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a9d4e6b1c352'
+down_revision: Union[str, None] = 'f3b9d2a7c614'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('memes', sa.Column('phash', sa.BigInteger(), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column('memes', 'phash')
@@ -0,0 +1,46 @@
+"""Add resumable upload state
+
+Revision ID: b2e7c9f4d806
+Revises: a9d4e6b1c352
+Create Date: 2026-10-17 19:05:37.118642
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b2e7c9f4d806'
+down_revision: Union[str, None] = 'a9d4e6b1c352'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('resumable_uploads',
+    sa.Column('id', sa.String(), nullable=False),
+    sa.Column('bucket', sa.String(), nullable=False),
+    sa.Column('s3_upload_id', sa.String(), nullable=False),
+    sa.Column('size', sa.BigInteger(), nullable=False),
+    sa.Column('chunk_size', sa.Integer(), nullable=False),
+    sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+    sa.Column('expires_at', sa.DateTime(timezone=True), nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_resumable_uploads_expires_at'), 'resumable_uploads', ['expires_at'], unique=False)
+    op.create_table('resumable_upload_parts',
+    sa.Column('upload_id', sa.String(), nullable=False),
+    sa.Column('part_number', sa.Integer(), nullable=False),
+    sa.Column('etag', sa.String(), nullable=False),
+    sa.Column('size', sa.BigInteger(), nullable=False),
+    sa.ForeignKeyConstraint(['upload_id'], ['resumable_uploads.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('upload_id', 'part_number')
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('resumable_upload_parts')
+    op.drop_index(op.f('ix_resumable_uploads_expires_at'), table_name='resumable_uploads')
+    op.drop_table('resumable_uploads')
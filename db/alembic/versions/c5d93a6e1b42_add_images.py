@@ -0,0 +1,31 @@
+"""Add content-addressed images
+
+Revision ID: c5d93a6e1b42
+Revises: 8b4e0c51f2d7
+Create Date: 2026-10-17 11:48:03.917224
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c5d93a6e1b42'
+down_revision: Union[str, None] = '8b4e0c51f2d7'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('images',
+    sa.Column('object_name', sa.String(), nullable=False),
+    sa.Column('refcount', sa.Integer(), nullable=False),
+    sa.Column('variants', sa.JSON(), nullable=True),
+    sa.PrimaryKeyConstraint('object_name')
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('images')
@@ -0,0 +1,37 @@
+"""Add full-text and trigram search on memes
+
+Revision ID: e7a2f4c8d031
+Revises: c5d93a6e1b42
+Create Date: 2026-10-17 12:31:55.604187
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e7a2f4c8d031'
+down_revision: Union[str, None] = 'c5d93a6e1b42'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    op.add_column('memes', sa.Column(
+        'search_vector',
+        postgresql.TSVECTOR(),
+        sa.Computed("to_tsvector('simple', coalesce(title, '') || ' ' || coalesce(description, ''))", persisted=True),
+        nullable=True
+    ))
+    op.create_index('ix_memes_search_vector', 'memes', ['search_vector'], unique=False, postgresql_using='gin')
+    op.create_index('ix_memes_title_trgm', 'memes', ['title'], unique=False, postgresql_using='gin', postgresql_ops={'title': 'gin_trgm_ops'})
+
+
+def downgrade() -> None:
+    op.drop_index('ix_memes_title_trgm', table_name='memes', postgresql_using='gin')
+    op.drop_index('ix_memes_search_vector', table_name='memes', postgresql_using='gin')
+    op.drop_column('memes', 'search_vector')
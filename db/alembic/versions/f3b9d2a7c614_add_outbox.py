@@ -0,0 +1,39 @@
+"""Add outbox for S3 side effects
+
+Revision ID: f3b9d2a7c614
+Revises: e7a2f4c8d031
+Create Date: 2026-10-17 15:06:41.278390
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f3b9d2a7c614'
+down_revision: Union[str, None] = 'e7a2f4c8d031'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('outbox',
+    sa.Column('id', sa.BigInteger(), nullable=False),
+    sa.Column('action', sa.String(), nullable=False),
+    sa.Column('bucket', sa.String(), nullable=False),
+    sa.Column('object_name', sa.String(), nullable=False),
+    sa.Column('attempts', sa.Integer(), nullable=False),
+    sa.Column('available_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+    sa.Column('last_error', sa.String(), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_outbox_available_at'), 'outbox', ['available_at'], unique=False)
+    op.create_index(op.f('ix_outbox_object_name'), 'outbox', ['object_name'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_outbox_object_name'), table_name='outbox')
+    op.drop_index(op.f('ix_outbox_available_at'), table_name='outbox')
+    op.drop_table('outbox')
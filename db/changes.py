@@ -0,0 +1,35 @@
+import json
+from typing import Iterable
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+MEME_CHANGES_CHANNEL = "meme_changes"
+
+CREATED = "created"
+UPDATED = "updated"
+DELETED = "deleted"
+# Not sent by writers: listeners announce it after (re)connecting, since changes made
+# while they were not listening were missed.
+RESYNC = "resync"
+
+
+async def notify_meme_changes(session: AsyncSession, event: str, meme_ids: Iterable[int]) -> None:
+    """
+    Announce changed memes on the `meme_changes` channel with `pg_notify`.
+
+    Notifications are transactional: Postgres delivers them to listeners only when the
+    session commits, so subscribers never hear about a change that was rolled back.
+    All IDs are sent with one statement, one notification per meme.
+
+    Args:
+        session (AsyncSession): The database session making the change; the caller commits it.
+        event (str): The kind of change: `created`, `updated` or `deleted`.
+        meme_ids (Iterable[int]): The IDs of the changed memes.
+    """
+    payloads = [json.dumps({"event": event, "id": meme_id}) for meme_id in meme_ids]
+    if payloads:
+        await session.execute(
+            text("SELECT pg_notify(:channel, payload) FROM unnest(CAST(:payloads AS text[])) AS payload"),
+            {"channel": MEME_CHANGES_CHANNEL, "payloads": payloads}
+        )
@@ -1,6 +1,36 @@
+import math
+from typing import List, Optional
+from pydantic import model_validator
 from pydantic_settings import BaseSettings
 
 class Settings(BaseSettings):
     DATABASE_URL: str = "postgresql+asyncpg://root:root@pg_db:5432/my_db"
+    DATABASE_READ_URL: Optional[str] = None
+    DATABASE_REPLICA_URLS: List[str] = []
+    DB_REPLICA_HEALTH_INTERVAL: float = 5
+    DB_REPLICA_HEALTH_TIMEOUT: float = 1
+    DB_REPLICA_MAX_LAG: float = 5
+    DB_READ_YOUR_WRITES_WINDOW: float = 0
+
+    DB_ECHO: bool = False
+    # Gunicorn runs WEB_CONCURRENCY processes per API, each with its own pools, so
+    # unless set explicitly the pool size and overflow are split between them.
+    WEB_CONCURRENCY: int = 1
+    DB_POOL_SIZE: Optional[int] = None
+    DB_MAX_OVERFLOW: Optional[int] = None
+    DB_POOL_TIMEOUT: float = 30
+    DB_POOL_RECYCLE: int = 1800
+    DB_POOL_PRE_PING: bool = True
+    DB_STATEMENT_CACHE_SIZE: int = 100
+
+    @model_validator(mode="after")
+    def split_pool_between_workers(self) -> "Settings":
+        """Default to 5 pooled and 10 overflow connections per engine and API, shared by its workers."""
+        workers = max(1, self.WEB_CONCURRENCY)
+        if self.DB_POOL_SIZE is None:
+            self.DB_POOL_SIZE = math.ceil(5 / workers)
+        if self.DB_MAX_OVERFLOW is None:
+            self.DB_MAX_OVERFLOW = math.ceil(10 / workers)
+        return self
 
 settings = Settings()
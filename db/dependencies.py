@@ -1,12 +1,66 @@
-from sqlalchemy import MetaData
-from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+import asyncio
+import logging
+from contextlib import AsyncExitStack
+from fastapi import Request
+from sqlalchemy import MetaData, text
+from sqlalchemy.engine import make_url
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, create_async_engine
 from sqlalchemy.orm import sessionmaker
-from typing import AsyncGenerator
+from functools import partial
+from typing import AsyncGenerator, Callable
 from db.config import settings
+from db.routing import LAST_WRITE_COOKIE, ReplicaRouter
+from metrics.database import TimedQueuePool, instrument_engine
+
+logger = logging.getLogger(__name__)
 
 DATABASE_URL = settings.DATABASE_URL
+REPLICA_URLS = settings.DATABASE_REPLICA_URLS or [
+    url for url in [settings.DATABASE_READ_URL] if url and url != DATABASE_URL
+]
+
+def build_engine(url: str) -> AsyncEngine:
+    """
+    Create an async engine with the pool and statement cache settings from `db.config`.
+
+    With the asyncpg driver, the statement cache size applies to both asyncpg's own
+    cache and SQLAlchemy's prepared statement cache; set `DB_STATEMENT_CACHE_SIZE=0`
+    when connecting through pgbouncer in transaction pooling mode. Other drivers do
+    not accept these options and get none. Statement timings and pool checkout waits
+    are recorded in the process metrics.
+    """
+    url = make_url(url)
+    connect_args = {}
+    if url.get_driver_name() == "asyncpg":
+        url = url.update_query_dict(
+            {"prepared_statement_cache_size": str(settings.DB_STATEMENT_CACHE_SIZE)}
+        )
+        connect_args["statement_cache_size"] = settings.DB_STATEMENT_CACHE_SIZE
+    engine = create_async_engine(
+        url,
+        echo=settings.DB_ECHO,
+        poolclass=TimedQueuePool,
+        pool_size=settings.DB_POOL_SIZE,
+        max_overflow=settings.DB_MAX_OVERFLOW,
+        pool_timeout=settings.DB_POOL_TIMEOUT,
+        pool_recycle=settings.DB_POOL_RECYCLE,
+        pool_pre_ping=settings.DB_POOL_PRE_PING,
+        connect_args=connect_args,
+    )
+    instrument_engine(engine)
+    return engine
 
-engine = create_async_engine(DATABASE_URL, echo=True)
+engine = build_engine(DATABASE_URL)
+
+replica_router = ReplicaRouter(
+    primary=engine,
+    replicas=[build_engine(url) for url in REPLICA_URLS],
+    health_interval=settings.DB_REPLICA_HEALTH_INTERVAL,
+    health_timeout=settings.DB_REPLICA_HEALTH_TIMEOUT,
+    max_lag=settings.DB_REPLICA_MAX_LAG,
+    read_your_writes_window=settings.DB_READ_YOUR_WRITES_WINDOW
+)
 
 metadata = MetaData()
 
@@ -18,4 +72,82 @@ async_session = sessionmaker(
 
 async def get_session() -> AsyncGenerator[AsyncSession, None]:
     async with async_session() as session:
-        yield session
\ No newline at end of file
+        yield session
+
+async def get_read_session(request: Request) -> AsyncGenerator[AsyncSession, None]:
+    """
+    Provide a read-only session on a healthy replica, failing over to the primary.
+
+    When replicas are configured, a connection is acquired up front so that an
+    unreachable replica is detected, taken out of rotation and replaced before the
+    handler runs. Clients that wrote through the private API within the
+    read-your-writes window read from the primary.
+    """
+    candidates = await replica_router.candidates(request.cookies.get(LAST_WRITE_COOKIE))
+    if candidates == [engine]:
+        async with async_session() as session:
+            yield session
+        return
+
+    for read_engine in candidates:
+        session = async_session(bind=read_engine)
+        try:
+            await session.connection()
+        except (DBAPIError, OSError, TimeoutError):
+            await session.close()
+            if read_engine is engine:
+                raise
+            replica_router.mark_failed(read_engine)
+            continue
+        async with session:
+            yield session
+        return
+
+async def get_read_sessionmaker(request: Request) -> Callable[[], AsyncSession]:
+    """
+    Provide a factory of read-only sessions bound to the engine chosen for this request.
+
+    Streaming responses outlive the request's dependencies, so they open their own
+    session from this factory inside the response body generator. As in
+    `get_read_session`, a replica is only chosen after a connection to it was
+    acquired, and unreachable replicas are taken out of rotation and skipped.
+    """
+    candidates = await replica_router.candidates(request.cookies.get(LAST_WRITE_COOKIE))
+    for read_engine in candidates:
+        if read_engine is engine:
+            break
+        try:
+            async with read_engine.connect():
+                pass
+        except (DBAPIError, OSError, TimeoutError):
+            replica_router.mark_failed(read_engine)
+            continue
+        return partial(async_session, bind=read_engine)
+    return async_session
+
+async def warm_up_engines(connections: int = settings.DB_POOL_SIZE) -> None:
+    """
+    Fill the connection pools of the primary and the replicas ahead of the first request.
+
+    `connections` connections per engine are opened at the same time, checked with
+    `SELECT 1` and returned to the pool, so the first requests do not pay for
+    connecting. This is best effort: an unreachable database is logged and left to be
+    connected lazily, and an unreachable replica is taken out of rotation.
+    """
+    async def warm_up(read_engine: AsyncEngine) -> None:
+        try:
+            async with AsyncExitStack() as stack:
+                opened = await asyncio.gather(*(
+                    stack.enter_async_context(read_engine.connect()) for _ in range(connections)
+                ))
+                await asyncio.gather(*(conn.execute(text("SELECT 1")) for conn in opened))
+        except (DBAPIError, OSError, TimeoutError):
+            logger.warning("Could not warm up connections to %s", read_engine.url.render_as_string())
+            if read_engine is not engine:
+                replica_router.mark_failed(read_engine)
+
+    await asyncio.gather(*(warm_up(read_engine) for read_engine in [engine, *replica_router.replicas]))
+
+async def dispose_engines() -> None:
+    """Close all pooled connections of the primary and the replicas."""
+    await asyncio.gather(*(read_engine.dispose() for read_engine in [engine, *replica_router.replicas]))
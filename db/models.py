@@ -1,12 +1,67 @@
-from sqlalchemy.orm import declarative_base
-from sqlalchemy import Column, Integer, String 
+from sqlalchemy.orm import declarative_base, deferred
+from sqlalchemy import DDL, JSON, BigInteger, Column, Computed, DateTime, ForeignKey, Index, Integer, String, event, func
+from sqlalchemy.dialects.postgresql import TSVECTOR
 
 Base = declarative_base()
 
+event.listen(Base.metadata, "before_create", DDL("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
+
 class Meme(Base):
     __tablename__ = "memes"
+    __table_args__ = (
+        Index("ix_memes_search_vector", "search_vector", postgresql_using="gin"),
+        Index("ix_memes_title_trgm", "title", postgresql_using="gin", postgresql_ops={"title": "gin_trgm_ops"}),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     title = Column(String, index=True)
     image_url = Column(String)
     description = Column(String)
+    variants = Column(JSON)
+    phash = Column(BigInteger)
+    updated_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now(), onupdate=func.now())
+    search_vector = deferred(Column(
+        TSVECTOR,
+        Computed("to_tsvector('simple', coalesce(title, '') || ' ' || coalesce(description, ''))", persisted=True)
+    ))
+
+
+class StoredImage(Base):
+    __tablename__ = "images"
+
+    object_name = Column(String, primary_key=True)
+    refcount = Column(Integer, nullable=False, default=0)
+    variants = Column(JSON)
+
+
+class OutboxEvent(Base):
+    __tablename__ = "outbox"
+
+    id = Column(BigInteger, primary_key=True)
+    action = Column(String, nullable=False, default="remove_object")
+    bucket = Column(String, nullable=False)
+    object_name = Column(String, nullable=False, index=True)
+    attempts = Column(Integer, nullable=False, default=0)
+    available_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now(), index=True)
+    last_error = Column(String)
+
+
+class ResumableUpload(Base):
+    __tablename__ = "resumable_uploads"
+
+    id = Column(String, primary_key=True)
+    bucket = Column(String, nullable=False)
+    s3_upload_id = Column(String, nullable=False)
+    size = Column(BigInteger, nullable=False)
+    chunk_size = Column(Integer, nullable=False)
+    created_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now())
+    expires_at = Column(DateTime(timezone=True), nullable=False, index=True)
+
+
+class ResumableUploadPart(Base):
+    __tablename__ = "resumable_upload_parts"
+
+    upload_id = Column(String, ForeignKey("resumable_uploads.id", ondelete="CASCADE"), primary_key=True)
+    part_number = Column(Integer, primary_key=True)
+    etag = Column(String, nullable=False)
+    size = Column(BigInteger, nullable=False)
@@ -0,0 +1,113 @@
+import asyncio
+import itertools
+import logging
+import time
+from typing import List, Optional
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+LAST_WRITE_COOKIE = "last_write"
+
+# Seconds the replica's replayed data is behind the primary: 0 when it has replayed all
+# the WAL it received (also on an idle primary, where the last replay time grows old)
+# and on a server that is not a replica at all.
+REPLICATION_LAG_QUERY = text("""
+    SELECT CASE
+        WHEN NOT pg_is_in_recovery() OR pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+        ELSE coalesce(extract(epoch FROM now() - pg_last_xact_replay_timestamp()), 0)
+    END
+""")
+
+logger = logging.getLogger(__name__)
+
+
+class ReplicaRouter:
+    """
+    Route read-only sessions to healthy read replicas, falling back to the primary.
+
+    Replicas are checked at most once per `health_interval` seconds, lazily on the read
+    path. A replica that fails a check or a connection attempt, or lags more than
+    `max_lag` seconds behind the primary, is taken out of rotation until a later check
+    finds it alive and caught up again. When no replica is healthy, reads go to the
+    primary. Reads from replicas are therefore at most about `max_lag` seconds stale.
+    """
+
+    def __init__(
+        self,
+        primary: AsyncEngine,
+        replicas: List[AsyncEngine],
+        health_interval: float = 5,
+        health_timeout: float = 1,
+        max_lag: float = 5,
+        read_your_writes_window: float = 0
+    ):
+        self.primary = primary
+        self.replicas = replicas
+        self.healthy = list(replicas)
+        self.health_interval = health_interval
+        self.health_timeout = health_timeout
+        self.max_lag = max_lag
+        self.read_your_writes_window = read_your_writes_window
+        self.checked_at = time.monotonic()
+        self.counter = itertools.count()
+        self.lock = asyncio.Lock()
+
+    async def ping(self, engine: AsyncEngine) -> bool:
+        """Check that a replica answers and lags at most `max_lag` seconds behind."""
+        try:
+            async with asyncio.timeout(self.health_timeout):
+                async with engine.connect() as conn:
+                    lag = (await conn.execute(REPLICATION_LAG_QUERY)).scalar()
+        except Exception:
+            logger.warning("Read replica %s failed its health check", engine.url.render_as_string())
+            return False
+        if lag > self.max_lag:
+            logger.warning("Read replica %s lags %.1f s behind the primary", engine.url.render_as_string(), lag)
+            return False
+        return True
+
+    async def check_health(self) -> None:
+        """Ping every replica and rebuild the list of healthy ones."""
+        async with self.lock:
+            if time.monotonic() - self.checked_at < self.health_interval:
+                return
+            results = await asyncio.gather(*(self.ping(replica) for replica in self.replicas))
+            self.healthy = [replica for replica, alive in zip(self.replicas, results) if alive]
+            self.checked_at = time.monotonic()
+
+    def mark_failed(self, engine: AsyncEngine) -> None:
+        """Take a replica out of rotation until the next successful health check."""
+        if engine in self.healthy:
+            self.healthy.remove(engine)
+
+    def recently_wrote(self, last_write: Optional[str]) -> bool:
+        """Check whether a client's last write falls inside the read-your-writes window."""
+        if not self.read_your_writes_window or not last_write:
+            return False
+        try:
+            return time.time() - float(last_write) < self.read_your_writes_window
+        except ValueError:
+            return False
+
+    async def candidates(self, last_write: Optional[str] = None) -> List[AsyncEngine]:
+        """
+        Return the engines to try for a read, in order of preference.
+
+        Args:
+            last_write (str, optional): The client's last write timestamp, from the
+                `last_write` cookie set by the private API.
+
+        Returns:
+            List[AsyncEngine]: A healthy replica chosen round-robin followed by the primary,
+            or only the primary if there is no healthy replica or the client wrote recently.
+        """
+        if not self.replicas or self.recently_wrote(last_write):
+            return [self.primary]
+        if time.monotonic() - self.checked_at >= self.health_interval:
+            await self.check_health()
+        if not self.healthy:
+            return [self.primary]
+        start = next(self.counter)
+        ordered = [self.healthy[(start + i) % len(self.healthy)] for i in range(len(self.healthy))]
+        return ordered + [self.primary]
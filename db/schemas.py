@@ -1,4 +1,10 @@
-from pydantic import BaseModel, ConfigDict
+from datetime import datetime
+from typing import Annotated, Dict, List, Optional
+from pydantic import BaseModel, ConfigDict, Field
+
+# Bulk deletes are one statement; cap the IN list and keep IDs within the INTEGER id column.
+BULK_DELETE_MAX_IDS = 1000
+MemeId = Annotated[int, Field(ge=1, le=2 ** 31 - 1)]
 
 class MemeBase(BaseModel):
     title: str
@@ -8,6 +14,50 @@ class MemeBase(BaseModel):
 
 class MemeInfo(MemeBase):
     id: int
+    variants: Optional[Dict[str, str]] = None
     
     class ConfigDict:
         from_attributes = True
+
+
+class MemeBatchItem(BaseModel):
+    index: int
+    status: int
+    meme: Optional[MemeInfo] = None
+    detail: Optional[str] = None
+
+
+class MemeSimilar(BaseModel):
+    meme: MemeInfo
+    distance: int
+
+
+class MemeBatchRead(BaseModel):
+    memes: List[MemeInfo]
+    missing: List[int]
+
+
+class MemeBulkDelete(BaseModel):
+    ids: Optional[List[MemeId]] = Field(None, max_length=BULK_DELETE_MAX_IDS)
+    title: Optional[str] = None
+
+
+class MemeBulkDeleteResult(BaseModel):
+    deleted: List[int]
+    queued_objects: List[str]
+
+
+
+class MemeUpload(BaseModel):
+    upload_id: str
+    url: str
+    expires_at: datetime
+
+
+class ResumableUploadInfo(BaseModel):
+    upload_id: str
+    size: int
+    chunk_size: int
+    parts: int
+    received_parts: List[int]
+    expires_at: datetime
@@ -0,0 +1,71 @@
+from typing import Dict
+
+from prometheus_client import REGISTRY, Counter, Gauge, Histogram
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily
+
+HTTP_REQUEST_DURATION = Histogram(
+    "http_request_duration_seconds",
+    "Time spent handling HTTP requests, until the response body is sent.",
+    ["app", "method", "route", "status"]
+)
+DB_QUERY_DURATION = Histogram(
+    "db_query_duration_seconds",
+    "Time spent executing SQL statements, by statement type.",
+    ["statement"]
+)
+DB_POOL_CHECKOUT_DURATION = Histogram(
+    "db_pool_checkout_duration_seconds",
+    "Time spent waiting for a connection from the engine pool, including connecting."
+)
+MINIO_REQUEST_DURATION = Histogram(
+    "minio_request_duration_seconds",
+    "Time spent in MinIO calls, including waiting for an I/O thread.",
+    ["operation"]
+)
+MINIO_BYTES = Counter(
+    "minio_bytes",
+    "Object bytes sent to or received from MinIO.",
+    ["direction"]
+)
+IMAGE_VERIFY_DURATION = Histogram(
+    "image_verify_duration_seconds",
+    "Time spent verifying uploaded images, including waiting for a pool worker."
+)
+FEED_SUBSCRIBERS = Gauge(
+    "feed_subscribers",
+    "Clients connected to the change feed.",
+    multiprocess_mode="livesum"
+)
+FEED_EVICTIONS = Counter(
+    "feed_evictions",
+    "Change feed clients disconnected for falling too far behind."
+)
+
+
+class CacheCollector:
+    """Expose the hit and miss counters the cache backends keep, read at scrape time."""
+
+    def __init__(self):
+        self.caches: Dict[str, object] = {}
+
+    def collect(self):
+        hits = CounterMetricFamily("cache_hits", "Cache lookups that found a value.", labels=["cache"])
+        misses = CounterMetricFamily("cache_misses", "Cache lookups that found nothing.", labels=["cache"])
+        ratio = GaugeMetricFamily("cache_hit_ratio", "Share of cache lookups that found a value.", labels=["cache"])
+        for name, cache in self.caches.items():
+            stats = cache.stats()
+            hits.add_metric([name], stats["hits"])
+            misses.add_metric([name], stats["misses"])
+            ratio.add_metric([name], stats["hit_ratio"])
+        yield hits
+        yield misses
+        yield ratio
+
+
+cache_collector = CacheCollector()
+REGISTRY.register(cache_collector)
+
+
+def register_cache(name: str, cache) -> None:
+    """Export the hit/miss counters of a `cache.backends` cache under the given name."""
+    cache_collector.caches[name] = cache
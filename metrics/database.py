@@ -0,0 +1,47 @@
+import time
+
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+
+from metrics.collectors import DB_POOL_CHECKOUT_DURATION, DB_QUERY_DURATION
+
+
+class TimedQueuePool(AsyncAdaptedQueuePool):
+    """The default async engine pool, recording how long each checkout waits."""
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            DB_POOL_CHECKOUT_DURATION.observe(time.perf_counter() - started)
+
+
+def statement_type(statement: str) -> str:
+    """Return the leading keyword of a SQL statement, e.g. SELECT, to label its timings."""
+    keyword = statement.lstrip().split(None, 1)[0] if statement.strip() else ""
+    return keyword.upper() if keyword.isalpha() else "OTHER"
+
+
+def instrument_engine(engine: AsyncEngine) -> None:
+    """
+    Record the execution time of every statement run on an engine.
+
+    Timings are taken around the DBAPI cursor call with SQLAlchemy's cursor execute
+    events, so they cover the database round trip without ORM overhead.
+    """
+    @event.listens_for(engine.sync_engine, "before_cursor_execute")
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+    @event.listens_for(engine.sync_engine, "after_cursor_execute")
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        started = conn.info["query_started"].pop()
+        DB_QUERY_DURATION.labels(statement_type(statement)).observe(time.perf_counter() - started)
+
+    @event.listens_for(engine.sync_engine, "handle_error")
+    def handle_error(exception_context):
+        conn = exception_context.connection
+        if conn is not None and conn.info.get("query_started"):
+            conn.info["query_started"].pop()
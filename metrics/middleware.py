@@ -0,0 +1,42 @@
+import time
+
+from metrics.collectors import HTTP_REQUEST_DURATION
+
+
+class MetricsMiddleware:
+    """
+    Record the latency of every HTTP request by route template.
+
+    This is a plain ASGI middleware, so it adds no task or body buffering to the request
+    path. The route is read from the scope after routing, so `/memes/{meme_id}` is one
+    series no matter the ID; requests matching no route share the `unmatched` label.
+    """
+
+    def __init__(self, app, app_name: str):
+        self.app = app
+        self.app_name = app_name
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        status_code = 500
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            route = scope.get("route")
+            HTTP_REQUEST_DURATION.labels(
+                self.app_name,
+                scope["method"],
+                getattr(route, "path", "unmatched"),
+                str(status_code)
+            ).observe(time.perf_counter() - started)
@@ -0,0 +1,35 @@
+import os
+
+from fastapi import APIRouter, Response
+from prometheus_client import CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, generate_latest, multiprocess
+
+from metrics.collectors import cache_collector
+
+router = APIRouter(tags=["Metrics"])
+
+
+def scrape_registry():
+    """
+    Return the registry to expose.
+
+    Under gunicorn every worker records into files in `PROMETHEUS_MULTIPROC_DIR`, and a
+    scrape, served by any one worker, aggregates them. Cache counters are kept in memory
+    and only cover the worker serving the scrape.
+    """
+    if "PROMETHEUS_MULTIPROC_DIR" not in os.environ:
+        return REGISTRY
+    registry = CollectorRegistry()
+    multiprocess.MultiProcessCollector(registry)
+    registry.register(cache_collector)
+    return registry
+
+
+@router.get("/metrics", response_class=Response)
+async def read_metrics():
+    """
+    Expose the process metrics in the Prometheus text format.
+
+    Returns:
+    - Response: The current values of all registered metrics.
+    """
+    return Response(content=generate_latest(scrape_registry()), media_type=CONTENT_TYPE_LATEST)
@@ -0,0 +1,43 @@
+"""
+Gunicorn settings for serving the API with uvicorn workers.
+
+Each worker is a separate process with its own event loop (uvloop and the httptools
+parser are picked up automatically when installed), database pool and MinIO client.
+On SIGTERM gunicorn stops accepting connections and gives workers `GRACEFUL_TIMEOUT`
+seconds to finish in-flight requests and run the app's shutdown before killing them.
+
+Everything a worker holds is multiplied by the number of workers, so `WEB_CONCURRENCY`
+defaults to at most 4 and is passed on to the workers, which split their defaults by
+it. Per API, the workers together hold up to about 5 pooled and 10 overflow Postgres
+connections per engine (primary and each replica) unless `DB_POOL_SIZE` and
+`DB_MAX_OVERFLOW` are set, in which case they hold `WEB_CONCURRENCY` times those.
+The public API adds one change feed connection per worker. The private API's
+verification and variant process pools get a share of the CPUs each, at least one
+process per worker. Keep the total for both APIs below Postgres' `max_connections`
+(100 by default).
+"""
+import multiprocessing
+import os
+import shutil
+
+bind = os.getenv("BIND", "0.0.0.0:8000")
+workers = int(os.getenv("WEB_CONCURRENCY", str(min(multiprocessing.cpu_count(), 4))))
+# Read by the workers to size their pools, see db.config and private_routes.pools.
+os.environ["WEB_CONCURRENCY"] = str(workers)
+worker_class = "uvicorn.workers.UvicornWorker"
+graceful_timeout = int(os.getenv("GRACEFUL_TIMEOUT", "30"))
+timeout = int(os.getenv("WORKER_TIMEOUT", "60"))
+keepalive = int(os.getenv("KEEPALIVE", "5"))
+
+
+def on_starting(server):
+    directory = os.getenv("PROMETHEUS_MULTIPROC_DIR")
+    if directory:
+        shutil.rmtree(directory, ignore_errors=True)
+        os.makedirs(directory)
+
+
+def child_exit(server, worker):
+    if os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+        from prometheus_client import multiprocess
+        multiprocess.mark_process_dead(worker.pid)
@@ -1,6 +1,79 @@
+import asyncio
+import logging
+import os
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
+from cache.memes import meme_cache
+from db.dependencies import async_session, dispose_engines, warm_up_engines
+from metrics.middleware import MetricsMiddleware
+from metrics.routes import router as metrics_router
+from private_routes import variants, verification
+from private_routes.outbox import OutboxWorkerPool
+from private_routes.resumable import UploadSweeper
 from private_routes.media import router
+from private_routes.similarity import meme_index
+from s3 import storage
 
-private_app = FastAPI(docs_url="/private-api")
+STARTUP_WARM_UP = os.getenv("STARTUP_WARM_UP", "true").lower() == "true"
+OUTBOX_IN_PROCESS = os.getenv("OUTBOX_IN_PROCESS", "true").lower() == "true"
+
+logger = logging.getLogger(__name__)
+
+
+async def warm_up_process_pools() -> None:
+    """Start the image worker processes, which import Pillow, before the first upload."""
+    loop = asyncio.get_running_loop()
+    await asyncio.gather(
+        loop.run_in_executor(variants.pool.executor, variants.supported_formats),
+        loop.run_in_executor(verification.pool.executor, verification.check_image, b"", 1, 1),
+    )
+
+
+async def warm_up_similarity_index() -> None:
+    """Load the similarity index, so the first duplicate check does not pay for it."""
+    try:
+        async with async_session() as session:
+            await meme_index.refresh(session)
+    except Exception:
+        logger.warning("Could not load the similarity index", exc_info=True)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    Warm up connections and worker pools before serving and release them after the last request.
+
+    The server only starts accepting requests once startup is done, and runs the
+    shutdown part after in-flight requests have drained on SIGTERM. Unless the outbox
+    is drained by a separate `python -m private_routes.outbox` process, its workers run
+    in this process and finish their current batch before shutdown. Expired resumable
+    uploads are swept by every process.
+    """
+    if STARTUP_WARM_UP:
+        bucket = os.getenv("MINIO_BUCKET_NAME", "memes")
+        _, bucket_ok, _ = await asyncio.gather(
+            warm_up_engines(), storage.check_bucket(bucket), warm_up_process_pools()
+        )
+        if not bucket_ok:
+            logger.warning("MinIO bucket %s is missing or unreachable", bucket)
+        await warm_up_similarity_index()
+    outbox_workers = OutboxWorkerPool()
+    if OUTBOX_IN_PROCESS:
+        outbox_workers.start()
+    upload_sweeper = UploadSweeper()
+    upload_sweeper.start()
+    yield
+    await upload_sweeper.stop()
+    await outbox_workers.stop()
+    await dispose_engines()
+    await meme_cache.close()
+    variants.pool.shutdown()
+    verification.pool.shutdown()
+    storage.executor.shutdown()
+
+
+private_app = FastAPI(docs_url="/private-api", lifespan=lifespan)
 
 private_app.include_router(router)
+private_app.include_router(metrics_router)
+private_app.add_middleware(MetricsMiddleware, app_name="private")
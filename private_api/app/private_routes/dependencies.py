@@ -1,6 +1,8 @@
 import os
-from fastapi import Security, HTTPException
+import time
+from fastapi import Security, HTTPException, Request, Response
 from fastapi.security.api_key import APIKeyHeader
+from db.routing import LAST_WRITE_COOKIE
 
 api_key_header = APIKeyHeader(name="Authorization", auto_error=False)
 
@@ -10,4 +12,21 @@ async def get_api_key(api_key_header: str = Security(api_key_header)):
     if api_key_header in API_KEYS:
         return api_key_header
     else:
-        raise HTTPException(status_code=401, detail="Invalid API Key")
\ No newline at end of file
+        raise HTTPException(status_code=401, detail="Invalid API Key")
+
+SAFE_METHODS = ("GET", "HEAD", "OPTIONS")
+
+async def mark_write(request: Request, response: Response):
+    """
+    Remember when the client last wrote, for read-your-writes routing in the public API.
+
+    Reads, such as the similarity search, leave the cookie alone, so they do not pin the
+    client's public API reads to the primary.
+
+    Args:
+        request (Request): The incoming request; only writes are remembered.
+        response (Response): The outgoing response the cookie is set on.
+    """
+    if request.method in SAFE_METHODS:
+        return
+    response.set_cookie(LAST_WRITE_COOKIE, str(time.time()), httponly=True, samesite="lax")
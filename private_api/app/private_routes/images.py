@@ -0,0 +1,183 @@
+import asyncio
+import hashlib
+from collections import Counter
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from fastapi import UploadFile
+from sqlalchemy import case, delete, update
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from db.models import StoredImage
+from private_routes.outbox import cancel_removals
+from private_routes.variants import generate_variants, variant_object_names
+from s3 import storage
+from s3.urls import image_url, object_name
+
+HASH_CHUNK_SIZE = 1024 * 1024
+
+
+def hash_file(fileobj) -> str:
+    """Return the SHA-256 hex digest of a file, read in chunks from the start."""
+    digest = hashlib.sha256()
+    fileobj.seek(0)
+    for chunk in iter(lambda: fileobj.read(HASH_CHUNK_SIZE), b""):
+        digest.update(chunk)
+    fileobj.seek(0)
+    return digest.hexdigest()
+
+
+async def image_digest(file: UploadFile) -> str:
+    """
+    Compute the content address of an uploaded image.
+
+    The spooled file is hashed in chunks on the storage thread pool, so neither the
+    event loop nor memory are tied up by large uploads.
+
+    Args:
+        file (UploadFile): The uploaded file.
+
+    Returns:
+        str: The SHA-256 hex digest, used as the image's object name.
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(storage.executor, hash_file, file.file)
+
+
+def meme_object_names(image_url: str, variants: Optional[Dict[str, str]] = None) -> List[str]:
+    """Return the object names of a meme's original image and all its variants."""
+    urls = ([image_url] if image_url else []) + list((variants or {}).values())
+    return [object_name(url) for url in urls]
+
+
+async def acquire_images(session: AsyncSession, counts: Dict[str, int]) -> Dict[str, Optional[Dict[str, str]]]:
+    """
+    Add references to content-addressed images.
+
+    All names are upserted with one `INSERT ... ON CONFLICT DO UPDATE` that increments
+    the reference counts. A concurrent transaction adding the same new image waits on
+    the row lock until the first one commits, so an image is never referenced before
+    it has been uploaded.
+
+    Args:
+        session (AsyncSession): The database session.
+        counts (Dict[str, int]): The number of new references per object name.
+
+    Returns:
+        Dict[str, Optional[Dict[str, str]]]: The stored variants of every image that
+        already existed, or None for images that are new and must be uploaded.
+    """
+    stmt = insert(StoredImage).values([
+        {"object_name": name, "refcount": count} for name, count in counts.items()
+    ])
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[StoredImage.object_name],
+        set_={"refcount": StoredImage.refcount + stmt.excluded.refcount}
+    ).returning(StoredImage.object_name, StoredImage.refcount, StoredImage.variants)
+    rows = (await session.execute(stmt)).all()
+    return {
+        name: variants if refcount > counts[name] else None
+        for name, refcount, variants in rows
+    }
+
+
+async def upload_image(bucket: str, name: str, file: UploadFile) -> Dict[str, str]:
+    """
+    Store a new content-addressed image and its variants.
+
+    The upload is skipped if an object with the same digest is already in the bucket,
+    e.g. left over from a rolled back transaction. If the variants cannot be generated,
+    the objects stored by this call are removed again, since no meme will reference them.
+
+    Args:
+        bucket (str): The destination bucket.
+        name (str): The digest of the image, used as the object name.
+        file (UploadFile): The uploaded file.
+
+    Returns:
+        Dict[str, str]: The URLs of the stored variants keyed by variant name.
+
+    Raises:
+        HTTPException: If the variants cannot be generated, see `generate_variants`.
+    """
+    uploaded = not await storage.object_exists(bucket, name)
+    if uploaded:
+        await storage.put_fileobj(bucket, name, file.file, file.content_type)
+    try:
+        return await generate_variants(bucket, name, file)
+    except Exception:
+        await storage.remove_objects(bucket, ([name] if uploaded else []) + variant_object_names(name))
+        raise
+
+
+async def record_variants(session: AsyncSession, variants: Dict[str, Dict[str, str]]) -> None:
+    """Save the variant URLs of newly uploaded images on their image rows."""
+    for name, image_variants in variants.items():
+        await session.execute(
+            update(StoredImage).where(StoredImage.object_name == name).values(variants=image_variants)
+        )
+
+
+async def store_image(session: AsyncSession, bucket: str, file: UploadFile) -> Tuple[str, Dict[str, str]]:
+    """
+    Reference an uploaded image, uploading it only if its content is not stored yet.
+
+    Args:
+        session (AsyncSession): The database session; the caller commits it.
+        bucket (str): The destination bucket.
+        file (UploadFile): The uploaded, already verified image.
+
+    Returns:
+        Tuple[str, Dict[str, str]]: The image URL and the variant URLs for the meme.
+    """
+    name = await image_digest(file)
+    variants = (await acquire_images(session, {name: 1}))[name]
+    if variants is None:
+        await cancel_removals(session, bucket, [name])
+        variants = await upload_image(bucket, name, file)
+        await record_variants(session, {name: variants})
+    return image_url(bucket, name), variants
+
+
+async def release_images(
+    session: AsyncSession,
+    images: Iterable[Tuple[Optional[str], Optional[Dict[str, str]]]]
+) -> List[str]:
+    """
+    Drop references to images and collect the objects that are no longer used.
+
+    Reference counts are decremented with a single `UPDATE`, and image rows whose count
+    drops to zero are deleted. Images stored before content addressing have no image row
+    and are always released.
+
+    Args:
+        session (AsyncSession): The database session; the caller commits it.
+        images (Iterable[Tuple[str, Dict[str, str]]]): The image URL and variant URLs of
+            every released meme.
+
+    Returns:
+        List[str]: The object names to remove from the bucket, to be passed to
+        `enqueue_removals` in the same transaction.
+    """
+    images = [(url, variants) for url, variants in images if url]
+    counts = Counter(object_name(url) for url, _ in images)
+    if not counts:
+        return []
+
+    result = await session.execute(
+        update(StoredImage)
+        .where(StoredImage.object_name.in_(list(counts)))
+        .values(refcount=StoredImage.refcount - case(counts, value=StoredImage.object_name))
+        .returning(StoredImage.object_name, StoredImage.refcount, StoredImage.variants)
+    )
+    rows = result.all()
+    unused = [(name, variants) for name, refcount, variants in rows if refcount <= 0]
+    if unused:
+        await session.execute(delete(StoredImage).where(StoredImage.object_name.in_([name for name, _ in unused])))
+
+    names = [name for image, variants in unused for name in meme_object_names(image, variants)]
+    tracked = {name for name, _, _ in rows}
+    for url, variants in images:
+        if object_name(url) not in tracked:
+            names.extend(meme_object_names(url, variants))
+    return names
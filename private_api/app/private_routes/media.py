@@ -1,17 +1,77 @@
 import os
-from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, status
+import asyncio
+from collections import Counter
+from typing import List, Optional
+from fastapi import APIRouter, Depends, Header, HTTPException, Request, Response, UploadFile, File, Form, Query, status
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select
-from PIL import Image
+from sqlalchemy import delete, insert, select
+from cache.memes import invalidate_meme, invalidate_memes
+from db.changes import CREATED, DELETED, UPDATED, notify_meme_changes
 from db.dependencies import get_session
 from db.models import Meme
-from db.schemas import MemeBase, MemeInfo
-from s3.minio_client import minio_client
-from io import BytesIO
+from db.schemas import (
+    MemeBase,
+    MemeBatchItem,
+    MemeBulkDelete,
+    MemeBulkDeleteResult,
+    MemeInfo,
+    MemeSimilar,
+    MemeUpload,
+    ResumableUploadInfo,
+)
+from private_routes.dependencies import mark_write
+from private_routes.images import (
+    acquire_images,
+    image_digest,
+    record_variants,
+    release_images,
+    store_image,
+    upload_image,
+)
+from private_routes.outbox import cancel_removals, enqueue_removals, wake
+from private_routes.resumable import (
+    abort_resumable_upload,
+    complete_resumable_upload,
+    create_resumable_upload,
+    get_resumable_upload,
+    part_count,
+    received_parts,
+    upload_chunk,
+)
+from private_routes.similarity import (
+    SIMILARITY_MAX_DISTANCE,
+    find_duplicates,
+    find_similar,
+    meme_index,
+    to_signed,
+    to_unsigned,
+)
+from private_routes.uploads import finalize_upload, issue_upload
+from private_routes.verification import verify_image
+from s3.urls import image_url
+
+BATCH_MAX_SIZE = int(os.getenv("BATCH_MAX_SIZE", "500"))
+BATCH_PARALLELISM = int(os.getenv("BATCH_PARALLELISM", "8"))
+BATCH_MAX_PARALLELISM = int(os.getenv("BATCH_MAX_PARALLELISM", "32"))
+
+async def create_uploaded_meme(session: AsyncSession, bucket: str, name: str, title: str, description: str) -> Meme:
+    """Create the meme for an image uploaded to the bucket outside of this API and commit."""
+    await acquire_images(session, {name: 1})
+
+    meme_data = MemeBase(title=title, description=description, image_url=image_url(bucket, name))
+    db_meme = Meme(**meme_data.model_dump())
+    session.add(db_meme)
+    await session.flush()
+    await notify_meme_changes(session, CREATED, [db_meme.id])
+    await session.commit()
+    await session.refresh(db_meme)
+    await invalidate_meme(db_meme.id)
+    return db_meme
 
 router = APIRouter(
     prefix="/memes",
-    tags=["Memes"]
+    tags=["Memes"],
+    dependencies=[Depends(mark_write)]
 )
 
 @router.post("/", response_model=MemeInfo, status_code=status.HTTP_201_CREATED)
@@ -19,59 +79,409 @@ async def create_meme(
     title: str,
     description: str,
     file: UploadFile = File(...),
+    reject_duplicates: bool = False,
     session: AsyncSession = Depends(get_session)
 ):
     """
     Create a new meme.
 
     This endpoint allows users to upload a new meme with a title, description, and image file.
-    The image is verified and stored in a MinIO bucket, and the meme details are saved in the database.
+    The image is verified and stored in a MinIO bucket together with its resized WebP/AVIF
+    variants, and the meme details are saved in the database. Images are stored under the SHA-256
+    digest of their content, so an image that is already stored is referenced instead of uploaded
+    again. The perceptual hash of the image is stored on the meme; with `reject_duplicates`, an
+    image that looks like the image of an existing meme (e.g. a recompressed or slightly cropped
+    copy) is rejected. Cached meme list pages are invalidated and change feed subscribers are
+    notified.
 
     Args:
         title (str): The title of the meme.
         description (str): The description of the meme.
         file (UploadFile): The image file of the meme.
+        reject_duplicates (bool): Whether to reject near-duplicates of existing memes.
         session (AsyncSession): The database session.
 
     Returns:
         MemeInfo: The created meme information.
+
+    Raises:
+        HTTPException(409): If `reject_duplicates` is set and the image is a near-duplicate.
     """
     bucket = os.getenv("MINIO_BUCKET_NAME", "memes")
-    file_name = f"{title}_{file.filename}"
-    
-    try:
-        img = Image.open(file.file)
-        img.verify()
-        file.file.seek(0)
-    except (IOError, SyntaxError):
-        raise HTTPException(
-            status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE,
-            detail="Uploaded file is not an image"
-        )
-    
-    file_content = await file.read()
-    file_size = len(file_content)
-    file_stream = BytesIO(file_content)
     
-    minio_client.put_object(
-        bucket_name=bucket,
-        object_name=file_name,
-        data=file_stream,
-        length=file_size,
-        part_size=10*1024*1024,
-        content_type=file.content_type
-    )
-    
-    file_url = f"http://{bucket}/{file_name}"
+    phash = await verify_image(file)
+    if reject_duplicates:
+        duplicates = await find_duplicates(session, {0: phash})
+        if duplicates:
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT,
+                detail=f"Image is a near-duplicate of meme {duplicates[0]}"
+            )
+    file_url, variants = await store_image(session, bucket, file)
 
     meme_data = MemeBase(title=title, description=description, image_url=file_url)
-    db_meme = Meme(**meme_data.model_dump())
+    db_meme = Meme(**meme_data.model_dump(), variants=variants, phash=to_signed(phash))
     session.add(db_meme)
+    await session.flush()
+    await notify_meme_changes(session, CREATED, [db_meme.id])
     await session.commit()
     await session.refresh(db_meme)
+    meme_index.add(db_meme.id, phash)
+    await invalidate_meme(db_meme.id)
     
     return db_meme
 
+@router.post("/batch", response_model=List[MemeBatchItem])
+async def create_memes_batch(
+    files: List[UploadFile] = File(...),
+    titles: List[str] = Form(...),
+    descriptions: List[str] = Form(...),
+    parallelism: int = Query(BATCH_PARALLELISM, ge=1, le=BATCH_MAX_PARALLELISM),
+    reject_duplicates: bool = False,
+    session: AsyncSession = Depends(get_session)
+):
+    """
+    Create many memes in one request.
+
+    The n-th file is stored with the n-th title and description. Images are verified, hashed
+    and uploaded concurrently, at most `parallelism` at a time; items wait for the verification
+    pool rather than failing when it is busy. Each distinct image is uploaded only once and only
+    if it is not stored yet. The rows of all successfully stored images are
+    inserted with a single multi-row `INSERT ... RETURNING` in one transaction. A failing item
+    does not affect the others. With `reject_duplicates`, items whose image looks like the image
+    of an existing meme fail with status 409; all items are checked with one database query.
+
+    Args:
+        files (List[UploadFile]): The image files of the memes.
+        titles (List[str]): The titles of the memes, one per file.
+        descriptions (List[str]): The descriptions of the memes, one per file.
+        parallelism (int): The maximum number of images processed at the same time.
+        reject_duplicates (bool): Whether to reject near-duplicates of existing memes.
+        session (AsyncSession): The database session.
+
+    Returns:
+        List[MemeBatchItem]: One result per file, in request order, with the HTTP status
+        of the item and either the created meme or the error detail.
+    """
+    if not len(files) == len(titles) == len(descriptions):
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail="files, titles and descriptions must have the same length"
+        )
+    if len(files) > BATCH_MAX_SIZE:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"At most {BATCH_MAX_SIZE} memes can be created in one batch"
+        )
+
+    bucket = os.getenv("MINIO_BUCKET_NAME", "memes")
+    semaphore = asyncio.Semaphore(parallelism)
+    results = [MemeBatchItem(index=index, status=status.HTTP_201_CREATED) for index in range(len(files))]
+    phashes = [None] * len(files)
+
+    def fail(index: int, exc: Exception) -> None:
+        if isinstance(exc, HTTPException):
+            results[index].status, results[index].detail = exc.status_code, exc.detail
+        else:
+            results[index].status = status.HTTP_500_INTERNAL_SERVER_ERROR
+            results[index].detail = "Failed to upload image"
+
+    async def digest(index: int) -> Optional[str]:
+        async with semaphore:
+            try:
+                phashes[index] = await verify_image(files[index], wait=True)
+                return await image_digest(files[index])
+            except Exception as exc:
+                fail(index, exc)
+                return None
+
+    async def upload(name: str, index: int):
+        async with semaphore:
+            try:
+                return await upload_image(bucket, name, files[index])
+            except Exception as exc:
+                return exc
+
+    digests = await asyncio.gather(*(digest(index) for index in range(len(files))))
+    if reject_duplicates:
+        duplicates = await find_duplicates(
+            session, {index: phashes[index] for index, name in enumerate(digests) if name is not None}
+        )
+        for index, meme_id in duplicates.items():
+            fail(index, HTTPException(
+                status_code=status.HTTP_409_CONFLICT,
+                detail=f"Image is a near-duplicate of meme {meme_id}"
+            ))
+            digests[index] = None
+    counts = Counter(name for name in digests if name is not None)
+    variants = await acquire_images(session, counts) if counts else {}
+
+    new_images = {name: digests.index(name) for name, stored_variants in variants.items() if stored_variants is None}
+    await cancel_removals(session, bucket, new_images)
+    uploaded = await asyncio.gather(*(upload(name, index) for name, index in new_images.items()))
+    failed_images = []
+    for name, outcome in zip(new_images, uploaded):
+        if isinstance(outcome, Exception):
+            failed_images.append(name)
+            for index, item_digest in enumerate(digests):
+                if item_digest == name:
+                    fail(index, outcome)
+                    digests[index] = None
+        else:
+            variants[name] = outcome
+    await record_variants(session, {name: variants[name] for name in new_images if name not in failed_images})
+    if failed_images:
+        released = await release_images(session, [(image_url(bucket, name), None) for name in failed_images for _ in range(counts[name])])
+        await enqueue_removals(session, bucket, released)
+
+    rows = [
+        None if name is None else {
+            **MemeBase(title=titles[index], description=descriptions[index], image_url=image_url(bucket, name)).model_dump(),
+            "variants": variants[name],
+            "phash": to_signed(phashes[index])
+        }
+        for index, name in enumerate(digests)
+    ]
+    stored = [index for index, row in enumerate(rows) if row is not None]
+    if stored:
+        result = await session.execute(
+            insert(Meme).returning(Meme, sort_by_parameter_order=True),
+            [rows[index] for index in stored]
+        )
+        for index, db_meme in zip(stored, result.scalars().all()):
+            results[index].meme = MemeInfo.model_validate(db_meme, from_attributes=True)
+        await notify_meme_changes(session, CREATED, [results[index].meme.id for index in stored])
+    await session.commit()
+    wake()
+    if stored:
+        for index in stored:
+            meme_index.add(results[index].meme.id, phashes[index])
+        await invalidate_meme()
+
+    return results
+
+@router.post("/uploads", response_model=MemeUpload, status_code=status.HTTP_201_CREATED)
+async def create_upload():
+    """
+    Start a direct upload of a meme image.
+
+    The returned URL accepts one `PUT` of the image body straight to the MinIO bucket, so the
+    image bytes never pass through this API. Once the upload is done, the meme is created
+    with `POST /memes/uploads/{upload_id}`.
+
+    Returns:
+        MemeUpload: The upload ID, the presigned PUT URL and the time it expires.
+    """
+    bucket = os.getenv("MINIO_BUCKET_NAME", "memes")
+    upload_id, url, expires_at = issue_upload(bucket)
+    return MemeUpload(upload_id=upload_id, url=url, expires_at=expires_at)
+
+@router.post("/uploads/{upload_id}", response_model=MemeInfo, status_code=status.HTTP_201_CREATED)
+async def finalize_meme_upload(
+    upload_id: str,
+    title: str,
+    description: str,
+    session: AsyncSession = Depends(get_session)
+):
+    """
+    Create a meme from a finished direct upload.
+
+    The uploaded object is checked by sniffing its header with a ranged GET and moved to its
+    permanent name on the MinIO side, then the meme row is created. Only metadata is handled
+    here; resized variants are not rendered for direct uploads, since that needs the whole
+    image in this process.
+
+    Args:
+        upload_id (str): The ID returned by `POST /memes/uploads`.
+        title (str): The title of the meme.
+        description (str): The description of the meme.
+        session (AsyncSession): The database session.
+
+    Returns:
+        MemeInfo: The created meme information.
+    """
+    bucket = os.getenv("MINIO_BUCKET_NAME", "memes")
+
+    name = await finalize_upload(bucket, upload_id)
+    return await create_uploaded_meme(session, bucket, name, title, description)
+
+@router.post("/resumable", response_model=ResumableUploadInfo, status_code=status.HTTP_201_CREATED)
+async def create_resumable(
+    size: int = Query(..., ge=1),
+    session: AsyncSession = Depends(get_session)
+):
+    """
+    Start a resumable upload of a large meme image.
+
+    The file is sent in chunks with `PATCH /memes/resumable/{upload_id}`, each chunk stored
+    as one part of a MinIO multipart upload, and the meme is created with
+    `POST /memes/resumable/{upload_id}/complete`. The upload state is kept in the database,
+    so an interrupted upload can be resumed from any API process by sending only the missing
+    chunks. Uploads not completed within `RESUMABLE_EXPIRY` seconds of their last chunk are
+    discarded.
+
+    Args:
+        size (int): The size of the file in bytes.
+        session (AsyncSession): The database session.
+
+    Returns:
+        ResumableUploadInfo: The upload ID, the chunk size and the number of chunks expected.
+    """
+    bucket = os.getenv("MINIO_BUCKET_NAME", "memes")
+    upload = await create_resumable_upload(session, bucket, size)
+    return ResumableUploadInfo(
+        upload_id=upload.id,
+        size=upload.size,
+        chunk_size=upload.chunk_size,
+        parts=part_count(upload.size, upload.chunk_size),
+        received_parts=[],
+        expires_at=upload.expires_at
+    )
+
+@router.get("/resumable/{upload_id}", response_model=ResumableUploadInfo)
+async def read_resumable(
+    upload_id: str,
+    session: AsyncSession = Depends(get_session)
+):
+    """
+    Get the progress of a resumable upload, to resume it after an interruption.
+
+    Args:
+        upload_id (str): The ID returned by `POST /memes/resumable`.
+        session (AsyncSession): The database session.
+
+    Returns:
+        ResumableUploadInfo: The upload state, with the numbers of the chunks received so far.
+    """
+    upload = await get_resumable_upload(session, upload_id)
+    parts = await received_parts(session, upload_id)
+    return ResumableUploadInfo(
+        upload_id=upload.id,
+        size=upload.size,
+        chunk_size=upload.chunk_size,
+        parts=part_count(upload.size, upload.chunk_size),
+        received_parts=[number for number, _ in parts],
+        expires_at=upload.expires_at
+    )
+
+@router.patch("/resumable/{upload_id}", status_code=status.HTTP_204_NO_CONTENT)
+async def patch_resumable(
+    upload_id: str,
+    request: Request,
+    upload_offset: int = Header(..., alias="Upload-Offset"),
+    session: AsyncSession = Depends(get_session)
+):
+    """
+    Upload one chunk of a resumable upload.
+
+    The request body is the chunk starting at byte `Upload-Offset` of the file, which must be
+    a multiple of the chunk size; every chunk but the last is exactly `chunk_size` bytes long.
+    Chunks may be sent in any order and in parallel, and a chunk that failed may be sent again.
+
+    Args:
+        upload_id (str): The ID returned by `POST /memes/resumable`.
+        request (Request): The request carrying the chunk as its body.
+        upload_offset (int): The position of the chunk in the file.
+        session (AsyncSession): The database session.
+
+    Returns:
+        Response: An empty 204 response whose `Upload-Offset` header is the offset just past the chunk.
+    """
+    end = await upload_chunk(session, request, upload_id, upload_offset)
+    return Response(status_code=status.HTTP_204_NO_CONTENT, headers={"Upload-Offset": str(end)})
+
+@router.post("/resumable/{upload_id}/complete", response_model=MemeInfo, status_code=status.HTTP_201_CREATED)
+async def complete_resumable(
+    upload_id: str,
+    title: str,
+    description: str,
+    session: AsyncSession = Depends(get_session)
+):
+    """
+    Create a meme from a resumable upload whose chunks have all been received.
+
+    The chunks are assembled on the MinIO side and the result is checked and moved to its
+    permanent name like a direct upload, so no variants are rendered.
+
+    Args:
+        upload_id (str): The ID returned by `POST /memes/resumable`.
+        title (str): The title of the meme.
+        description (str): The description of the meme.
+        session (AsyncSession): The database session.
+
+    Returns:
+        MemeInfo: The created meme information.
+    """
+    bucket = os.getenv("MINIO_BUCKET_NAME", "memes")
+    name = await complete_resumable_upload(session, upload_id)
+    return await create_uploaded_meme(session, bucket, name, title, description)
+
+@router.delete("/resumable/{upload_id}", status_code=status.HTTP_204_NO_CONTENT)
+async def delete_resumable(
+    upload_id: str,
+    session: AsyncSession = Depends(get_session)
+):
+    """
+    Abort a resumable upload and discard the chunks received so far.
+
+    Args:
+        upload_id (str): The ID returned by `POST /memes/resumable`.
+        session (AsyncSession): The database session.
+    """
+    await abort_resumable_upload(session, upload_id)
+    return Response(status_code=status.HTTP_204_NO_CONTENT)
+
+@router.post("/delete", response_model=MemeBulkDeleteResult)
+async def delete_memes_bulk(
+    criteria: MemeBulkDelete,
+    session: AsyncSession = Depends(get_session)
+):
+    """
+    Delete many memes at once.
+
+    Memes are selected by a list of IDs, by exact title, or by both. The rows are removed
+    with a single `DELETE ... RETURNING` and their image references are released in the same
+    transaction. Images no longer referenced by any meme are scheduled for removal from the
+    MinIO bucket in the same commit and removed in the background by the outbox workers.
+
+    Args:
+        criteria (MemeBulkDelete): The IDs and/or title of the memes to delete; at most
+            `BULK_DELETE_MAX_IDS` IDs, each a valid meme ID.
+        session (AsyncSession): The database session.
+
+    Returns:
+        MemeBulkDeleteResult: The IDs of the deleted memes and the names of the objects
+        scheduled for removal from MinIO.
+
+    Raises:
+        HTTPException(422): If neither IDs nor a title are given, an ID is out of range
+            or too many IDs are given.
+    """
+    if not criteria.ids and criteria.title is None:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail="Either ids or title must be given"
+        )
+
+    bucket = os.getenv("MINIO_BUCKET_NAME", "memes")
+    stmt = delete(Meme).returning(Meme.id, Meme.image_url, Meme.variants)
+    if criteria.ids:
+        stmt = stmt.where(Meme.id.in_(criteria.ids))
+    if criteria.title is not None:
+        stmt = stmt.where(Meme.title == criteria.title)
+
+    result = await session.execute(stmt)
+    deleted = result.all()
+    released = await release_images(session, ((url, variants) for _, url, variants in deleted))
+    queued = await enqueue_removals(session, bucket, released)
+    await notify_meme_changes(session, DELETED, [meme_id for meme_id, _, _ in deleted])
+    await session.commit()
+    wake()
+    meme_index.remove(meme_id for meme_id, _, _ in deleted)
+    await invalidate_memes(meme_id for meme_id, _, _ in deleted)
+
+    return MemeBulkDeleteResult(deleted=[meme_id for meme_id, _, _ in deleted], queued_objects=queued)
+
 @router.put("/{meme_id}", response_model=MemeInfo)
 async def update_meme(
     meme_id: int,
@@ -84,7 +494,10 @@ async def update_meme(
     Update an existing meme.
 
     This endpoint allows users to update the details of an existing meme, including the image file.
-    The old image is deleted from the MinIO bucket, and the new image is uploaded.
+    The new image is stored like in `create_meme`, and the reference to the old image is released;
+    if no other meme uses the old image, its removal and that of its variants are scheduled in the
+    same commit and carried out in the background by the outbox workers.
+    The cached meme and list pages are invalidated and change feed subscribers are notified.
 
     Args:
         meme_id (int): The ID of the meme to update.
@@ -102,48 +515,25 @@ async def update_meme(
     if db_meme is None:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Meme not found")
 
-    if db_meme.image_url:
-        try:
-            old_file_name = db_meme.image_url.split("/")[-1]
-            minio_client.remove_object(bucket_name=bucket, object_name=old_file_name)
-        except Exception:
-            raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Failed to delete old image")
-
+    released = []
     if file:
-        try:
-            img = Image.open(file.file)
-            img.verify()
-            file.file.seek(0)
-        except (IOError, SyntaxError):
-            raise HTTPException(
-                status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE,
-                detail="Uploaded file is not an image"
-            )
-        
-        file_name = f"{title}_{file.filename}"
-        file_content = await file.read()
-        file_size = len(file_content)
-        file_stream = BytesIO(file_content)
-        
-        minio_client.put_object(
-            bucket_name=bucket,
-            object_name=file_name,
-            data=file_stream,
-            length=file_size,
-            part_size=10*1024*1024,
-            content_type=file.content_type
-        )
-        
-        file_url = f"http://{bucket}/{file_name}"
-        db_meme.image_url = file_url
+        phash = await verify_image(file)
+        new_url, new_variants = await store_image(session, bucket, file)
+        released = await release_images(session, [(db_meme.image_url, db_meme.variants)])
+        db_meme.image_url, db_meme.variants, db_meme.phash = new_url, new_variants, to_signed(phash)
 
     if title:
         db_meme.title = title
     if description:
         db_meme.description = description
 
+    await enqueue_removals(session, bucket, released)
+    await notify_meme_changes(session, UPDATED, [meme_id])
     await session.commit()
+    wake()
     await session.refresh(db_meme)
+    meme_index.add(db_meme.id, None if db_meme.phash is None else to_unsigned(db_meme.phash))
+    await invalidate_meme(db_meme.id)
     
     return db_meme
 
@@ -155,7 +545,10 @@ async def delete_meme(
     """
     Delete an existing meme.
 
-    This endpoint allows users to delete an existing meme. The image file is also removed from the MinIO bucket.
+    This endpoint allows users to delete an existing meme. Once no other meme references the image
+    file, its removal and that of its variants from the MinIO bucket are scheduled in the same commit
+    and carried out in the background by the outbox workers.
+    The cached meme and list pages are invalidated and change feed subscribers are notified.
 
     Args:
         meme_id (int): The ID of the meme to delete.
@@ -170,14 +563,51 @@ async def delete_meme(
     if db_meme is None:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Meme not found")
 
-    if db_meme.image_url:
-        try:
-            file_name = db_meme.image_url.split("/")[-1]
-            minio_client.remove_object(bucket_name=bucket, object_name=file_name)
-        except Exception:
-            raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Failed to delete image from Minio")
-
+    released = await release_images(session, [(db_meme.image_url, db_meme.variants)])
+    await enqueue_removals(session, bucket, released)
     await session.delete(db_meme)
+    await notify_meme_changes(session, DELETED, [meme_id])
     await session.commit()
+    wake()
+    meme_index.remove([meme_id])
+    await invalidate_meme(meme_id)
     
     return db_meme
+
+@router.get("/{meme_id}/similar", response_model=List[MemeSimilar])
+async def read_similar_memes(
+    meme_id: int,
+    max_distance: int = Query(SIMILARITY_MAX_DISTANCE, ge=0, le=64),
+    limit: int = Query(10, ge=1, le=100),
+    session: AsyncSession = Depends(get_session)
+):
+    """
+    Find memes whose images look like the image of a meme.
+
+    Images are compared by the Hamming distance between their 64-bit perceptual hashes,
+    looked up in the in-memory similarity index of this process. A distance of 0 means the
+    images are the same or nearly so; recompressed or slightly cropped copies usually stay
+    within a few bits.
+
+    Args:
+        meme_id (int): The ID of the meme to compare with.
+        max_distance (int): The maximum Hamming distance (default is `SIMILARITY_MAX_DISTANCE`).
+        limit (int): The maximum number of memes to return (default is 10).
+        session (AsyncSession): The database session.
+
+    Returns:
+        List[MemeSimilar]: The similar memes with their distances, closest first.
+
+    Raises:
+        HTTPException(404): If the meme is not found.
+        HTTPException(409): If the meme's image has no perceptual hash, e.g. a direct upload.
+    """
+    result = await session.execute(select(Meme).filter(Meme.id == meme_id))
+    db_meme = result.scalar()
+    if db_meme is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Meme not found")
+    if db_meme.phash is None:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="Meme image has no perceptual hash")
+
+    matches = await find_similar(session, to_unsigned(db_meme.phash), max_distance, limit, exclude=meme_id)
+    return [MemeSimilar(meme=MemeInfo.model_validate(meme, from_attributes=True), distance=distance) for meme, distance in matches]
@@ -0,0 +1,200 @@
+import asyncio
+import logging
+import os
+import signal
+from collections import defaultdict
+from typing import Callable, Iterable, List
+
+from sqlalchemy import delete, func, insert, or_, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from db.dependencies import async_session, dispose_engines
+from db.models import OutboxEvent
+from s3 import storage
+
+OUTBOX_WORKERS = int(os.getenv("OUTBOX_WORKERS", "2"))
+OUTBOX_BATCH_SIZE = int(os.getenv("OUTBOX_BATCH_SIZE", "500"))
+OUTBOX_POLL_INTERVAL = float(os.getenv("OUTBOX_POLL_INTERVAL", "1"))
+OUTBOX_MAX_ATTEMPTS = int(os.getenv("OUTBOX_MAX_ATTEMPTS", "10"))
+OUTBOX_MAX_RETRY_DELAY = float(os.getenv("OUTBOX_MAX_RETRY_DELAY", "3600"))
+
+REMOVE_OBJECT = "remove_object"
+
+logger = logging.getLogger(__name__)
+
+# Set after a commit that enqueued events, so in-process workers start draining at once
+# instead of at their next poll.
+wake_up = asyncio.Event()
+
+
+def wake() -> None:
+    """Tell the in-process workers that new events were committed."""
+    wake_up.set()
+
+
+async def enqueue_removals(session: AsyncSession, bucket: str, names: Iterable[str]) -> List[str]:
+    """
+    Schedule objects for removal in the caller's transaction.
+
+    The events become visible to the workers only when the session commits, together
+    with the change that released the objects, so a rolled back change removes nothing.
+
+    Args:
+        session (AsyncSession): The database session; the caller commits it.
+        bucket (str): The bucket holding the objects.
+        names (Iterable[str]): The object names, e.g. as returned by `release_images`.
+
+    Returns:
+        List[str]: The distinct object names scheduled for removal.
+    """
+    names = list(dict.fromkeys(names))
+    if names:
+        await session.execute(insert(OutboxEvent), [
+            {"action": REMOVE_OBJECT, "bucket": bucket, "object_name": name, "attempts": 0}
+            for name in names
+        ])
+    return names
+
+
+async def cancel_removals(session: AsyncSession, bucket: str, names: Iterable[str]) -> None:
+    """
+    Drop scheduled removals of images that are referenced again, and of their variants.
+
+    A worker removing one of the objects holds its event row locked, so this waits for
+    the removal to finish; afterwards the object is either kept or already gone and
+    uploaded again by the caller.
+
+    Args:
+        session (AsyncSession): The database session; the caller commits it.
+        bucket (str): The bucket holding the objects.
+        names (Iterable[str]): The object names of the original images.
+    """
+    conditions = [
+        condition
+        for name in names
+        for condition in (OutboxEvent.object_name == name, OutboxEvent.object_name.startswith(f"{name}.", autoescape=True))
+    ]
+    if conditions:
+        await session.execute(delete(OutboxEvent).where(OutboxEvent.bucket == bucket, or_(*conditions)))
+
+
+async def drain_once(
+    session_factory: Callable[[], AsyncSession] = async_session,
+    batch_size: int = OUTBOX_BATCH_SIZE
+) -> int:
+    """
+    Process one batch of due events.
+
+    Events are claimed with `FOR UPDATE SKIP LOCKED`, so any number of workers, in the API
+    processes or standalone, can drain the outbox side by side without claiming the same
+    event. Objects are removed with batched multi-object deletes. Removing an object that
+    is already gone succeeds, so an event processed twice after a crash does no harm.
+    Failed events are retried with exponential backoff, up to `OUTBOX_MAX_ATTEMPTS` times.
+
+    Args:
+        session_factory (Callable[[], AsyncSession]): Creates the session to claim events with.
+        batch_size (int): The maximum number of events to claim.
+
+    Returns:
+        int: The number of events claimed.
+    """
+    async with session_factory() as session:
+        async with session.begin():
+            result = await session.execute(
+                select(OutboxEvent.id, OutboxEvent.bucket, OutboxEvent.object_name)
+                .where(OutboxEvent.available_at <= func.now(), OutboxEvent.attempts < OUTBOX_MAX_ATTEMPTS)
+                .order_by(OutboxEvent.id)
+                .limit(batch_size)
+                .with_for_update(skip_locked=True)
+            )
+            events = result.all()
+
+            by_bucket = defaultdict(list)
+            for event in events:
+                by_bucket[event.bucket].append(event)
+            done, failed = [], []
+            for bucket, bucket_events in by_bucket.items():
+                names = list(dict.fromkeys(event.object_name for event in bucket_events))
+                failed_names = set(await storage.remove_objects(bucket, names))
+                for event in bucket_events:
+                    (failed if event.object_name in failed_names else done).append(event.id)
+
+            if done:
+                await session.execute(delete(OutboxEvent).where(OutboxEvent.id.in_(done)))
+            if failed:
+                delay = func.least(func.power(2, OutboxEvent.attempts), OUTBOX_MAX_RETRY_DELAY)
+                result = await session.execute(
+                    update(OutboxEvent)
+                    .where(OutboxEvent.id.in_(failed))
+                    .values(
+                        attempts=OutboxEvent.attempts + 1,
+                        available_at=func.now() + func.make_interval(0, 0, 0, 0, 0, 0, delay),
+                        last_error="Failed to remove object"
+                    )
+                    .returning(OutboxEvent.object_name, OutboxEvent.attempts)
+                )
+                exhausted = [name for name, attempts in result.all() if attempts >= OUTBOX_MAX_ATTEMPTS]
+                logger.warning("Failed to remove %d objects, will retry", len(failed))
+                if exhausted:
+                    logger.error("Giving up removing %d objects: %s", len(exhausted), exhausted)
+    return len(events)
+
+
+class OutboxWorkerPool:
+    """
+    Background tasks draining the outbox until stopped.
+
+    Each task drains batches back to back while there is a backlog, then sleeps until
+    `wake()` is called or `OUTBOX_POLL_INTERVAL` seconds pass, so events committed by
+    other processes are picked up too.
+    """
+
+    def __init__(
+        self,
+        workers: int = OUTBOX_WORKERS,
+        session_factory: Callable[[], AsyncSession] = async_session
+    ):
+        self.workers = workers
+        self.session_factory = session_factory
+        self.stopping = asyncio.Event()
+        self.tasks: List[asyncio.Task] = []
+
+    async def run(self) -> None:
+        while not self.stopping.is_set():
+            try:
+                claimed = await drain_once(self.session_factory)
+            except Exception:
+                logger.exception("Failed to drain the outbox")
+                claimed = 0
+            if claimed < OUTBOX_BATCH_SIZE and not self.stopping.is_set():
+                try:
+                    await asyncio.wait_for(wake_up.wait(), OUTBOX_POLL_INTERVAL)
+                except asyncio.TimeoutError:
+                    pass
+                wake_up.clear()
+
+    def start(self) -> None:
+        self.tasks = [asyncio.create_task(self.run()) for _ in range(self.workers)]
+
+    async def stop(self) -> None:
+        """Let the workers finish their current batch and wait for them to exit."""
+        self.stopping.set()
+        wake_up.set()
+        await asyncio.gather(*self.tasks)
+
+
+async def main() -> None:
+    pool = OutboxWorkerPool()
+    pool.start()
+    stopped = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(signum, stopped.set)
+    await stopped.wait()
+    await pool.stop()
+    await dispose_engines()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(main())
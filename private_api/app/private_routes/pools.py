@@ -0,0 +1,78 @@
+import asyncio
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+
+def cpu_share(limit: int) -> int:
+    """
+    Return the default number of workers for a process pool of this API process.
+
+    Gunicorn runs `WEB_CONCURRENCY` API processes, each with its own pools, so the CPUs
+    are split between them; the result is at least 1 and at most `limit`.
+    """
+    workers = max(1, int(os.getenv("WEB_CONCURRENCY", "1")))
+    return max(1, min(limit, (os.cpu_count() or 1) // workers))
+
+
+class WorkerPool:
+    """
+    A spawn-based process pool for CPU-bound image work whose tasks can be cut off.
+
+    `ProcessPoolExecutor` cannot stop a task a worker has started, so when a task runs
+    past its timeout the pool's workers are killed and a fresh pool takes over. Other
+    tasks running in the killed pool fail with `BrokenProcessPool` and are resubmitted
+    to the fresh one until their own time is up, so one hostile image cannot keep a
+    worker busy after its request has failed.
+    """
+
+    def __init__(self, max_workers: int):
+        self.max_workers = max_workers
+        self.executor = self.new_executor()
+
+    def new_executor(self) -> ProcessPoolExecutor:
+        return ProcessPoolExecutor(max_workers=self.max_workers, mp_context=multiprocessing.get_context("spawn"))
+
+    def recycle(self, stuck: ProcessPoolExecutor) -> None:
+        """Replace `stuck` with a fresh pool and kill its workers, unless that was done already."""
+        if self.executor is not stuck:
+            return
+        self.executor = self.new_executor()
+        # ProcessPoolExecutor has no public way to stop a busy worker before Python 3.14.
+        for process in list((stuck._processes or {}).values()):
+            process.kill()
+        stuck.shutdown(wait=False)
+
+    async def run(self, timeout: float, func, *args):
+        """
+        Run `func(*args)` in a worker process.
+
+        Args:
+            timeout (float): The number of seconds the task may take, including retries.
+            func: A picklable, module-level callable.
+            *args: Its picklable arguments.
+
+        Returns:
+            The callable's return value.
+
+        Raises:
+            asyncio.TimeoutError: If the time is up; the pool has been recycled.
+        """
+        deadline = time.monotonic() + timeout
+        while True:
+            executor = self.executor
+            try:
+                future = asyncio.wrap_future(executor.submit(func, *args))
+                return await asyncio.wait_for(future, max(deadline - time.monotonic(), 0))
+            except BrokenProcessPool:
+                self.recycle(executor)
+                if time.monotonic() >= deadline:
+                    raise asyncio.TimeoutError()
+            except asyncio.TimeoutError:
+                self.recycle(executor)
+                raise
+
+    def shutdown(self) -> None:
+        self.executor.shutdown()
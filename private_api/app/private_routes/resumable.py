@@ -0,0 +1,388 @@
+import asyncio
+import logging
+import math
+import os
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import Callable, List, Optional, Tuple
+
+from fastapi import HTTPException, Request, status
+from minio.error import S3Error
+from sqlalchemy import delete, func, select, update
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from db.dependencies import async_session
+from db.models import ResumableUpload, ResumableUploadPart
+from private_routes.uploads import (
+    UPLOAD_ID_PATTERN,
+    UPLOAD_PENDING_EXPIRY,
+    expired_pending_uploads,
+    finalize_upload,
+    pending_object_name
+)
+from s3 import storage
+
+RESUMABLE_CHUNK_SIZE = int(os.getenv("RESUMABLE_CHUNK_SIZE", str(8 * 1024 * 1024)))
+RESUMABLE_MAX_SIZE = int(os.getenv("RESUMABLE_MAX_SIZE", str(200 * 1024 * 1024)))
+RESUMABLE_EXPIRY = int(os.getenv("RESUMABLE_EXPIRY", str(24 * 3600)))
+RESUMABLE_MAX_INFLIGHT_PARTS = int(os.getenv("RESUMABLE_MAX_INFLIGHT_PARTS", "16"))
+RESUMABLE_SWEEP_INTERVAL = float(os.getenv("RESUMABLE_SWEEP_INTERVAL", "60"))
+RESUMABLE_SWEEP_BATCH_SIZE = 100
+
+# S3 limits: every part but the last must be at least 5 MiB, and an upload has at most 10000 parts.
+S3_MIN_PART_SIZE = 5 * 1024 * 1024
+S3_MAX_PARTS = 10000
+
+logger = logging.getLogger(__name__)
+
+# Chunks being received or sent to MinIO. Each one is held in memory, so further chunks
+# are turned away until a slot frees up.
+part_slots = asyncio.Semaphore(RESUMABLE_MAX_INFLIGHT_PARTS)
+
+
+def part_count(size: int, chunk_size: int) -> int:
+    """Return the number of chunks an upload of `size` bytes is split into."""
+    return max(1, math.ceil(size / chunk_size))
+
+
+def expiry_time() -> datetime:
+    return datetime.now(timezone.utc) + timedelta(seconds=RESUMABLE_EXPIRY)
+
+
+async def create_resumable_upload(session: AsyncSession, bucket: str, size: int) -> ResumableUpload:
+    """
+    Start a resumable upload backed by a MinIO multipart upload.
+
+    The chunk size is `RESUMABLE_CHUNK_SIZE`, raised if needed to stay within the S3
+    limits on the part size and count.
+
+    Args:
+        session (AsyncSession): The database session; the upload state is committed.
+        bucket (str): The destination bucket.
+        size (int): The total size of the file in bytes.
+
+    Returns:
+        ResumableUpload: The persisted upload state.
+
+    Raises:
+        HTTPException(413): If `size` exceeds `RESUMABLE_MAX_SIZE`.
+    """
+    if size > RESUMABLE_MAX_SIZE:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"Uploads are limited to {RESUMABLE_MAX_SIZE} bytes"
+        )
+    chunk_size = max(RESUMABLE_CHUNK_SIZE, S3_MIN_PART_SIZE, math.ceil(size / S3_MAX_PARTS))
+    upload_id = uuid.uuid4().hex
+    s3_upload_id = await storage.create_multipart_upload(bucket, pending_object_name(upload_id))
+    upload = ResumableUpload(
+        id=upload_id,
+        bucket=bucket,
+        s3_upload_id=s3_upload_id,
+        size=size,
+        chunk_size=chunk_size,
+        expires_at=expiry_time()
+    )
+    session.add(upload)
+    await session.commit()
+    return upload
+
+
+async def get_resumable_upload(session: AsyncSession, upload_id: str, lock: bool = False) -> ResumableUpload:
+    """
+    Load the state of an upload that has not expired.
+
+    Args:
+        session (AsyncSession): The database session.
+        upload_id (str): The upload ID.
+        lock (bool): Whether to lock the row until the transaction ends.
+
+    Raises:
+        HTTPException(404): If the upload is unknown, finished or expired.
+    """
+    upload = None
+    if UPLOAD_ID_PATTERN.match(upload_id):
+        query = select(ResumableUpload).where(ResumableUpload.id == upload_id, ResumableUpload.expires_at > func.now())
+        result = await session.execute(query.with_for_update() if lock else query)
+        upload = result.scalar()
+    if upload is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Upload not found")
+    return upload
+
+
+async def received_parts(session: AsyncSession, upload_id: str) -> List[Tuple[int, str]]:
+    """Return the (part number, ETag) pairs of the chunks received so far, in order."""
+    result = await session.execute(
+        select(ResumableUploadPart.part_number, ResumableUploadPart.etag)
+        .where(ResumableUploadPart.upload_id == upload_id)
+        .order_by(ResumableUploadPart.part_number)
+    )
+    return [tuple(row) for row in result.all()]
+
+
+async def read_chunk(request: Request, length: int) -> bytes:
+    """
+    Read a request body that must be exactly `length` bytes long.
+
+    Raises:
+        HTTPException(413): If the body is longer.
+        HTTPException(422): If the body is shorter, e.g. because the connection dropped.
+    """
+    chunks, received = [], 0
+    async for chunk in request.stream():
+        received += len(chunk)
+        if received > length:
+            raise HTTPException(
+                status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                detail=f"Chunk is larger than {length} bytes"
+            )
+        chunks.append(chunk)
+    if received != length:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail=f"Chunk must be {length} bytes long, got {received}"
+        )
+    return b"".join(chunks)
+
+
+async def upload_chunk(session: AsyncSession, request: Request, upload_id: str, offset: int) -> int:
+    """
+    Store the chunk starting at `offset` as one part of the multipart upload.
+
+    Chunks start at multiples of the chunk size and may be sent in any order and in
+    parallel; sending a chunk again replaces it. The database connection is released
+    while the chunk is received and passed on to MinIO, so slow clients do not tie
+    up the pool. Each chunk pushes the expiry of the upload back.
+
+    Args:
+        session (AsyncSession): The database session.
+        request (Request): The request carrying the chunk as its body.
+        upload_id (str): The upload ID.
+        offset (int): The position of the chunk in the file.
+
+    Returns:
+        int: The offset just past the chunk.
+
+    Raises:
+        HTTPException(404): If the upload is unknown, finished or expired.
+        HTTPException(409): If `offset` is not the start of a chunk.
+        HTTPException(413), HTTPException(422): If the chunk has the wrong length.
+        HTTPException(503): If too many chunks are in flight.
+    """
+    if part_slots.locked():
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Too many chunks are being uploaded, try again later",
+            headers={"Retry-After": "1"}
+        )
+    async with part_slots:
+        upload = await get_resumable_upload(session, upload_id)
+        bucket, s3_upload_id, size, chunk_size = upload.bucket, upload.s3_upload_id, upload.size, upload.chunk_size
+        await session.commit()
+
+        if offset < 0 or offset >= size or offset % chunk_size:
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT,
+                detail=f"Upload-Offset must be a multiple of {chunk_size} below {size}"
+            )
+        part_number = offset // chunk_size + 1
+        length = min(chunk_size, size - offset)
+        data = await read_chunk(request, length)
+        try:
+            etag = await storage.upload_part(bucket, pending_object_name(upload_id), s3_upload_id, part_number, data)
+        except S3Error as exc:
+            if exc.code == "NoSuchUpload":
+                raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Upload not found")
+            raise
+
+    stmt = insert(ResumableUploadPart).values(upload_id=upload_id, part_number=part_number, etag=etag, size=length)
+    await session.execute(stmt.on_conflict_do_update(
+        index_elements=[ResumableUploadPart.upload_id, ResumableUploadPart.part_number],
+        set_={"etag": stmt.excluded.etag, "size": stmt.excluded.size}
+    ))
+    await session.execute(update(ResumableUpload).where(ResumableUpload.id == upload_id).values(expires_at=expiry_time()))
+    try:
+        await session.commit()
+    except IntegrityError:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Upload not found")
+    return offset + length
+
+
+async def complete_resumable_upload(session: AsyncSession, upload_id: str) -> str:
+    """
+    Assemble the chunks of an upload and check the result like a direct upload.
+
+    The upload row stays locked until the caller commits, so a concurrent completion,
+    abort or sweep waits. The upload state is deleted in the caller's transaction; if
+    that transaction fails after the parts were assembled, completing again picks up
+    the assembled object.
+
+    Args:
+        session (AsyncSession): The database session; the caller commits it.
+        upload_id (str): The upload ID.
+
+    Returns:
+        str: The permanent object name of the image, see `finalize_upload`.
+
+    Raises:
+        HTTPException(404): If the upload is unknown, finished or expired.
+        HTTPException(409): If chunks are missing.
+        HTTPException(415): If the file is not a supported image; the upload is discarded.
+    """
+    upload = await get_resumable_upload(session, upload_id, lock=True)
+    bucket, pending = upload.bucket, pending_object_name(upload_id)
+    parts = await received_parts(session, upload_id)
+    missing = sorted(set(range(1, part_count(upload.size, upload.chunk_size) + 1)) - {number for number, _ in parts})
+    if missing:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=f"{len(missing)} chunks are missing, starting with part {missing[0]}"
+        )
+
+    try:
+        await storage.complete_multipart_upload(bucket, pending, upload.s3_upload_id, parts)
+    except S3Error as exc:
+        if exc.code != "NoSuchUpload" or await storage.stat_object(bucket, pending) is None:
+            raise
+    await session.execute(delete(ResumableUpload).where(ResumableUpload.id == upload_id))
+    try:
+        return await finalize_upload(bucket, upload_id, RESUMABLE_MAX_SIZE, expiry=None)
+    except HTTPException:
+        await session.commit()
+        raise
+
+
+async def abort_resumable_upload(session: AsyncSession, upload_id: str) -> None:
+    """
+    Discard an upload and the chunks stored so far.
+
+    Raises:
+        HTTPException(404): If the upload is unknown, finished or expired.
+    """
+    upload = await get_resumable_upload(session, upload_id, lock=True)
+    await storage.abort_multipart_upload(upload.bucket, pending_object_name(upload_id), upload.s3_upload_id)
+    await session.execute(delete(ResumableUpload).where(ResumableUpload.id == upload_id))
+    await session.commit()
+
+
+async def sweep_expired_uploads(
+    session_factory: Callable[[], AsyncSession] = async_session,
+    batch_size: int = RESUMABLE_SWEEP_BATCH_SIZE
+) -> int:
+    """
+    Abort one batch of uploads that expired without being completed.
+
+    Expired uploads are claimed with `FOR UPDATE SKIP LOCKED`, so every API process can
+    sweep without aborting the same upload twice. Uploads whose abort fails are kept
+    and retried on the next sweep.
+
+    Args:
+        session_factory (Callable[[], AsyncSession]): Creates the session to claim uploads with.
+        batch_size (int): The maximum number of uploads to abort.
+
+    Returns:
+        int: The number of uploads claimed.
+    """
+    async with session_factory() as session:
+        async with session.begin():
+            result = await session.execute(
+                select(ResumableUpload.id, ResumableUpload.bucket, ResumableUpload.s3_upload_id)
+                .where(ResumableUpload.expires_at <= func.now())
+                .order_by(ResumableUpload.expires_at)
+                .limit(batch_size)
+                .with_for_update(skip_locked=True)
+            )
+            uploads = result.all()
+            outcomes = await asyncio.gather(*(
+                storage.abort_multipart_upload(bucket, pending_object_name(upload_id), s3_upload_id)
+                for upload_id, bucket, s3_upload_id in uploads
+            ), return_exceptions=True)
+            aborted = [upload.id for upload, outcome in zip(uploads, outcomes) if not isinstance(outcome, Exception)]
+            if len(aborted) < len(uploads):
+                logger.warning("Failed to abort %d expired uploads, will retry", len(uploads) - len(aborted))
+            if aborted:
+                await session.execute(delete(ResumableUpload).where(ResumableUpload.id.in_(aborted)))
+    return len(uploads)
+
+
+async def sweep_pending_uploads(
+    bucket: str,
+    session_factory: Callable[[], AsyncSession] = async_session,
+    expiry: int = UPLOAD_PENDING_EXPIRY
+) -> int:
+    """
+    Remove the pending objects of uploads that were never finalized.
+
+    A client may upload with a presigned URL and never finalize, and a resumable upload
+    may be assembled by a completion whose transaction then fails, which would leave
+    the pending object behind for good. Pending objects `expiry` seconds old are
+    removed, except those of resumable uploads still in progress, whose age says
+    nothing about the upload: they are removed once the upload expires. Direct uploads
+    that old can no longer be finalized, so a finalize cannot race with the removal.
+    Objects that could not be removed are retried on the next sweep.
+
+    Args:
+        bucket (str): The bucket holding the uploads.
+        session_factory (Callable[[], AsyncSession]): Creates the session to look up resumable uploads with.
+        expiry (int): The number of seconds a pending object may wait to be finalized.
+
+    Returns:
+        int: The number of pending objects removed.
+    """
+    expired = await expired_pending_uploads(bucket, expiry)
+    if not expired:
+        return 0
+    async with session_factory() as session:
+        result = await session.execute(select(ResumableUpload.id).where(ResumableUpload.id.in_(expired)))
+        in_progress = set(result.scalars())
+    abandoned = [pending_object_name(upload_id) for upload_id in expired if upload_id not in in_progress]
+    failed = await storage.remove_objects(bucket, abandoned)
+    if failed:
+        logger.warning("Failed to remove %d abandoned pending uploads, will retry", len(failed))
+    return len(abandoned) - len(failed)
+
+
+class UploadSweeper:
+    """
+    A background task cleaning up abandoned uploads every `RESUMABLE_SWEEP_INTERVAL` seconds.
+
+    Each sweep aborts expired resumable uploads and removes the pending objects of
+    uploads that were never finalized.
+    """
+
+    def __init__(
+        self,
+        session_factory: Callable[[], AsyncSession] = async_session,
+        bucket: Optional[str] = None
+    ):
+        self.session_factory = session_factory
+        self.bucket = bucket or os.getenv("MINIO_BUCKET_NAME", "memes")
+        self.stopping = asyncio.Event()
+        self.task: Optional[asyncio.Task] = None
+
+    async def run(self) -> None:
+        while not self.stopping.is_set():
+            try:
+                claimed = await sweep_expired_uploads(self.session_factory)
+            except Exception:
+                logger.exception("Failed to sweep expired uploads")
+                claimed = 0
+            try:
+                await sweep_pending_uploads(self.bucket, self.session_factory)
+            except Exception:
+                logger.exception("Failed to sweep pending uploads")
+            if claimed < RESUMABLE_SWEEP_BATCH_SIZE:
+                try:
+                    await asyncio.wait_for(self.stopping.wait(), RESUMABLE_SWEEP_INTERVAL)
+                except asyncio.TimeoutError:
+                    pass
+
+    def start(self) -> None:
+        self.task = asyncio.create_task(self.run())
+
+    async def stop(self) -> None:
+        self.stopping.set()
+        if self.task is not None:
+            await self.task
@@ -0,0 +1,353 @@
+import asyncio
+import logging
+import os
+import time
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+from PIL import Image
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from db.dependencies import async_session
+from db.models import Meme
+from private_routes.spooling import ImageSource, open_image
+
+HASH_SIZE = 8
+SIMILARITY_MAX_DISTANCE = int(os.getenv("SIMILARITY_MAX_DISTANCE", "10"))
+SIMILARITY_DUPLICATE_DISTANCE = int(os.getenv("SIMILARITY_DUPLICATE_DISTANCE", "4"))
+SIMILARITY_INDEX_TTL = float(os.getenv("SIMILARITY_INDEX_TTL", "300"))
+SIMILARITY_LOAD_BATCH_SIZE = 100_000
+SIMILARITY_DUPLICATE_CANDIDATES = 5
+
+# Masks of the SWAR bit count, for NumPy builds without `bitwise_count` (before 2.0).
+M1, M2, M4, H01 = (np.uint64(mask) for mask in (
+    0x5555555555555555, 0x3333333333333333, 0x0F0F0F0F0F0F0F0F, 0x0101010101010101
+))
+
+logger = logging.getLogger(__name__)
+
+
+def perceptual_hash(source: ImageSource) -> int:
+    """
+    Compute the 64-bit difference hash (dHash) of an image.
+
+    The image is reduced to a 9x8 grayscale thumbnail and each bit records whether a
+    pixel is brighter than its right neighbour, so the hash survives recompression,
+    resizing and small crops or colour changes. JPEG images are decoded at a reduced
+    scale. This runs in a worker process, so it takes a path or plain bytes.
+
+    Args:
+        source (ImageSource): The image.
+
+    Returns:
+        int: The hash as an unsigned 64-bit integer.
+    """
+    with open_image(source) as img:
+        img.draft("L", (HASH_SIZE * 16, HASH_SIZE * 16))
+        small = img.convert("L").resize((HASH_SIZE + 1, HASH_SIZE), Image.Resampling.BOX)
+    pixels = np.asarray(small, dtype=np.int16)
+    bits = np.packbits(pixels[:, 1:] > pixels[:, :-1])
+    return int.from_bytes(bits.tobytes(), "big")
+
+
+def to_signed(phash: int) -> int:
+    """Convert an unsigned 64-bit hash to the signed value stored in the BIGINT column."""
+    return phash - (1 << 64) if phash >= 1 << 63 else phash
+
+
+def to_unsigned(value: int) -> int:
+    """Convert a BIGINT column value back to the unsigned 64-bit hash."""
+    return value & ((1 << 64) - 1)
+
+
+def hamming_distances(hashes: np.ndarray, phash: int) -> np.ndarray:
+    """Return the number of differing bits between each of the `uint64` hashes and `phash`."""
+    x = np.bitwise_xor(hashes, np.uint64(phash))
+    if hasattr(np, "bitwise_count"):
+        return np.bitwise_count(x)
+    x -= (x >> np.uint64(1)) & M1
+    x = (x & M2) + ((x >> np.uint64(2)) & M2)
+    x = (x + (x >> np.uint64(4))) & M4
+    return ((x * H01) >> np.uint64(56)).astype(np.uint8)
+
+
+class HammingIndex:
+    """
+    Perceptual hashes of memes packed into NumPy arrays for brute-force Hamming search.
+
+    A query XORs the 64-bit hashes of all memes with the query hash and counts the set
+    bits in a single vectorized pass, which scans millions of hashes in milliseconds
+    and, unlike a BK-tree, costs the same for any distance threshold. The index takes
+    16 bytes per meme. Removed or replaced entries are only masked out; the arrays are
+    compacted on the next full load.
+    """
+
+    def __init__(self):
+        self.ids = np.empty(0, dtype=np.int64)
+        self.hashes = np.empty(0, dtype=np.uint64)
+        self.size = 0
+
+    def __len__(self) -> int:
+        return int(np.count_nonzero(self.ids[:self.size] >= 0))
+
+    def add_many(self, ids: np.ndarray, hashes: np.ndarray, replace: bool = True) -> None:
+        """
+        Append memes' hashes.
+
+        Args:
+            ids (np.ndarray): The meme IDs, as `int64`.
+            hashes (np.ndarray): Their hashes, as `uint64`.
+            replace (bool): Whether some of the memes may be indexed already; their old
+                entries are masked out. Pass False when loading into an empty index.
+        """
+        if replace and self.size:
+            live = self.ids[:self.size]
+            live[np.isin(live, ids)] = -1
+        required = self.size + len(ids)
+        if required > len(self.ids):
+            capacity = max(1024, required, 2 * len(self.ids))
+            self.ids = np.resize(self.ids, capacity)
+            self.hashes = np.resize(self.hashes, capacity)
+        self.ids[self.size:required] = ids
+        self.hashes[self.size:required] = hashes
+        self.size = required
+
+    def add(self, meme_id: int, phash: int) -> None:
+        """Add a meme's hash, or replace it if the meme is indexed already."""
+        self.add_many(np.array([meme_id], dtype=np.int64), np.array([phash], dtype=np.uint64))
+
+    def remove(self, meme_ids: Iterable[int]) -> None:
+        live = self.ids[:self.size]
+        live[np.isin(live, np.fromiter(meme_ids, dtype=np.int64))] = -1
+
+    def search(
+        self,
+        phash: int,
+        max_distance: int = SIMILARITY_MAX_DISTANCE,
+        limit: int = 10,
+        exclude: Optional[int] = None
+    ) -> List[Tuple[int, int]]:
+        """
+        Find the memes whose hashes differ from `phash` in at most `max_distance` bits.
+
+        Args:
+            phash (int): The unsigned 64-bit hash to look for.
+            max_distance (int): The maximum Hamming distance.
+            limit (int): The maximum number of matches.
+            exclude (int, optional): A meme ID to leave out, e.g. the meme being compared.
+
+        Returns:
+            List[Tuple[int, int]]: The (meme ID, distance) pairs, closest first, then by ID.
+        """
+        ids = self.ids[:self.size]
+        distances = hamming_distances(self.hashes[:self.size], phash)
+        found = (distances <= max_distance) & (ids >= 0)
+        if exclude is not None:
+            found &= ids != exclude
+        matches = np.flatnonzero(found)
+        if len(matches) > limit:
+            closest = np.argpartition(distances[matches], limit - 1)[:limit]
+            matches = matches[closest]
+        order = np.lexsort((ids[matches], distances[matches]))
+        return [(int(ids[index]), int(distances[index])) for index in matches[order]]
+
+
+class MemeIndex:
+    """
+    The similarity index of this process, kept in step with the `memes` table.
+
+    The index is loaded on first use. Before every query, memes inserted since the last
+    load, by any process, are fetched by ID range; writes made by this process update
+    the index directly. Changes made by other processes to existing memes are picked up
+    by a full reload every `SIMILARITY_INDEX_TTL` seconds, and callers double-check the
+    matches against the database. The reload runs in a background task with its own
+    session while queries keep using the current index; writes made by this process in
+    the meantime are replayed on the new index before it is swapped in.
+    """
+
+    def __init__(self, session_factory: Callable[[], AsyncSession] = async_session):
+        self.session_factory = session_factory
+        self.index = HammingIndex()
+        self.loaded_id = 0
+        self.loaded_at: Optional[float] = None
+        self.lock = asyncio.Lock()
+        self.reloading: Optional[asyncio.Task] = None
+        self.changes: List[Tuple[List[int], Optional[int]]] = []
+
+    async def load(self, session: AsyncSession, index: HammingIndex, loaded_id: int, replace: bool) -> int:
+        """Add the hashes of memes with IDs above `loaded_id` to `index` and return the last ID loaded."""
+        result = await session.stream(
+            select(Meme.id, Meme.phash)
+            .where(Meme.id > loaded_id, Meme.phash.is_not(None))
+            .order_by(Meme.id)
+            .execution_options(yield_per=SIMILARITY_LOAD_BATCH_SIZE)
+        )
+        async for partition in result.partitions():
+            ids = np.fromiter((row[0] for row in partition), dtype=np.int64, count=len(partition))
+            hashes = np.fromiter((row[1] for row in partition), dtype=np.int64, count=len(partition))
+            index.add_many(ids, hashes.view(np.uint64), replace=replace)
+            loaded_id = int(ids[-1])
+        return loaded_id
+
+    async def refresh(self, session: AsyncSession) -> HammingIndex:
+        """
+        Bring the index up to date and return it.
+
+        The first call loads the whole index; later calls only fetch new memes and, once
+        the index is older than `SIMILARITY_INDEX_TTL`, start a background reload.
+        """
+        async with self.lock:
+            if self.loaded_at is None:
+                started = time.monotonic()
+                self.index, self.loaded_id = HammingIndex(), 0
+                self.loaded_id = await self.load(session, self.index, 0, replace=False)
+                self.loaded_at = started
+            else:
+                self.loaded_id = await self.load(session, self.index, self.loaded_id, replace=True)
+                if time.monotonic() - self.loaded_at > SIMILARITY_INDEX_TTL and self.reloading is None:
+                    self.changes = []
+                    self.reloading = asyncio.create_task(self.reload())
+            return self.index
+
+    async def reload(self) -> None:
+        """Load a fresh index, replay the writes made meanwhile and swap it in."""
+        try:
+            started = time.monotonic()
+            index = HammingIndex()
+            async with self.session_factory() as session:
+                loaded_id = await self.load(session, index, 0, replace=False)
+                async with self.lock:
+                    loaded_id = await self.load(session, index, loaded_id, replace=True)
+                    for meme_ids, phash in self.changes:
+                        self.apply(index, meme_ids, phash)
+                    self.index, self.loaded_id, self.loaded_at = index, loaded_id, started
+        except Exception:
+            logger.exception("Failed to reload the similarity index")
+        finally:
+            if self.reloading is asyncio.current_task():
+                self.changes, self.reloading = [], None
+
+    def reset(self) -> None:
+        """Forget all hashes; the next query loads them again."""
+        if self.reloading is not None:
+            self.reloading.cancel()
+            self.reloading = None
+        self.index, self.loaded_id, self.loaded_at, self.changes = HammingIndex(), 0, None, []
+
+    @staticmethod
+    def apply(index: HammingIndex, meme_ids: List[int], phash: Optional[int]) -> None:
+        if phash is None:
+            index.remove(meme_ids)
+        else:
+            index.add(meme_ids[0], phash)
+
+    def record(self, meme_ids: List[int], phash: Optional[int]) -> None:
+        self.apply(self.index, meme_ids, phash)
+        if self.reloading is not None:
+            self.changes.append((meme_ids, phash))
+
+    def add(self, meme_id: int, phash: Optional[int]) -> None:
+        self.record([meme_id], phash)
+
+    def remove(self, meme_ids: Iterable[int]) -> None:
+        self.record(list(meme_ids), None)
+
+
+meme_index = MemeIndex()
+
+
+async def find_similar(
+    session: AsyncSession,
+    phash: int,
+    max_distance: int = SIMILARITY_MAX_DISTANCE,
+    limit: int = 10,
+    exclude: Optional[int] = None
+) -> List[Tuple[Meme, int]]:
+    """
+    Find the memes whose images look like the given hash.
+
+    Candidates come from the in-memory index and are checked against the current rows,
+    so memes deleted or changed by another process since the last load are not reported.
+    If stale candidates leave fewer than `limit` matches, more candidates are fetched.
+
+    Args:
+        session (AsyncSession): The database session.
+        phash (int): The unsigned 64-bit perceptual hash.
+        max_distance (int): The maximum Hamming distance.
+        limit (int): The maximum number of memes to return.
+        exclude (int, optional): A meme ID to leave out.
+
+    Returns:
+        List[Tuple[Meme, int]]: The memes and their distances, closest first.
+    """
+    index = await meme_index.refresh(session)
+    memes: Dict[int, Optional[Meme]] = {}
+    search_limit = limit
+    while True:
+        candidates = index.search(phash, max_distance, search_limit, exclude)
+        unchecked = [meme_id for meme_id, _ in candidates if meme_id not in memes]
+        if unchecked:
+            result = await session.execute(select(Meme).where(Meme.id.in_(unchecked)))
+            found = {meme.id: meme for meme in result.scalars()}
+            memes.update((meme_id, found.get(meme_id)) for meme_id in unchecked)
+        matches = []
+        for meme_id, _ in candidates:
+            meme = memes[meme_id]
+            if meme is not None and meme.phash is not None:
+                distance = bin(to_unsigned(meme.phash) ^ phash).count("1")
+                if distance <= max_distance:
+                    matches.append((meme, distance))
+        if len(matches) >= limit or len(candidates) < search_limit:
+            return sorted(matches, key=lambda match: (match[1], match[0].id))[:limit]
+        search_limit *= 2
+
+
+async def find_duplicates(
+    session: AsyncSession,
+    hashes: Dict[int, int],
+    max_distance: int = SIMILARITY_DUPLICATE_DISTANCE
+) -> Dict[int, int]:
+    """
+    Find an existing near-duplicate for each of several images with few database round-trips.
+
+    The `SIMILARITY_DUPLICATE_CANDIDATES` closest candidates of every image are checked
+    against the current rows in one query. Images whose candidates all turned out to be
+    deleted or changed by another process are searched again with twice as many
+    candidates, until a live duplicate is found or the index has no more candidates.
+
+    Args:
+        session (AsyncSession): The database session.
+        hashes (Dict[int, int]): The perceptual hashes of the images, keyed by e.g. their
+            position in the request.
+        max_distance (int): The maximum Hamming distance of a near-duplicate.
+
+    Returns:
+        Dict[int, int]: The ID of the closest near-duplicate meme, keyed like `hashes`,
+        for the images that have one.
+    """
+    index = await meme_index.refresh(session)
+    current: Dict[int, Optional[int]] = {}
+    duplicates = {}
+    remaining = dict(hashes)
+    limit = SIMILARITY_DUPLICATE_CANDIDATES
+    while remaining:
+        candidates = {key: index.search(phash, max_distance, limit) for key, phash in remaining.items()}
+        unchecked = {meme_id for matches in candidates.values() for meme_id, _ in matches} - current.keys()
+        if unchecked:
+            result = await session.execute(
+                select(Meme.id, Meme.phash).where(Meme.id.in_(unchecked), Meme.phash.is_not(None))
+            )
+            found = {meme_id: to_unsigned(phash) for meme_id, phash in result.all()}
+            current.update((meme_id, found.get(meme_id)) for meme_id in unchecked)
+        for key, matches in candidates.items():
+            for meme_id, _ in matches:
+                if current[meme_id] is not None and bin(current[meme_id] ^ hashes[key]).count("1") <= max_distance:
+                    duplicates[key] = meme_id
+                    break
+        remaining = {
+            key: hashes[key] for key, matches in candidates.items()
+            if key not in duplicates and len(matches) == limit
+        }
+        limit *= 2
+    return duplicates
@@ -0,0 +1,64 @@
+import asyncio
+import shutil
+import tempfile
+from io import BytesIO
+from typing import Union
+
+from fastapi import UploadFile
+from PIL import Image
+
+from s3 import storage
+
+SPOOL_COPY_CHUNK_SIZE = 1024 * 1024
+
+# What a worker process opens an uploaded image from: the path of a file on disk or,
+# for uploads small enough to still be held in memory by the spooled file, the bytes.
+ImageSource = Union[str, bytes]
+
+
+def open_image(source: ImageSource) -> Image.Image:
+    """Open an image from an `ImageSource`, lazily like `Image.open`."""
+    return Image.open(BytesIO(source) if isinstance(source, bytes) else source)
+
+
+def spool_to_named_file(file: UploadFile) -> str:
+    """Copy the upload into a named temporary file, use it as the upload's file and return its path."""
+    named = tempfile.NamedTemporaryFile(prefix="upload-")
+    file.file.seek(0)
+    shutil.copyfileobj(file.file, named, SPOOL_COPY_CHUNK_SIZE)
+    named.flush()
+    named.seek(0)
+    file.file.close()
+    file.file = named
+    return named.name
+
+
+async def image_source(file: UploadFile) -> ImageSource:
+    """
+    Return what a worker process needs to open an uploaded image.
+
+    Uploads the spooled file still holds in memory are small and passed as bytes. Larger
+    ones sit in an anonymous temporary file that another process cannot open, so the
+    first call copies them in chunks, on the storage thread pool, into a named temporary
+    file that replaces the upload's file; later calls for the same upload return its
+    path at once. Neither the API process nor the workers read a large image into
+    memory or pickle it. The named file is deleted when the upload is closed at the
+    end of the request.
+
+    Args:
+        file (UploadFile): The uploaded file.
+
+    Returns:
+        ImageSource: The path of the image or, for small uploads, its bytes.
+    """
+    name = getattr(file.file, "name", None)
+    if isinstance(name, str):
+        return name
+    # The same check as `UploadFile._in_memory`: plain file objects count as on disk.
+    if not getattr(file.file, "_rolled", True):
+        file.file.seek(0)
+        data = file.file.read()
+        file.file.seek(0)
+        return data
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(storage.executor, spool_to_named_file, file)
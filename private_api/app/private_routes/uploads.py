@@ -0,0 +1,146 @@
+import os
+import re
+import uuid
+from datetime import datetime, timedelta, timezone
+from io import BytesIO
+from typing import List, Optional, Tuple
+
+from fastapi import HTTPException, status
+from PIL import Image, UnidentifiedImageError
+
+from s3 import storage
+
+UPLOAD_URL_EXPIRY = int(os.getenv("UPLOAD_URL_EXPIRY", "900"))
+UPLOAD_MAX_SIZE = int(os.getenv("UPLOAD_MAX_SIZE", str(20 * 1024 * 1024)))
+UPLOAD_PENDING_EXPIRY = int(os.getenv("UPLOAD_PENDING_EXPIRY", "3600"))
+UPLOAD_SNIFF_SIZE = 64 * 1024
+UPLOAD_PREFIX = "pending-"
+UPLOAD_FORMATS = {"PNG": "image/png", "JPEG": "image/jpeg", "GIF": "image/gif", "WEBP": "image/webp"}
+
+UPLOAD_ID_PATTERN = re.compile(r"^[0-9a-f]{32}$")
+
+
+def pending_object_name(upload_id: str) -> str:
+    """Return the object name a direct upload is written to before it is finalized."""
+    return f"{UPLOAD_PREFIX}{upload_id}"
+
+
+def issue_upload(bucket: str) -> Tuple[str, str, datetime]:
+    """
+    Reserve an object for a direct upload and sign a PUT URL for it.
+
+    Args:
+        bucket (str): The destination bucket.
+
+    Returns:
+        Tuple[str, str, datetime]: The upload ID, the presigned PUT URL and its expiry time.
+    """
+    upload_id = uuid.uuid4().hex
+    expires = timedelta(seconds=UPLOAD_URL_EXPIRY)
+    url = storage.presigned_put_url(bucket, pending_object_name(upload_id), expires)
+    return upload_id, url, datetime.now(timezone.utc) + expires
+
+
+def pending_expired(last_modified: datetime, expiry: int = UPLOAD_PENDING_EXPIRY) -> bool:
+    """Tell whether a pending object written at `last_modified` has waited too long to be finalized."""
+    return last_modified <= datetime.now(timezone.utc) - timedelta(seconds=expiry)
+
+
+async def expired_pending_uploads(bucket: str, expiry: int = UPLOAD_PENDING_EXPIRY) -> List[str]:
+    """
+    List the uploads whose pending object has waited `expiry` seconds or more to be finalized.
+
+    Args:
+        bucket (str): The bucket holding the uploads.
+        expiry (int): The number of seconds a pending object may wait to be finalized.
+
+    Returns:
+        List[str]: The upload IDs.
+    """
+    return [
+        obj.object_name[len(UPLOAD_PREFIX):] for obj in await storage.list_objects(bucket, UPLOAD_PREFIX)
+        if obj.last_modified is not None and pending_expired(obj.last_modified, expiry)
+    ]
+
+
+def sniff_image(head: bytes) -> str:
+    """
+    Identify an image from its leading bytes.
+
+    Pillow only parses the header when opening an image, so the first bytes of the
+    object are enough to tell the format and dimensions.
+
+    Args:
+        head (bytes): The first bytes of the object.
+
+    Returns:
+        str: The content type of the image.
+
+    Raises:
+        HTTPException(415): If the bytes are not the header of a supported image.
+    """
+    try:
+        with Image.open(BytesIO(head)) as img:
+            image_format = img.format
+            width, height = img.size
+    except (UnidentifiedImageError, IOError, SyntaxError):
+        image_format, width, height = None, 0, 0
+    if image_format not in UPLOAD_FORMATS or not width or not height:
+        raise HTTPException(
+            status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE,
+            detail="Uploaded file is not an image"
+        )
+    return UPLOAD_FORMATS[image_format]
+
+
+async def finalize_upload(
+    bucket: str,
+    upload_id: str,
+    max_size: int = UPLOAD_MAX_SIZE,
+    expiry: Optional[int] = UPLOAD_PENDING_EXPIRY
+) -> str:
+    """
+    Check a directly uploaded object and move it to its permanent name.
+
+    The object is inspected with a ranged GET of its first bytes, so the image body never
+    passes through the API, and is then copied on the MinIO side to the upload ID with the
+    sniffed content type. Rejected and finalized pending objects are removed. Pending objects
+    older than `expiry` seconds are turned away, since the upload sweeper removes them.
+
+    Args:
+        bucket (str): The bucket holding the upload.
+        upload_id (str): The ID returned when the upload URL was issued.
+        max_size (int): The maximum size of the object in bytes.
+        expiry (Optional[int]): The number of seconds the object may wait to be finalized,
+            or None if its age does not matter.
+
+    Returns:
+        str: The permanent object name of the image.
+
+    Raises:
+        HTTPException(404): If the upload ID is unknown, nothing was uploaded yet or the
+            upload has expired.
+        HTTPException(413): If the object is larger than `max_size`.
+        HTTPException(415): If the object is not a supported image.
+    """
+    if not UPLOAD_ID_PATTERN.match(upload_id):
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Upload not found")
+    pending = pending_object_name(upload_id)
+    stat = await storage.stat_object(bucket, pending)
+    if stat is None or (expiry is not None and pending_expired(stat.last_modified, expiry)):
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Upload not found")
+
+    try:
+        if stat.size > max_size:
+            raise HTTPException(
+                status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                detail=f"Uploaded file is larger than {max_size} bytes"
+            )
+        content_type = sniff_image(await storage.get_range(bucket, pending, 0, UPLOAD_SNIFF_SIZE))
+    except HTTPException:
+        await storage.remove_object(bucket_name=bucket, object_name=pending)
+        raise
+
+    await storage.copy_object(bucket, upload_id, pending, content_type)
+    await storage.remove_object(bucket_name=bucket, object_name=pending)
+    return upload_id
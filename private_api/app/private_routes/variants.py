@@ -0,0 +1,122 @@
+import asyncio
+import os
+from io import BytesIO
+from typing import Dict, List, Tuple
+
+from fastapi import HTTPException, UploadFile, status
+from PIL import Image
+
+from private_routes.pools import WorkerPool, cpu_share
+from private_routes.spooling import ImageSource, image_source, open_image
+from s3 import storage
+from s3.urls import image_url
+
+try:
+    import pillow_avif  # noqa: F401  registers the AVIF codec with Pillow
+except ImportError:
+    pass
+
+VARIANT_WORKERS = int(os.getenv("VARIANT_WORKERS", str(cpu_share(2))))
+VARIANT_TIMEOUT = float(os.getenv("VARIANT_TIMEOUT", "30"))
+VARIANT_SIZES = {"thumb": 320, "medium": 960}
+VARIANT_FORMATS = {"webp": ("WEBP", "image/webp"), "avif": ("AVIF", "image/avif")}
+
+pool = WorkerPool(VARIANT_WORKERS)
+
+
+def supported_formats() -> Dict[str, Tuple[str, str]]:
+    """Return the variant formats the installed Pillow build can encode."""
+    return {name: spec for name, spec in VARIANT_FORMATS.items() if spec[0] in Image.SAVE}
+
+
+def render_variants(source: ImageSource) -> Dict[str, Tuple[bytes, str]]:
+    """
+    Render the resized and re-encoded variants of an image.
+
+    This runs in a worker process, so it takes a path or plain bytes and returns plain bytes.
+
+    Args:
+        source (ImageSource): The original image.
+
+    Returns:
+        Dict[str, Tuple[bytes, str]]: The encoded variants keyed by name, e.g. "thumb.webp",
+        with their content types.
+    """
+    with open_image(source) as original:
+        original.load()
+        mode = "RGBA" if "A" in original.getbands() else "RGB"
+        image = original.convert(mode)
+
+    variants = {}
+    for size_name, size in VARIANT_SIZES.items():
+        resized = image.copy()
+        resized.thumbnail((size, size), Image.Resampling.LANCZOS)
+        for format_name, (pillow_format, content_type) in supported_formats().items():
+            output = BytesIO()
+            resized.save(output, format=pillow_format, quality=80)
+            variants[f"{size_name}.{format_name}"] = (output.getvalue(), content_type)
+    return variants
+
+
+def variant_object_name(file_name: str, variant: str) -> str:
+    """Return the object name a variant is stored under, next to the original."""
+    return f"{file_name}.{variant}"
+
+
+def variant_object_names(file_name: str) -> List[str]:
+    """Return the object names of all variants that may be stored for an image."""
+    return [
+        variant_object_name(file_name, f"{size_name}.{format_name}")
+        for size_name in VARIANT_SIZES for format_name in VARIANT_FORMATS
+    ]
+
+
+async def generate_variants(bucket: str, file_name: str, file: UploadFile) -> Dict[str, str]:
+    """
+    Render the variants of an uploaded image in the process pool and store them.
+
+    The worker opens the spooled file itself, see `image_source`. `verify` does not
+    decode the pixel data, so an image that passed verification can still fail here,
+    e.g. a truncated JPEG.
+
+    Args:
+        bucket (str): The destination bucket.
+        file_name (str): The object name of the original image.
+        file (UploadFile): The uploaded, already verified image.
+
+    Returns:
+        Dict[str, str]: The URLs of the stored variants keyed by variant name.
+
+    Raises:
+        HTTPException(415): If the image cannot be decoded.
+        HTTPException(503): If rendering takes longer than `VARIANT_TIMEOUT` seconds.
+    """
+    source = await image_source(file)
+    try:
+        rendered = await pool.run(VARIANT_TIMEOUT, render_variants, source)
+    except asyncio.TimeoutError:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Image took too long to resize"
+        )
+    except (OSError, SyntaxError, ValueError, Image.DecompressionBombError):
+        raise HTTPException(
+            status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE,
+            detail="Uploaded file is not an image"
+        )
+
+    async def store(variant: str, content: bytes, content_type: str) -> Tuple[str, str]:
+        name = variant_object_name(file_name, variant)
+        await storage.put_object(
+            bucket_name=bucket,
+            object_name=name,
+            data=BytesIO(content),
+            length=len(content),
+            content_type=content_type
+        )
+        return variant, image_url(bucket, name)
+
+    stored = await asyncio.gather(*(
+        store(variant, content, content_type) for variant, (content, content_type) in rendered.items()
+    ))
+    return dict(stored)
@@ -0,0 +1,121 @@
+import asyncio
+import os
+import time
+from typing import Optional, Tuple
+
+from fastapi import HTTPException, UploadFile, status
+from PIL import Image
+
+from metrics.collectors import IMAGE_VERIFY_DURATION
+from private_routes.pools import WorkerPool, cpu_share
+from private_routes.similarity import perceptual_hash
+from private_routes.spooling import ImageSource, image_source, open_image
+
+VERIFY_WORKERS = int(os.getenv("VERIFY_WORKERS", str(cpu_share(4))))
+VERIFY_QUEUE_SIZE = int(os.getenv("VERIFY_QUEUE_SIZE", str(VERIFY_WORKERS * 4)))
+VERIFY_TIMEOUT = float(os.getenv("VERIFY_TIMEOUT", "5"))
+VERIFY_MAX_PIXELS = int(os.getenv("VERIFY_MAX_PIXELS", str(50_000_000)))
+VERIFY_MAX_DIMENSION = int(os.getenv("VERIFY_MAX_DIMENSION", "20000"))
+
+pool = WorkerPool(VERIFY_WORKERS)
+
+# Images being verified or waiting for a worker. A slot is given back when the request
+# is done with the image; an image that timed out has had its worker killed by then.
+slots = asyncio.Semaphore(VERIFY_QUEUE_SIZE)
+
+
+def check_image(source: ImageSource, max_pixels: int, max_dimension: int) -> Optional[Tuple[int, str]]:
+    """
+    Check that a file is a valid image within the size limits.
+
+    This runs in a worker process, so it takes a path or plain bytes and returns the
+    error as plain data. The dimensions are read from the header and checked before the
+    image data is parsed, so oversized images and decompression bombs are rejected early.
+
+    Args:
+        source (ImageSource): The uploaded file.
+        max_pixels (int): The maximum number of pixels.
+        max_dimension (int): The maximum width and height.
+
+    Returns:
+        Optional[Tuple[int, str]]: The HTTP status and detail of the error, or None if
+        the image is valid.
+    """
+    try:
+        with open_image(source) as img:
+            width, height = img.size
+            if width > max_dimension or height > max_dimension or width * height > max_pixels:
+                return status.HTTP_413_REQUEST_ENTITY_TOO_LARGE, "Image dimensions exceed the allowed limits"
+            img.verify()
+    except Image.DecompressionBombError:
+        return status.HTTP_413_REQUEST_ENTITY_TOO_LARGE, "Image dimensions exceed the allowed limits"
+    except (IOError, SyntaxError, ValueError):
+        return status.HTTP_415_UNSUPPORTED_MEDIA_TYPE, "Uploaded file is not an image"
+    return None
+
+
+def inspect_image(source: ImageSource, max_pixels: int, max_dimension: int) -> Tuple[Optional[Tuple[int, str]], Optional[int]]:
+    """
+    Check an image with `check_image` and compute its perceptual hash if it is valid.
+
+    Returns:
+        Tuple[Optional[Tuple[int, str]], Optional[int]]: The error, as returned by
+        `check_image`, and the perceptual hash, which is None if there is an error.
+    """
+    error = check_image(source, max_pixels, max_dimension)
+    if error is not None:
+        return error, None
+    try:
+        return None, perceptual_hash(source)
+    except (IOError, SyntaxError, ValueError):
+        return (status.HTTP_415_UNSUPPORTED_MEDIA_TYPE, "Uploaded file is not an image"), None
+
+
+async def verify_image(file: UploadFile, wait: bool = False) -> int:
+    """
+    Check that the uploaded file is a valid image and compute its perceptual hash, in the
+    verification process pool.
+
+    At most `VERIFY_QUEUE_SIZE` images are verified or queued at a time; further uploads
+    are turned away at once instead of piling up behind them, unless `wait` is set. The
+    workers open the spooled file themselves, see `image_source`, so large images are
+    neither read into memory nor copied to the pool. An image taking longer than
+    `VERIFY_TIMEOUT` seconds has its worker killed, see `WorkerPool`. The file position
+    is rewound afterwards.
+
+    Args:
+        file (UploadFile): The uploaded file.
+        wait (bool): Whether to wait for a free slot instead of failing, e.g. for the
+            items of a batch, which already limits its own parallelism.
+
+    Returns:
+        int: The perceptual hash of the image, see `similarity.perceptual_hash`.
+
+    Raises:
+        HTTPException(413): If the image exceeds the pixel or dimension limits.
+        HTTPException(415): If the file is not an image.
+        HTTPException(503): If the verification pool is at capacity, or verification
+            takes too long.
+    """
+    if slots.locked() and not wait:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Too many images are being verified, try again later",
+            headers={"Retry-After": "1"}
+        )
+    async with slots:
+        source = await image_source(file)
+        file.file.seek(0)
+        started = time.perf_counter()
+        try:
+            error, phash = await pool.run(VERIFY_TIMEOUT, inspect_image, source, VERIFY_MAX_PIXELS, VERIFY_MAX_DIMENSION)
+        except asyncio.TimeoutError:
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Image took too long to verify"
+            )
+        finally:
+            IMAGE_VERIFY_DURATION.observe(time.perf_counter() - started)
+    if error is not None:
+        raise HTTPException(status_code=error[0], detail=error[1])
+    return phash
@@ -1,6 +1,59 @@
+import logging
+import os
+import signal
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
+from cache.memes import apply_change, meme_cache
+from db.dependencies import dispose_engines, warm_up_engines
+from metrics.collectors import register_cache
+from metrics.middleware import MetricsMiddleware
+from metrics.routes import router as metrics_router
+from routes.feed import change_feed, evict_on_exit_signal
+from routes.images import presigned_urls
 from routes.memes import router
+from s3 import storage
 
-public_app = FastAPI(docs_url="/api")
+STARTUP_WARM_UP = os.getenv("STARTUP_WARM_UP", "true").lower() == "true"
+
+logger = logging.getLogger(__name__)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    Warm up connections before serving and release them after the last request.
+
+    The server only starts accepting requests once startup is done, and runs the
+    shutdown part after in-flight requests have drained on SIGTERM. With a per-process
+    cache, the change feed listener starts right away so that writes made by other
+    processes drop the stale entries. Change feed streams end as soon as the shutdown
+    signal arrives, so they do not hold up the drain.
+    """
+    if change_feed.handlers:
+        change_feed.start()
+    replaced_handlers = evict_on_exit_signal(change_feed)
+    if STARTUP_WARM_UP:
+        await warm_up_engines()
+        bucket = os.getenv("MINIO_BUCKET_NAME", "memes")
+        if not await storage.check_bucket(bucket):
+            logger.warning("MinIO bucket %s is missing or unreachable", bucket)
+    yield
+    for sig, handler in replaced_handlers.items():
+        signal.signal(sig, handler)
+    await change_feed.close()
+    await dispose_engines()
+    await meme_cache.close()
+    storage.executor.shutdown()
+
+
+public_app = FastAPI(docs_url="/api", lifespan=lifespan)
 
 public_app.include_router(router)
+public_app.include_router(metrics_router)
+public_app.add_middleware(MetricsMiddleware, app_name="public")
+
+register_cache("memes", meme_cache)
+register_cache("presigned_urls", presigned_urls)
+
+if not meme_cache.shared:
+    change_feed.add_handler(apply_change)
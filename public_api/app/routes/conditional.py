@@ -0,0 +1,106 @@
+import hashlib
+from datetime import datetime, timedelta, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Iterable, Tuple
+
+from fastapi import Request
+
+EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+
+def row_version(updated_at: datetime) -> int:
+    """Return the row version as microseconds since the epoch."""
+    return (updated_at - EPOCH) // timedelta(microseconds=1)
+
+
+def meme_etag(meme_id: int, updated_at: datetime) -> str:
+    """
+    Build the strong ETag of a single meme.
+
+    Parameters:
+    - meme_id (int): The ID of the meme.
+    - updated_at (datetime): The time the meme row was last written.
+
+    Returns:
+    - str: The quoted entity tag.
+    """
+    return f'"{meme_id}-{row_version(updated_at)}"'
+
+
+def image_etag(object_name: str) -> str:
+    """
+    Build the strong ETag of a stored image.
+
+    Images are stored under the digest of their content, or a one-off upload ID, and are
+    never overwritten, so the object name identifies the bytes for good.
+    """
+    return f'"{object_name}"'
+
+
+def list_etag(rows: Iterable[Tuple[int, datetime]]) -> str:
+    """
+    Build the strong ETag of a list page from the IDs and versions of its rows.
+
+    Parameters:
+    - rows (Iterable[Tuple[int, datetime]]): The (id, updated_at) pairs of the page, in order.
+
+    Returns:
+    - str: The quoted entity tag. It changes whenever a row on the page is added,
+      removed or updated.
+    """
+    digest = hashlib.sha1()
+    for meme_id, updated_at in rows:
+        digest.update(f"{meme_id}-{row_version(updated_at)};".encode())
+    return f'"{digest.hexdigest()}"'
+
+
+def combined_etag(etags: Iterable[str]) -> str:
+    """
+    Build the strong ETag of a response assembled from several entities.
+
+    Parameters:
+    - etags (Iterable[str]): The entity tags of the parts, in response order.
+
+    Returns:
+    - str: The quoted entity tag. It changes whenever any part changes.
+    """
+    digest = hashlib.sha1()
+    for etag in etags:
+        digest.update(etag.encode() + b";")
+    return f'"{digest.hexdigest()}"'
+
+
+def last_modified(updated_at: datetime) -> str:
+    """Format a row version as an HTTP date for the Last-Modified header."""
+    return format_datetime(updated_at.astimezone(timezone.utc), usegmt=True)
+
+
+def is_not_modified(request: Request, headers: dict) -> bool:
+    """
+    Evaluate the request's conditional headers against the validators of a response.
+
+    `If-None-Match` takes precedence over `If-Modified-Since`, as required by RFC 9110.
+
+    Parameters:
+    - request (Request): The incoming request.
+    - headers (dict): The response headers holding `ETag` and optionally `Last-Modified`.
+
+    Returns:
+    - bool: True if the client's copy is current and a 304 should be sent.
+    """
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        etag = headers.get("ETag")
+        if etag is None:
+            return False
+        candidates = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+        return "*" in candidates or etag in candidates
+
+    if_modified_since = request.headers.get("if-modified-since")
+    modified = headers.get("Last-Modified")
+    if if_modified_since is None or modified is None:
+        return False
+    try:
+        return parsedate_to_datetime(modified) <= parsedate_to_datetime(if_modified_since)
+    except (TypeError, ValueError):
+        return False
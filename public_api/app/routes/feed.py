@@ -0,0 +1,234 @@
+import asyncio
+import json
+import logging
+import os
+import signal
+import threading
+from collections import deque
+from typing import Awaitable, Callable, Dict, List, Optional, Set
+
+import asyncpg
+from sqlalchemy.engine import make_url
+
+from db.changes import MEME_CHANGES_CHANNEL, RESYNC
+from db.config import settings
+from metrics.collectors import FEED_EVICTIONS, FEED_SUBSCRIBERS
+
+FEED_CLIENT_BUFFER = int(os.getenv("FEED_CLIENT_BUFFER", "100"))
+FEED_MAX_SUBSCRIBERS = int(os.getenv("FEED_MAX_SUBSCRIBERS", "10000"))
+FEED_HEARTBEAT = float(os.getenv("FEED_HEARTBEAT", "15"))
+FEED_RECONNECT_DELAY = float(os.getenv("FEED_RECONNECT_DELAY", "1"))
+
+HEARTBEAT = b": keepalive\n\n"
+EVICTED = b"event: evicted\ndata: {}\n\n"
+
+logger = logging.getLogger(__name__)
+
+
+def listen_dsn(url: str) -> str:
+    """Turn the SQLAlchemy database URL into a DSN asyncpg can connect with."""
+    return make_url(url).set(drivername="postgresql").render_as_string(hide_password=False)
+
+
+class Subscriber:
+    """
+    The pending events of one change feed client.
+
+    The buffer holds at most `maxsize` encoded events. A client that falls that far
+    behind is evicted instead of letting its backlog grow or slowing down the others.
+    """
+
+    def __init__(self, maxsize: int = FEED_CLIENT_BUFFER):
+        self.maxsize = maxsize
+        self.events = deque()
+        self.ready = asyncio.Event()
+        self.evicted = False
+
+    def push(self, message: bytes) -> bool:
+        """Queue an event without waiting; returns False if the subscriber had to be evicted."""
+        if self.evicted:
+            return False
+        if len(self.events) >= self.maxsize:
+            self.evicted = True
+            self.events.clear()
+            self.ready.set()
+            return False
+        self.events.append(message)
+        self.ready.set()
+        return True
+
+    async def next(self, timeout: Optional[float] = None) -> List[bytes]:
+        """
+        Wait for events and take all of them.
+
+        Returns:
+            List[bytes]: The queued events, or an empty list if `timeout` passed first.
+        """
+        if not self.events and not self.evicted:
+            try:
+                await asyncio.wait_for(self.ready.wait(), timeout)
+            except asyncio.TimeoutError:
+                return []
+        self.ready.clear()
+        events = list(self.events)
+        self.events.clear()
+        return events
+
+
+class ChangeFeed:
+    """
+    Fan meme change notifications out to the change feed subscribers of this process.
+
+    A single dedicated connection per process `LISTEN`s on the `meme_changes` channel,
+    so the database sees one listener per worker regardless of the number of clients.
+    Each notification is encoded as a server-sent event once and the same bytes are
+    queued for every subscriber without awaiting, so one slow client cannot hold up
+    the others. Handlers registered with `add_handler`, such as the cache invalidation,
+    also receive every decoded notification. The listener connects on `start` or the
+    first subscription and reconnects if the connection is lost; notifications sent
+    while it is down are missed, so handlers and subscribers receive a `resync` change
+    on every connect.
+    """
+
+    def __init__(self, dsn: str, channel: str = MEME_CHANGES_CHANNEL):
+        self.dsn = dsn
+        self.channel = channel
+        self.subscribers: Set[Subscriber] = set()
+        self.handlers: List[Callable[[dict], Awaitable[None]]] = []
+        self.pending: Set[asyncio.Task] = set()
+        self.task: Optional[asyncio.Task] = None
+        self.connected = asyncio.Event()
+        self.stopping = False
+
+    def add_handler(self, handler: Callable[[dict], Awaitable[None]]) -> None:
+        """Call the coroutine function `handler` with every decoded notification."""
+        self.handlers.append(handler)
+
+    def dispatch(self, change: dict) -> None:
+        for handler in self.handlers:
+            task = asyncio.create_task(handler(change))
+            self.pending.add(task)
+            task.add_done_callback(self.handled)
+
+    def handled(self, task: asyncio.Task) -> None:
+        self.pending.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            logger.error("Change feed handler failed", exc_info=task.exception())
+
+    def publish(self, payload: str) -> None:
+        """Hand a notification payload to the handlers and queue it for every subscriber, evicting full ones."""
+        change = json.loads(payload)
+        self.dispatch(change)
+        event = change.get("event", "change")
+        message = f"event: {event}\ndata: {payload}\n\n".encode()
+        evicted = [subscriber for subscriber in self.subscribers if not subscriber.push(message)]
+        for subscriber in evicted:
+            self.unsubscribe(subscriber)
+            FEED_EVICTIONS.inc()
+
+    def on_notification(self, connection, pid, channel, payload) -> None:
+        self.publish(payload)
+
+    async def listen(self) -> None:
+        while True:
+            try:
+                connection = await asyncpg.connect(self.dsn)
+            except (OSError, asyncpg.PostgresError):
+                logger.warning("Change feed could not connect, retrying in %s s", FEED_RECONNECT_DELAY)
+                await asyncio.sleep(FEED_RECONNECT_DELAY)
+                continue
+            closed = asyncio.Event()
+            connection.add_termination_listener(lambda _: closed.set())
+            try:
+                await connection.add_listener(self.channel, self.on_notification)
+                self.connected.set()
+                self.publish(json.dumps({"event": RESYNC}))
+                await closed.wait()
+                logger.warning("Change feed connection lost, reconnecting")
+            finally:
+                self.connected.clear()
+                await connection.close()
+
+    def start(self) -> None:
+        """Start listening, if not done yet, and accept subscribers again after `evict_all`."""
+        self.stopping = False
+        if self.task is None:
+            self.task = asyncio.create_task(self.listen())
+
+    def subscribe(self, maxsize: int = FEED_CLIENT_BUFFER) -> Subscriber:
+        """
+        Register a new client.
+
+        Args:
+            maxsize (int): The number of events the client may fall behind before it is evicted.
+
+        Raises:
+            OverflowError: If this process already serves `FEED_MAX_SUBSCRIBERS` clients,
+                or is shutting down.
+        """
+        if self.stopping:
+            raise OverflowError("The change feed is shutting down")
+        if len(self.subscribers) >= FEED_MAX_SUBSCRIBERS:
+            raise OverflowError("Too many change feed subscribers")
+        self.start()
+        subscriber = Subscriber(maxsize)
+        self.subscribers.add(subscriber)
+        FEED_SUBSCRIBERS.inc()
+        return subscriber
+
+    def unsubscribe(self, subscriber: Subscriber) -> None:
+        if subscriber in self.subscribers:
+            self.subscribers.remove(subscriber)
+            FEED_SUBSCRIBERS.dec()
+
+    def evict_all(self) -> None:
+        """End every subscriber's stream with an `evicted` event and turn new subscribers away."""
+        self.stopping = True
+        for subscriber in list(self.subscribers):
+            subscriber.evicted = True
+            subscriber.ready.set()
+            self.unsubscribe(subscriber)
+
+    async def close(self) -> None:
+        """Stop listening and end every subscriber's stream."""
+        self.evict_all()
+        if self.task is not None:
+            self.task.cancel()
+            await asyncio.gather(self.task, return_exceptions=True)
+            self.task = None
+        await asyncio.gather(*self.pending, return_exceptions=True)
+
+
+def evict_on_exit_signal(feed: ChangeFeed) -> Dict[int, Callable]:
+    """
+    End the change feed streams as soon as the server is told to shut down.
+
+    Servers run the lifespan shutdown only after in-flight responses are done, and the
+    event streams never end on their own, so without this a worker with subscribers
+    would wait for the graceful timeout and be killed before releasing its resources.
+    The handler is chained in front of the one the server (uvicorn, also under
+    gunicorn) installed for SIGINT and SIGTERM, so it must be called from the lifespan
+    startup, in the main thread, after the server has installed its handlers.
+
+    Returns:
+        Dict[int, Callable]: The replaced handlers by signal, to be restored on shutdown.
+    """
+    replaced = {}
+    if threading.current_thread() is not threading.main_thread():
+        return replaced
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        previous = signal.getsignal(sig)
+        if not callable(previous):
+            continue
+
+        def handler(signum, frame, previous=previous):
+            loop.call_soon_threadsafe(feed.evict_all)
+            previous(signum, frame)
+
+        replaced[sig] = previous
+        signal.signal(sig, handler)
+    return replaced
+
+
+change_feed = ChangeFeed(listen_dsn(settings.DATABASE_URL))
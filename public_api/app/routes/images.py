@@ -0,0 +1,114 @@
+import os
+import re
+import threading
+import time
+from datetime import timedelta
+from typing import Iterator, Optional, Tuple
+
+from fastapi import HTTPException, status
+
+from cache.backends import MemoryCache
+from metrics.collectors import MINIO_BYTES
+from s3 import storage
+from s3.minio_client import MINIO_STREAM_POOL_SIZE, stream_client
+
+IMAGE_SERVING = os.getenv("IMAGE_SERVING", "redirect")
+IMAGE_URL_EXPIRY = int(os.getenv("IMAGE_URL_EXPIRY", "3600"))
+# Redirects stop being cacheable this many seconds before the URL they point to expires,
+# to leave room for clock skew and the time it takes to follow them.
+IMAGE_URL_MARGIN = min(60, IMAGE_URL_EXPIRY // 10)
+IMAGE_CHUNK_SIZE = 64 * 1024
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+RANGE_PATTERN = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+# A presigned URL is reused for half its lifetime, so browsers and CDNs see the same
+# redirect target for repeated requests and it is always valid for a while after issue.
+presigned_urls = MemoryCache(maxsize=10000, ttl=IMAGE_URL_EXPIRY / 2)
+
+
+# The number of objects being streamed to clients, each holding a connection of the
+# stream client's pool.
+active_streams = 0
+active_streams_lock = threading.Lock()
+
+
+async def presigned_url(bucket: str, name: str) -> Tuple[str, int]:
+    """
+    Return a presigned GET URL for an object, reusing a recently issued one.
+
+    Returns:
+    - Tuple[str, int]: The URL and the number of seconds a redirect to it may be cached,
+      which ends `IMAGE_URL_MARGIN` seconds before the URL expires.
+    """
+    key = f"{bucket}/{name}"
+    cached = await presigned_urls.get(key)
+    if cached is not None:
+        expires_at, url = cached.decode().split(" ", 1)
+    else:
+        expires_at = str(time.time() + IMAGE_URL_EXPIRY)
+        url = storage.presigned_get_url(bucket, name, timedelta(seconds=IMAGE_URL_EXPIRY))
+        await presigned_urls.set(key, f"{expires_at} {url}".encode())
+    return url, max(int(float(expires_at) - time.time()) - IMAGE_URL_MARGIN, 0)
+
+
+def streams_available() -> bool:
+    """Check whether the stream client's pool has a connection for another download."""
+    return active_streams < MINIO_STREAM_POOL_SIZE
+
+
+def parse_range(header: Optional[str], size: int) -> Optional[Tuple[int, int]]:
+    """
+    Parse a single-range `Range` header.
+
+    Parameters:
+    - header (str, optional): The `Range` request header.
+    - size (int): The size of the object in bytes.
+
+    Returns:
+    - Tuple[int, int]: The first and last byte of the range, inclusive, or None to send
+      the whole object (no header, or a form this endpoint does not serve, like multiple ranges).
+
+    Raises:
+    - HTTPException(416): If the range lies outside the object.
+    """
+    match = RANGE_PATTERN.match(header or "")
+    if match is None or match.groups() == ("", ""):
+        return None
+    start, end = match.groups()
+    if start == "":
+        start, end = max(size - int(end), 0), size - 1
+    else:
+        start, end = int(start), min(int(end), size - 1) if end else size - 1
+    if start > end or start >= size:
+        raise HTTPException(
+            status_code=status.HTTP_416_REQUESTED_RANGE_NOT_SATISFIABLE,
+            detail="Requested range not satisfiable",
+            headers={"Content-Range": f"bytes */{size}"}
+        )
+    return start, end
+
+
+def stream_object(bucket: str, name: str, offset: int = 0, length: int = 0) -> Iterator[bytes]:
+    """
+    Yield an object's bytes as they arrive from MinIO.
+
+    The chunks are passed on without buffering the object; Starlette runs this blocking
+    iterator on its thread pool. The object is read through `stream_client`, whose
+    connections are held until the client has read the body.
+    """
+    global active_streams
+    with active_streams_lock:
+        active_streams += 1
+    try:
+        response = stream_client.get_object(bucket, name, offset=offset, length=length)
+        try:
+            for chunk in response.stream(IMAGE_CHUNK_SIZE):
+                MINIO_BYTES.labels("received").inc(len(chunk))
+                yield chunk
+        finally:
+            response.close()
+            response.release_conn()
+    finally:
+        with active_streams_lock:
+            active_streams -= 1
@@ -1,11 +1,42 @@
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy import select
+import os
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status
+from fastapi.responses import RedirectResponse, StreamingResponse
+import orjson
+from sqlalchemy import Integer, any_, bindparam, func, select
+from sqlalchemy.dialects.postgresql import ARRAY
 from sqlalchemy.ext.asyncio import AsyncSession
-from typing import List
+from typing import Callable, List, Literal, Optional
 
-from db.dependencies import get_session
+from cache.memes import list_key, meme_cache, meme_key, meme_keys, pack, unpack
+from db.dependencies import get_read_session, get_read_sessionmaker
 from db.models import Meme
-from db.schemas import MemeInfo
+from db.schemas import MemeBatchRead, MemeInfo
+from s3 import storage
+from s3.urls import object_name
+from routes.feed import EVICTED, FEED_HEARTBEAT, HEARTBEAT, change_feed
+from routes.conditional import combined_etag, image_etag, is_not_modified, last_modified, list_etag, meme_etag
+from routes.images import (
+    IMAGE_SERVING,
+    IMMUTABLE_CACHE_CONTROL,
+    parse_range,
+    presigned_url,
+    stream_object,
+    streams_available,
+)
+from routes.pagination import MEME_ID_MAX, MEME_ID_MIN, decode_cursor, encode_cursor
+from routes.serialization import MEME_COLUMNS, dump_meme_ndjson, dump_meme_rows, meme_dict
+
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+EXPORT_BATCH_SIZE = 1000
+BATCH_READ_MAX_IDS = int(os.getenv("BATCH_READ_MAX_IDS", "500"))
+
+
+def json_response(request: Request, headers: dict, body: bytes) -> Response:
+    """Return the JSON body, or an empty 304 if the client's copy is current."""
+    if is_not_modified(request, headers):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
 
 router = APIRouter(
     prefix="",
@@ -14,52 +45,391 @@ router = APIRouter(
 
 @router.get("/memes", response_model=List[MemeInfo])
 async def read_memes(
-    skip: int = 0,
-    limit: int = 10,
-    session: AsyncSession = Depends(get_session)
+    request: Request,
+    skip: int = Query(0, ge=0),
+    limit: int = Query(10, ge=1, le=100),
+    after: Optional[str] = None,
+    session: AsyncSession = Depends(get_read_session)
 ):
     """
     Retrieve a list of memes.
 
-    This endpoint allows users to fetch a paginated list of memes from the database.
+    This endpoint allows users to fetch a paginated list of memes from the database,
+    ordered by ID. Two pagination modes are supported: the classic `skip`/`limit`
+    offset mode and a keyset (cursor) mode. In cursor mode the client passes the
+    opaque token from the `X-Next-Cursor` response header as `after`, and the page
+    is resolved with an index range scan, so deep pages cost the same as the first one.
+    Only the needed columns are fetched, as plain tuples, and encoded straight to JSON
+    without building ORM instances or Pydantic models. Serialized pages are served from
+    the meme cache until the next write.
+    Every page carries a strong `ETag` derived from the IDs and row versions it
+    contains; a matching `If-None-Match` is answered with 304 before serialization.
+
+    Parameters:
+    - skip (int, optional): The number of memes to skip (default is 0). Ignored when `after` is given.
+    - limit (int, optional): The maximum number of memes to return (default is 10, at most 100).
+    - after (str, optional): The cursor returned with the previous page.
+    - session (AsyncSession): The database session (provided by dependency injection).
+
+    Returns:
+    - List[MemeInfo]: A list of memes with the specified offset and limit. When the page
+      is full, the `X-Next-Cursor` header holds the cursor for the following page.
+      An empty 304 response is returned if the client's copy is current.
+
+    Raises:
+    - HTTPException(400): If the cursor is malformed or points outside the range of meme IDs.
+    - HTTPException(422): If `skip` is negative or `limit` is not between 1 and 100.
+    """
+    query = select(*MEME_COLUMNS, Meme.updated_at).order_by(Meme.id).limit(limit)
+    if after is not None:
+        query = query.where(Meme.id > decode_cursor(after))
+    else:
+        query = query.offset(skip)
+
+    key = await list_key(skip=skip, limit=limit, after=after)
+    cached = await meme_cache.get(key)
+    if cached is not None:
+        return json_response(request, *unpack(cached))
+
+    result = await session.execute(query)
+    rows = result.all()
+    headers = {"ETag": list_etag((row.id, row.updated_at) for row in rows)}
+    if rows and len(rows) == limit:
+        headers[NEXT_CURSOR_HEADER] = encode_cursor(rows[-1].id)
+    if is_not_modified(request, headers):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+    body = dump_meme_rows(rows)
+    await meme_cache.set(key, pack(headers, body))
+    return json_response(request, headers, body)
+
+@router.get("/memes/export", response_class=StreamingResponse)
+async def export_memes(
+    session_factory: Callable[[], AsyncSession] = Depends(get_read_sessionmaker)
+):
+    """
+    Export all memes as newline-delimited JSON.
+
+    Rows are read through a server-side cursor in batches and streamed as they arrive,
+    one `MemeInfo` object per line, so memory use does not grow with the table size.
+
+    Parameters:
+    - session_factory (Callable): The read session factory (provided by dependency injection).
+
+    Returns:
+    - StreamingResponse: The memes ordered by ID, as `application/x-ndjson`.
+    """
+    async def lines():
+        async with session_factory() as session:
+            result = await session.stream(
+                select(*MEME_COLUMNS).order_by(Meme.id).execution_options(yield_per=EXPORT_BATCH_SIZE)
+            )
+            async for partition in result.partitions():
+                yield b"".join(dump_meme_ndjson(row) for row in partition)
+
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+@router.get("/memes/feed", response_class=StreamingResponse)
+async def read_meme_feed():
+    """
+    Stream meme changes as server-sent events.
+
+    Every create, update and delete committed by the private API is sent as an event
+    named `created`, `updated` or `deleted` with `{"event": ..., "id": ...}` as data;
+    clients read the meme itself from `/memes/{meme_id}` if they need it. A comment is
+    sent every `FEED_HEARTBEAT` seconds to keep idle connections open. A client that
+    falls `FEED_CLIENT_BUFFER` events behind receives an `evicted` event and the stream
+    ends; it should reconnect and re-read the memes it cares about. The same happens
+    when the worker shuts down. A `resync` event means the server may have missed
+    changes while reconnecting to the database; the client should re-read as well.
+
+    Returns:
+    - StreamingResponse: The event stream, as `text/event-stream`.
+
+    Raises:
+    - HTTPException: If this worker already serves `FEED_MAX_SUBSCRIBERS` clients or is
+      shutting down (503).
+    """
+    try:
+        subscriber = change_feed.subscribe()
+    except OverflowError as exc:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail=str(exc),
+            headers={"Retry-After": str(int(FEED_HEARTBEAT))}
+        )
+
+    async def events():
+        try:
+            yield HEARTBEAT
+            while True:
+                messages = await subscriber.next(FEED_HEARTBEAT)
+                if subscriber.evicted:
+                    yield EVICTED
+                    return
+                yield b"".join(messages) if messages else HEARTBEAT
+        finally:
+            change_feed.unsubscribe(subscriber)
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@router.get("/memes/search", response_model=List[MemeInfo])
+async def search_memes(
+    q: str = Query(..., min_length=1, max_length=200),
+    mode: Literal["text", "prefix", "fuzzy"] = "text",
+    limit: int = Query(10, ge=1, le=100),
+    offset: int = Query(0, ge=0),
+    session: AsyncSession = Depends(get_read_session)
+):
+    """
+    Search memes by title and description.
+
+    Three search modes are supported, each backed by a GIN index:
+    - text: full-text search over titles and descriptions using the `search_vector`
+      column; the query accepts web search syntax (quotes, `or`, `-word`).
+    - prefix: titles starting with the query, using the trigram index.
+    - fuzzy: titles similar to the query (tolerates typos), using the trigram index.
 
     Parameters:
-    - skip (int, optional): The number of memes to skip (default is 0).
-    - limit (int, optional): The maximum number of memes to return (default is 10).
+    - q (str): The search query.
+    - mode (str, optional): The search mode (default is "text").
+    - limit (int, optional): The maximum number of memes to return (default is 10, at most 100).
+    - offset (int, optional): The number of results to skip (default is 0).
     - session (AsyncSession): The database session (provided by dependency injection).
 
     Returns:
-    - List[MemeInfo]: A list of memes with the specified offset and limit.
+    - List[MemeInfo]: The matching memes, best match first.
+    """
+    if mode == "text":
+        ts_query = func.websearch_to_tsquery("simple", q)
+        rank = func.ts_rank_cd(Meme.search_vector, ts_query)
+        condition = Meme.search_vector.op("@@")(ts_query)
+    else:
+        rank = func.similarity(Meme.title, q)
+        if mode == "prefix":
+            escaped = q.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+            condition = Meme.title.ilike(f"{escaped}%")
+        else:
+            condition = Meme.title.op("%")(q)
+
+    query = select(Meme).where(condition).order_by(rank.desc(), Meme.id).offset(offset).limit(limit)
+    result = await session.execute(query)
+    return result.scalars().all()
+
+@router.get("/memes/batch", response_model=MemeBatchRead)
+async def read_memes_batch(
+    request: Request,
+    ids: List[str] = Query(..., description="Meme IDs, comma-separated or repeated"),
+    session: AsyncSession = Depends(get_read_session)
+):
+    """
+    Retrieve many memes by their IDs in one request.
+
+    IDs may be passed comma-separated (`?ids=3,1,2`), repeated (`?ids=3&ids=1`) or both.
+    Memes found in the meme cache are taken from it with a single multi-key lookup;
+    the rest are fetched with one `WHERE id = ANY(:ids)` query, whose text does not
+    depend on the number of IDs, and cached for `GET /memes/{meme_id}` as well.
+    The memes are returned in the requested order without duplicates; IDs that do
+    not exist are listed in `missing`. The response carries a strong `ETag` built
+    from the versions of the returned memes.
+
+    Parameters:
+    - ids (List[str]): The IDs of the memes to retrieve, at most `BATCH_READ_MAX_IDS` distinct ones.
+    - session (AsyncSession): The database session (provided by dependency injection).
+
+    Returns:
+    - MemeBatchRead: The memes found, in the requested order, and the IDs that were not
+      found, or an empty 304 response if the client's copy is current.
 
     Raises:
-    - HTTPException(404): If no memes are found.
+    - HTTPException(422): If an ID is not an integer, is out of the range of the ID column,
+      or too many IDs are requested.
     """
-    result = await session.execute(select(Meme).offset(skip).limit(limit))
-    memes = result.scalars().all()
-    return memes
+    try:
+        meme_ids = list(dict.fromkeys(int(part) for value in ids for part in value.split(",") if part.strip()))
+    except ValueError:
+        raise HTTPException(status_code=422, detail="Meme IDs must be integers")
+    if any(not MEME_ID_MIN <= meme_id <= MEME_ID_MAX for meme_id in meme_ids):
+        raise HTTPException(status_code=422, detail=f"Meme IDs must be between {MEME_ID_MIN} and {MEME_ID_MAX}")
+    if len(meme_ids) > BATCH_READ_MAX_IDS:
+        raise HTTPException(status_code=422, detail=f"At most {BATCH_READ_MAX_IDS} memes can be read at once")
+
+    found = {}
+    keys = dict(zip(meme_ids, await meme_keys(*meme_ids)))
+    cached = await meme_cache.get_many(*keys.values())
+    for meme_id, value in zip(meme_ids, cached):
+        if value is not None:
+            found[meme_id] = unpack(value)
+
+    misses = [meme_id for meme_id in meme_ids if meme_id not in found]
+    if misses:
+        result = await session.execute(
+            select(*MEME_COLUMNS, Meme.updated_at)
+            .where(Meme.id == any_(bindparam("ids", misses, type_=ARRAY(Integer))))
+        )
+        fetched = {}
+        for row in result.all():
+            headers = {
+                "ETag": meme_etag(row.id, row.updated_at),
+                "Last-Modified": last_modified(row.updated_at),
+            }
+            found[row.id] = (headers, orjson.dumps(meme_dict(row)))
+            fetched[keys[row.id]] = pack(*found[row.id])
+        await meme_cache.set_many(fetched)
+
+    present = [meme_id for meme_id in meme_ids if meme_id in found]
+    missing = [meme_id for meme_id in meme_ids if meme_id not in found]
+    headers = {"ETag": combined_etag(
+        [found[meme_id][0]["ETag"] for meme_id in present] + [f'"{meme_id}-missing"' for meme_id in missing]
+    )}
+    if is_not_modified(request, headers):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+    body = b"".join([
+        b'{"memes":[', b",".join(found[meme_id][1] for meme_id in present),
+        b'],"missing":', orjson.dumps(missing), b"}",
+    ])
+    return Response(content=body, media_type="application/json", headers=headers)
 
 @router.get("/memes/{meme_id}", response_model=MemeInfo)
 async def read_meme(
+    request: Request,
     meme_id: int,
-    session: AsyncSession = Depends(get_session)
+    session: AsyncSession = Depends(get_read_session)
 ):
     """
     Retrieve a meme by its ID.
 
     This endpoint allows users to fetch the details of a specific meme by its unique identifier.
+    The serialized meme is served from the meme cache until it is updated or deleted; the
+    cache key carries the meme's version, so a read racing with a write cannot cache the
+    old row past the write.
+    Responses carry a strong `ETag` and `Last-Modified` built from the row's `updated_at`
+    column, and `If-None-Match` / `If-Modified-Since` are answered with 304 without
+    serializing the meme.
 
     Parameters:
     - meme_id (int): The ID of the meme to retrieve.
     - session (AsyncSession): The database session (provided by dependency injection).
 
     Returns:
-    - MemeInfo: The details of the meme with the specified ID.
+    - MemeInfo: The details of the meme with the specified ID, or an empty 304 response
+      if the client's copy is current.
 
     Raises:
     - HTTPException(404): If a meme with the specified ID is not found.
     """
+    key = await meme_key(meme_id)
+    cached = await meme_cache.get(key)
+    if cached is not None:
+        return json_response(request, *unpack(cached))
+
     result = await session.execute(select(Meme).filter(Meme.id == meme_id))
     meme = result.scalar()
     if meme is None:
         raise HTTPException(status_code=404, detail="Meme not found")
-    return meme
+    headers = {
+        "ETag": meme_etag(meme.id, meme.updated_at),
+        "Last-Modified": last_modified(meme.updated_at),
+    }
+    if is_not_modified(request, headers):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+    body = MemeInfo.model_validate(meme, from_attributes=True).model_dump_json().encode()
+    await meme_cache.set(key, pack(headers, body))
+    return json_response(request, headers, body)
+
+@router.get("/memes/{meme_id}/image", response_class=Response)
+@router.get("/memes/{meme_id}/image/{variant}", response_class=Response)
+async def read_meme_image(
+    request: Request,
+    meme_id: int,
+    variant: Optional[str] = None,
+    session: AsyncSession = Depends(get_read_session)
+):
+    """
+    Serve the image of a meme, or one of its resized variants (e.g. `thumb.webp`).
+
+    Depending on `IMAGE_SERVING`, the client is either redirected to a presigned MinIO URL
+    (`redirect`, the default), so the bytes never pass through this service, or the object
+    is streamed through (`proxy`) with single-range `Range` support. Stored images are
+    content-addressed and never change, so the object name serves as a strong `ETag`.
+    Proxied bytes are marked immutable for a year. Redirects carry no `ETag`, since their
+    target changes, and are cacheable only until shortly before the presigned URL they
+    point to expires. Proxied downloads hold a connection of a separate MinIO pool of
+    `MINIO_STREAM_POOL_SIZE` connections; once all are taken, further ones get a 503.
+
+    Parameters:
+    - meme_id (int): The ID of the meme.
+    - variant (str, optional): The name of the variant; the original image if omitted.
+    - session (AsyncSession): The database session (provided by dependency injection).
+
+    Returns:
+    - Response: A 307 redirect, the image (200) or the requested range of it (206),
+      or an empty 304 response if the client's copy is current.
+
+    Raises:
+    - HTTPException(404): If the meme or the variant is not found.
+    - HTTPException(416): If the requested range lies outside the image.
+    - HTTPException(503): If too many images are being proxied already.
+    """
+    result = await session.execute(select(Meme.image_url, Meme.variants).filter(Meme.id == meme_id))
+    row = result.first()
+    if row is None:
+        raise HTTPException(status_code=404, detail="Meme not found")
+    url = row.image_url if variant is None else (row.variants or {}).get(variant)
+    if url is None:
+        raise HTTPException(status_code=404, detail="Image variant not found")
+
+    bucket = os.getenv("MINIO_BUCKET_NAME", "memes")
+    name = object_name(url)
+    if IMAGE_SERVING == "redirect":
+        url, max_age = await presigned_url(bucket, name)
+        return RedirectResponse(
+            url,
+            status_code=status.HTTP_307_TEMPORARY_REDIRECT,
+            headers={"Cache-Control": f"public, max-age={max_age}"}
+        )
+
+    headers = {"ETag": image_etag(name), "Cache-Control": IMMUTABLE_CACHE_CONTROL}
+    if is_not_modified(request, headers):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    if not streams_available():
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Too many images are being downloaded",
+            headers={"Retry-After": "1"}
+        )
+
+    stat = await storage.stat_object(bucket, name)
+    if stat is None:
+        raise HTTPException(status_code=404, detail="Image not found")
+    headers["Accept-Ranges"] = "bytes"
+    byte_range = parse_range(request.headers.get("range"), stat.size)
+    if byte_range is None:
+        headers["Content-Length"] = str(stat.size)
+        return StreamingResponse(stream_object(bucket, name), media_type=stat.content_type, headers=headers)
+
+    start, end = byte_range
+    headers["Content-Range"] = f"bytes {start}-{end}/{stat.size}"
+    headers["Content-Length"] = str(end - start + 1)
+    return StreamingResponse(
+        stream_object(bucket, name, start, end - start + 1),
+        status_code=status.HTTP_206_PARTIAL_CONTENT,
+        media_type=stat.content_type,
+        headers=headers
+    )
+
+@router.get("/cache/stats")
+async def read_cache_stats():
+    """
+    Retrieve the meme cache counters.
+
+    Returns:
+    - dict: The cache backend name, hit and miss counters and the hit ratio.
+    """
+    return meme_cache.stats()
@@ -0,0 +1,48 @@
+import base64
+import binascii
+
+from fastapi import HTTPException, status
+
+CURSOR_PREFIX = "id:"
+# The range of the INTEGER id column.
+MEME_ID_MIN, MEME_ID_MAX = -2 ** 31, 2 ** 31 - 1
+
+
+def encode_cursor(meme_id: int) -> str:
+    """
+    Build an opaque pagination cursor pointing after the given meme ID.
+
+    Parameters:
+    - meme_id (int): The ID of the last meme on the current page.
+
+    Returns:
+    - str: A URL-safe token to pass back as the `after` query parameter.
+    """
+    raw = f"{CURSOR_PREFIX}{meme_id}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> int:
+    """
+    Decode a pagination cursor produced by `encode_cursor`.
+
+    Parameters:
+    - cursor (str): The opaque token received from a previous page.
+
+    Returns:
+    - int: The meme ID the next page should start after.
+
+    Raises:
+    - HTTPException(400): If the cursor is malformed or its ID is out of the range of the ID column.
+    """
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        raw = base64.urlsafe_b64decode(padded.encode()).decode()
+        if not raw.startswith(CURSOR_PREFIX):
+            raise ValueError(cursor)
+        meme_id = int(raw[len(CURSOR_PREFIX):])
+        if not MEME_ID_MIN <= meme_id <= MEME_ID_MAX:
+            raise ValueError(cursor)
+        return meme_id
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor")
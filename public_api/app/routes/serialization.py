@@ -0,0 +1,35 @@
+from typing import Iterable, Sequence
+
+import orjson
+
+from db.models import Meme
+from db.schemas import MemeInfo
+
+MEME_FIELDS = tuple(MemeInfo.model_fields)
+MEME_COLUMNS = tuple(getattr(Meme, field) for field in MEME_FIELDS)
+
+
+def meme_dict(row: Sequence) -> dict:
+    """Map a row selected with `MEME_COLUMNS` to the `MemeInfo` field names."""
+    return dict(zip(MEME_FIELDS, row))
+
+
+def dump_meme_rows(rows: Iterable[Sequence]) -> bytes:
+    """
+    Serialize rows selected with `MEME_COLUMNS` as a JSON array of `MemeInfo` objects.
+
+    The rows are plain tuples, so neither ORM instances nor Pydantic models are built;
+    the output is identical to the `List[MemeInfo]` response model.
+
+    Parameters:
+    - rows (Iterable[Sequence]): The selected rows; extra trailing columns are ignored.
+
+    Returns:
+    - bytes: The encoded JSON array.
+    """
+    return orjson.dumps([meme_dict(row) for row in rows])
+
+
+def dump_meme_ndjson(row: Sequence) -> bytes:
+    """Serialize one row selected with `MEME_COLUMNS` as a newline-terminated JSON object."""
+    return orjson.dumps(meme_dict(row), option=orjson.OPT_APPEND_NEWLINE)
@@ -1,14 +1,81 @@
 import os
+import urllib3
 from minio import Minio
 
 MINIO_URL = os.getenv("MINIO_URL", "minio:9000")
 MINIO_ACCESS_KEY = os.getenv("MINIO_ACCESS_KEY", "P3EsC8v7iXIQoUmbI2iu")
 MINIO_SECRET_KEY = os.getenv("MINIO_SECRET_KEY", "SSvfCilnm48t5Vri83B67HOHiUwSx6znQW6heL3J")
 MINIO_BUCKET_NAME = os.getenv("MINIO_BUCKET_NAME", "memes")
+MINIO_PUBLIC_URL = os.getenv("MINIO_PUBLIC_URL", MINIO_URL)
+MINIO_REGION = os.getenv("MINIO_REGION", "us-east-1")
+MINIO_POOL_SIZE = int(os.getenv("MINIO_POOL_SIZE", os.getenv("MINIO_IO_WORKERS", "16")))
+MINIO_CONNECT_TIMEOUT = float(os.getenv("MINIO_CONNECT_TIMEOUT", "5"))
+MINIO_READ_TIMEOUT = float(os.getenv("MINIO_READ_TIMEOUT", "60"))
+MINIO_POOL_TIMEOUT = float(os.getenv("MINIO_POOL_TIMEOUT", "10"))
+MINIO_STREAM_POOL_SIZE = int(os.getenv("MINIO_STREAM_POOL_SIZE", "32"))
+
+
+class BoundedPoolManager(urllib3.PoolManager):
+    """
+    A blocking pool manager whose requests wait at most `pool_timeout` seconds for a connection.
+
+    The MinIO client does not pass a pool timeout, so without one a request waits for
+    a free connection forever; here it fails with `urllib3.exceptions.EmptyPoolError`.
+    """
+
+    def __init__(self, pool_timeout: float, **kwargs):
+        super().__init__(**kwargs)
+        self.pool_timeout = pool_timeout
+
+    def urlopen(self, method, url, redirect=True, **kw):
+        kw.setdefault("pool_timeout", self.pool_timeout)
+        return super().urlopen(method, url, redirect=redirect, **kw)
+
+
+def build_http_client(maxsize: int) -> BoundedPoolManager:
+    """
+    Create the connection pool of a MinIO client.
+
+    Every request has a connect and a read timeout, so a hung MinIO request fails instead
+    of holding an I/O thread and a pooled connection for good.
+    """
+    return BoundedPoolManager(
+        pool_timeout=MINIO_POOL_TIMEOUT,
+        maxsize=maxsize,
+        block=True,
+        timeout=urllib3.Timeout(connect=MINIO_CONNECT_TIMEOUT, read=MINIO_READ_TIMEOUT),
+        retries=urllib3.Retry(total=5, backoff_factor=0.2, status_forcelist=[500, 502, 503, 504]),
+    )
+
+
+http_client = build_http_client(MINIO_POOL_SIZE)
 
 minio_client = Minio(
     MINIO_URL,
     access_key=MINIO_ACCESS_KEY,
     secret_key=MINIO_SECRET_KEY,
-    secure=False
+    secure=False,
+    region=MINIO_REGION,
+    http_client=http_client
+)
+
+# Objects streamed to clients hold their connection until the client has read the
+# body, so they get a pool of their own and slow clients cannot starve other calls.
+stream_client = Minio(
+    MINIO_URL,
+    access_key=MINIO_ACCESS_KEY,
+    secret_key=MINIO_SECRET_KEY,
+    secure=False,
+    region=MINIO_REGION,
+    http_client=build_http_client(MINIO_STREAM_POOL_SIZE)
+)
+
+# Presigned URLs are signed for the host they are issued for, so they are issued by a
+# client pointed at the address clients can reach; signing makes no network calls.
+presign_client = Minio(
+    MINIO_PUBLIC_URL,
+    access_key=MINIO_ACCESS_KEY,
+    secret_key=MINIO_SECRET_KEY,
+    secure=False,
+    region=MINIO_REGION
 )
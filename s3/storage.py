@@ -0,0 +1,259 @@
+import asyncio
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from functools import partial
+from typing import List, Tuple
+
+from minio.commonconfig import REPLACE, CopySource
+from minio.datatypes import Part
+from minio.deleteobjects import DeleteObject
+from minio.error import S3Error
+
+from metrics.collectors import MINIO_BYTES, MINIO_REQUEST_DURATION
+from s3.minio_client import minio_client, presign_client
+
+MINIO_IO_WORKERS = int(os.getenv("MINIO_IO_WORKERS", "16"))
+MINIO_PART_SIZE = int(os.getenv("MINIO_PART_SIZE", str(10 * 1024 * 1024)))
+
+executor = ThreadPoolExecutor(max_workers=MINIO_IO_WORKERS, thread_name_prefix="minio-io")
+
+
+async def run_in_executor(func, *args, operation: str, **kwargs):
+    """
+    Run a blocking MinIO call on the bounded I/O thread pool.
+
+    The call's latency, including the wait for a free thread, is recorded under the
+    `operation` label.
+
+    Args:
+        func: The blocking callable, usually a bound `minio_client` method.
+        *args: Positional arguments for the callable.
+        operation (str): The metric label of the call, e.g. "put_object".
+        **kwargs: Keyword arguments for the callable.
+
+    Returns:
+        The callable's return value.
+    """
+    loop = asyncio.get_running_loop()
+    started = time.perf_counter()
+    try:
+        return await loop.run_in_executor(executor, partial(func, *args, **kwargs))
+    finally:
+        MINIO_REQUEST_DURATION.labels(operation).observe(time.perf_counter() - started)
+
+
+async def put_object(**kwargs):
+    """Upload an object without blocking the event loop."""
+    result = await run_in_executor(minio_client.put_object, operation="put_object", **kwargs)
+    MINIO_BYTES.labels("sent").inc(kwargs.get("length", 0))
+    return result
+
+
+async def remove_object(**kwargs):
+    """Remove an object without blocking the event loop."""
+    return await run_in_executor(minio_client.remove_object, operation="remove_object", **kwargs)
+
+
+async def check_bucket(bucket_name: str) -> bool:
+    """
+    Check that a bucket exists, opening a pooled connection to MinIO on the way.
+
+    Returns:
+        bool: False if the bucket is missing or MinIO cannot be reached.
+    """
+    try:
+        return await run_in_executor(minio_client.bucket_exists, bucket_name, operation="bucket_exists")
+    except Exception:
+        return False
+
+
+async def object_exists(bucket_name: str, object_name: str) -> bool:
+    """Check whether an object exists without blocking the event loop."""
+    try:
+        await run_in_executor(minio_client.stat_object, bucket_name, object_name, operation="stat_object")
+    except S3Error as exc:
+        if exc.code in ("NoSuchKey", "NoSuchObject"):
+            return False
+        raise
+    return True
+
+
+async def stat_object(bucket_name: str, object_name: str):
+    """Return an object's metadata, or None if it does not exist, without blocking the event loop."""
+    try:
+        return await run_in_executor(minio_client.stat_object, bucket_name, object_name, operation="stat_object")
+    except S3Error as exc:
+        if exc.code in ("NoSuchKey", "NoSuchObject"):
+            return None
+        raise
+
+
+async def get_range(bucket_name: str, object_name: str, offset: int, length: int) -> bytes:
+    """
+    Read a byte range of an object with a ranged GET.
+
+    Args:
+        bucket_name (str): The bucket holding the object.
+        object_name (str): The object name.
+        offset (int): The first byte to read.
+        length (int): The maximum number of bytes to read.
+
+    Returns:
+        bytes: The requested range, shorter than `length` if the object ends first.
+    """
+    def read_range() -> bytes:
+        response = minio_client.get_object(bucket_name, object_name, offset=offset, length=length)
+        try:
+            return response.read()
+        finally:
+            response.close()
+            response.release_conn()
+
+    data = await run_in_executor(read_range, operation="get_range")
+    MINIO_BYTES.labels("received").inc(len(data))
+    return data
+
+
+async def list_objects(bucket_name: str, prefix: str) -> list:
+    """List the objects whose names start with `prefix` without blocking the event loop."""
+    def list_all() -> list:
+        return list(minio_client.list_objects(bucket_name, prefix=prefix))
+
+    return await run_in_executor(list_all, operation="list_objects")
+
+
+async def copy_object(bucket_name: str, object_name: str, source_name: str, content_type: str):
+    """Copy an object inside the bucket on the MinIO side, replacing its content type."""
+    return await run_in_executor(
+        minio_client.copy_object,
+        bucket_name,
+        object_name,
+        CopySource(bucket_name, source_name),
+        metadata={"Content-Type": content_type},
+        metadata_directive=REPLACE,
+        operation="copy_object"
+    )
+
+
+async def create_multipart_upload(bucket_name: str, object_name: str) -> str:
+    """Start an S3 multipart upload and return its upload ID."""
+    return await run_in_executor(
+        minio_client._create_multipart_upload,
+        bucket_name=bucket_name,
+        object_name=object_name,
+        headers={"Content-Type": "application/octet-stream"},
+        operation="create_multipart_upload"
+    )
+
+
+async def upload_part(bucket_name: str, object_name: str, upload_id: str, part_number: int, data: bytes) -> str:
+    """Upload one part of a multipart upload and return its ETag."""
+    etag = await run_in_executor(
+        minio_client._upload_part,
+        bucket_name=bucket_name,
+        object_name=object_name,
+        data=data,
+        headers=None,
+        upload_id=upload_id,
+        part_number=part_number,
+        operation="upload_part"
+    )
+    MINIO_BYTES.labels("sent").inc(len(data))
+    return etag
+
+
+async def complete_multipart_upload(bucket_name: str, object_name: str, upload_id: str, parts: List[Tuple[int, str]]):
+    """Assemble the uploaded parts, given as (part number, ETag) pairs in order, into the object."""
+    return await run_in_executor(
+        minio_client._complete_multipart_upload,
+        bucket_name=bucket_name,
+        object_name=object_name,
+        upload_id=upload_id,
+        parts=[Part(part_number, etag) for part_number, etag in parts],
+        operation="complete_multipart_upload"
+    )
+
+
+async def abort_multipart_upload(bucket_name: str, object_name: str, upload_id: str) -> None:
+    """Discard a multipart upload and its parts; an upload that is already gone is ignored."""
+    try:
+        await run_in_executor(
+            minio_client._abort_multipart_upload,
+            bucket_name=bucket_name,
+            object_name=object_name,
+            upload_id=upload_id,
+            operation="abort_multipart_upload"
+        )
+    except S3Error as exc:
+        if exc.code != "NoSuchUpload":
+            raise
+
+
+def presigned_put_url(bucket_name: str, object_name: str, expires: timedelta) -> str:
+    """Return a URL that lets a client upload one object directly to the bucket."""
+    return presign_client.presigned_put_object(bucket_name, object_name, expires=expires)
+
+
+def presigned_get_url(bucket_name: str, object_name: str, expires: timedelta) -> str:
+    """Return a URL that lets a client download one object directly from the bucket."""
+    return presign_client.presigned_get_object(bucket_name, object_name, expires=expires)
+
+
+async def put_fileobj(bucket_name: str, object_name: str, fileobj, content_type: str = None):
+    """
+    Stream a seekable file object into the bucket without copying it in memory.
+
+    The length is taken from the file itself and the body is sent in parts of
+    `MINIO_PART_SIZE` bytes, one part at a time, so the memory held per upload is
+    bounded by the part size regardless of the object size.
+
+    Args:
+        bucket_name (str): The destination bucket.
+        object_name (str): The destination object name.
+        fileobj: A seekable binary file, e.g. the spooled file behind an `UploadFile`.
+        content_type (str, optional): The MIME type stored with the object.
+
+    Returns:
+        The MinIO `ObjectWriteResult` of the upload.
+    """
+    fileobj.seek(0, os.SEEK_END)
+    length = fileobj.tell()
+    fileobj.seek(0)
+    return await put_object(
+        bucket_name=bucket_name,
+        object_name=object_name,
+        data=fileobj,
+        length=length,
+        part_size=MINIO_PART_SIZE,
+        num_parallel_uploads=1,
+        content_type=content_type or "application/octet-stream"
+    )
+
+
+async def remove_objects(bucket_name: str, object_names: List[str], batch_size: int = 1000) -> List[str]:
+    """
+    Remove many objects with MinIO's multi-object delete.
+
+    The names are sent in batches of at most `batch_size` (the S3 limit is 1000 keys
+    per request) and the batches run concurrently on the I/O thread pool.
+
+    Args:
+        bucket_name (str): The bucket holding the objects.
+        object_names (List[str]): The names of the objects to remove.
+        batch_size (int): The number of keys per delete request.
+
+    Returns:
+        List[str]: The names of the objects that could not be removed.
+    """
+    def remove_batch(names: List[str]) -> List[str]:
+        try:
+            errors = minio_client.remove_objects(bucket_name, [DeleteObject(name) for name in names])
+            return [error.name for error in errors]
+        except Exception:
+            return names
+
+    batches = [object_names[i:i + batch_size] for i in range(0, len(object_names), batch_size)]
+    failed = await asyncio.gather(*(run_in_executor(remove_batch, batch, operation="remove_objects") for batch in batches))
+    return [name for names in failed for name in names]
@@ -0,0 +1,8 @@
+def image_url(bucket: str, name: str) -> str:
+    """Return the URL stored on the meme for an object name."""
+    return f"http://{bucket}/{name}"
+
+
+def object_name(image_url: str) -> str:
+    """Return the MinIO object name of an image from the URL stored on the meme."""
+    return image_url.split("/")[-1]
@@ -0,0 +1,211 @@
+"""
+Export and import the meme catalogue as a streaming tar archive.
+
+The archive holds the `memes` and `images` rows as NDJSON chunks and every object
+of the bucket, with its content type in a PAX header:
+
+    memes/000000.ndjson, memes/000001.ndjson, ...
+    images/000000.ndjson, ...
+    objects/<object name>
+
+Export reads rows through server-side cursors and streams objects from MinIO
+straight into the archive, and import streams the archive back, inserting rows
+with batched `COPY` and uploading objects in parallel. Both run in constant
+memory regardless of the catalogue size. Pass `-` as the path to use stdout/stdin.
+
+Usage:
+    python -m scripts.catalogue export catalogue.tar
+    python -m scripts.catalogue import catalogue.tar --parallelism 16
+"""
+import argparse
+import asyncio
+import io
+import json
+import os
+import resource
+import sys
+import tarfile
+import time
+from datetime import datetime
+
+from sqlalchemy import select, text
+
+from db.dependencies import engine
+from db.models import Meme, StoredImage
+from s3 import storage
+from s3.minio_client import minio_client
+
+BATCH_SIZE = 1000
+CONTENT_TYPE_HEADER = "MEMES.content_type"
+
+MEME_COLUMNS = ("id", "title", "image_url", "description", "variants", "phash", "updated_at")
+IMAGE_COLUMNS = ("object_name", "refcount", "variants")
+
+
+class Stats:
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.rows = 0
+        self.objects = 0
+        self.bytes = 0
+
+    def report(self, action: str) -> None:
+        elapsed = time.perf_counter() - self.started
+        peak_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+        print(
+            f"{action}: {self.rows} rows, {self.objects} objects, {self.bytes / 2**20:.1f} MiB "
+            f"in {elapsed:.1f} s ({self.rows / elapsed:.0f} rows/s, {self.bytes / 2**20 / elapsed:.1f} MiB/s), "
+            f"peak RSS {peak_mb:.0f} MiB",
+            file=sys.stderr
+        )
+
+
+def encode_row(row) -> dict:
+    return {key: value.isoformat() if isinstance(value, datetime) else value for key, value in row._mapping.items()}
+
+
+def add_bytes(archive: tarfile.TarFile, name: str, data: bytes) -> None:
+    info = tarfile.TarInfo(name)
+    info.size = len(data)
+    info.mtime = int(time.time())
+    archive.addfile(info, io.BytesIO(data))
+
+
+async def export_table(archive: tarfile.TarFile, conn, table: str, columns, stats: Stats) -> None:
+    result = await conn.stream(select(*columns).execution_options(yield_per=BATCH_SIZE))
+    chunk = 0
+    async for partition in result.partitions():
+        lines = b"".join(json.dumps(encode_row(row)).encode() + b"\n" for row in partition)
+        add_bytes(archive, f"{table}/{chunk:06d}.ndjson", lines)
+        stats.rows += len(partition)
+        chunk += 1
+
+
+def export_objects(archive: tarfile.TarFile, bucket: str, stats: Stats) -> None:
+    for obj in minio_client.list_objects(bucket, recursive=True):
+        response = minio_client.get_object(bucket, obj.object_name)
+        try:
+            info = tarfile.TarInfo(f"objects/{obj.object_name}")
+            info.size = obj.size
+            info.mtime = int(obj.last_modified.timestamp()) if obj.last_modified else int(time.time())
+            info.pax_headers = {CONTENT_TYPE_HEADER: response.headers.get("Content-Type", "application/octet-stream")}
+            archive.addfile(info, response)
+        finally:
+            response.close()
+            response.release_conn()
+        stats.objects += 1
+        stats.bytes += obj.size
+
+
+async def export_catalogue(path: str, bucket: str) -> None:
+    """
+    Write the whole catalogue to a tar archive.
+
+    Args:
+        path (str): The archive path, or "-" for stdout.
+        bucket (str): The bucket holding the meme images.
+    """
+    stats = Stats()
+    output = sys.stdout.buffer if path == "-" else open(path, "wb")
+    try:
+        with tarfile.open(fileobj=output, mode="w|", format=tarfile.PAX_FORMAT) as archive:
+            async with engine.connect() as conn:
+                await conn.execute(text("SET TRANSACTION ISOLATION LEVEL REPEATABLE READ READ ONLY"))
+                await export_table(archive, conn, "memes", [getattr(Meme, column) for column in MEME_COLUMNS], stats)
+                await export_table(archive, conn, "images", [getattr(StoredImage, column) for column in IMAGE_COLUMNS], stats)
+            export_objects(archive, bucket, stats)
+    finally:
+        if output is not sys.stdout.buffer:
+            output.close()
+    stats.report("export")
+
+
+def decode_record(table: str, line: bytes) -> tuple:
+    row = json.loads(line)
+    if table == "memes":
+        return (
+            row["id"], row["title"], row["image_url"], row["description"],
+            json.dumps(row["variants"]) if row["variants"] is not None else None,
+            row.get("phash"),
+            datetime.fromisoformat(row["updated_at"]),
+        )
+    return (
+        row["object_name"], row["refcount"],
+        json.dumps(row["variants"]) if row["variants"] is not None else None,
+    )
+
+
+async def import_catalogue(path: str, bucket: str, parallelism: int) -> None:
+    """
+    Load a tar archive written by `export_catalogue` into the database and bucket.
+
+    Row chunks are inserted with `COPY` in one transaction as they are read, and at most
+    `parallelism` objects are buffered and uploaded at the same time.
+
+    Args:
+        path (str): The archive path, or "-" for stdin.
+        bucket (str): The bucket to upload the meme images to.
+        parallelism (int): The maximum number of concurrent object uploads.
+    """
+    stats = Stats()
+    semaphore = asyncio.Semaphore(parallelism)
+    uploads = set()
+
+    async def upload(name: str, data: bytes, content_type: str) -> None:
+        try:
+            await storage.put_object(
+                bucket_name=bucket, object_name=name, data=io.BytesIO(data),
+                length=len(data), content_type=content_type
+            )
+        finally:
+            semaphore.release()
+
+    source = sys.stdin.buffer if path == "-" else open(path, "rb")
+    try:
+        async with engine.begin() as conn:
+            raw = (await conn.get_raw_connection()).driver_connection
+            with tarfile.open(fileobj=source, mode="r|*") as archive:
+                for member in archive:
+                    if not member.isfile():
+                        continue
+                    table, name = member.name.split("/", 1)
+                    data = archive.extractfile(member).read()
+                    if table in ("memes", "images"):
+                        records = [decode_record(table, line) for line in data.splitlines() if line]
+                        columns = MEME_COLUMNS if table == "memes" else IMAGE_COLUMNS
+                        await raw.copy_records_to_table(table, records=records, columns=list(columns))
+                        stats.rows += len(records)
+                    elif table == "objects":
+                        await semaphore.acquire()
+                        content_type = member.pax_headers.get(CONTENT_TYPE_HEADER, "application/octet-stream")
+                        task = asyncio.create_task(upload(name, data, content_type))
+                        uploads.add(task)
+                        task.add_done_callback(uploads.discard)
+                        stats.objects += 1
+                        stats.bytes += member.size
+            await asyncio.gather(*uploads)
+            await conn.execute(text(
+                "SELECT setval(pg_get_serial_sequence('memes', 'id'), coalesce(max(id), 0) + 1, false) FROM memes"
+            ))
+    finally:
+        if source is not sys.stdin.buffer:
+            source.close()
+    stats.report("import")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("action", choices=["export", "import"])
+    parser.add_argument("path", help="archive path, or - for stdout/stdin")
+    parser.add_argument("--bucket", default=os.getenv("MINIO_BUCKET_NAME", "memes"))
+    parser.add_argument("--parallelism", type=int, default=storage.MINIO_IO_WORKERS)
+    args = parser.parse_args()
+
+    if args.action == "export":
+        asyncio.run(export_catalogue(args.path, args.bucket))
+    else:
+        asyncio.run(import_catalogue(args.path, args.bucket, args.parallelism))
+
+
+if __name__ == "__main__":
+    main()
@@ -8,8 +8,11 @@ from sqlalchemy import NullPool
 from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
 from sqlalchemy.orm import sessionmaker
 
-from db.dependencies import get_session
+from cache.memes import meme_cache
+from db.dependencies import get_read_session, get_read_sessionmaker, get_session
 from db.models import Base, Meme
+from metrics.database import instrument_engine
+from private_routes.similarity import meme_index
 from s3.minio_client import minio_client
 from public_api.app.main import public_app
 from private_api.app.main import private_app
@@ -20,6 +23,7 @@ MINIO_BUCKET_NAME = "test-memes"
 os.environ["MINIO_BUCKET_NAME"] = MINIO_BUCKET_NAME
 
 engine_test = create_async_engine(DATABASE_URL, poolclass=NullPool)
+instrument_engine(engine_test)
 async_session_maker = sessionmaker(bind=engine_test, class_=AsyncSession, expire_on_commit=False)
 
 async def override_get_async_session() -> AsyncGenerator[AsyncSession, None]:
@@ -27,14 +31,22 @@ async def override_get_async_session() -> AsyncGenerator[AsyncSession, None]:
         yield session
 
 public_app.dependency_overrides[get_session] = override_get_async_session
+public_app.dependency_overrides[get_read_session] = override_get_async_session
+public_app.dependency_overrides[get_read_sessionmaker] = lambda: async_session_maker
 private_app.dependency_overrides[get_session] = override_get_async_session
+meme_index.session_factory = async_session_maker
 
 @pytest.fixture(scope="function", autouse=True)
 async def prepare_database():
     async with engine_test.begin() as conn:
         await conn.run_sync(Base.metadata.drop_all)
         await conn.run_sync(Base.metadata.create_all)
+    meme_index.reset()
         
+@pytest.fixture(scope="function", autouse=True)
+async def clear_meme_cache():
+    await meme_cache.clear()
+
 @pytest.fixture(scope="function", autouse=True)
 async def clear_minio_bucket():
     yield
@@ -1,8 +1,19 @@
 import os
 import io
+import hashlib
+import time
+import asyncio
+import tempfile
+import tracemalloc
 from httpx import AsyncClient
 import pytest
-from db.models import Meme
+from PIL import Image
+from sqlalchemy import delete, func, select, update
+from db.models import Meme, OutboxEvent, ResumableUpload
+from private_routes.outbox import drain_once
+from private_routes.resumable import sweep_expired_uploads
+from s3 import storage
+from s3.minio_client import minio_client
 from .conftest import async_session_maker
 
 @pytest.mark.asyncio
@@ -146,3 +157,882 @@ async def test_delete_meme(ac_private: AsyncClient):
     async with async_session_maker() as session:
         db_meme = await session.get(Meme, meme_id)
         assert db_meme is None
+
+@pytest.mark.asyncio
+async def test_parallel_uploads_overlap(ac_private: AsyncClient, monkeypatch):
+    """
+    Test that concurrent uploads do not block each other.
+
+    This test replaces the MinIO upload with a call that blocks for a fixed delay and
+    sends several create requests at once. Because uploads are offloaded to the storage
+    thread pool, the requests overlap and the total time stays well below the sum of
+    the individual delays. The verification queue is sized for the burst, since its
+    default depends on the number of CPUs.
+
+    Parameters:
+    - ac_private (AsyncClient): The HTTP client for sending requests to the private API.
+    - monkeypatch: The pytest fixture used to replace the MinIO upload.
+    """
+    delay = 0.3
+    uploads = 5
+
+    def slow_put_object(**kwargs):
+        time.sleep(delay)
+
+    monkeypatch.setattr(minio_client, "put_object", slow_put_object)
+    monkeypatch.setattr("private_routes.verification.slots", asyncio.Semaphore(uploads))
+
+    images = []
+    for i in range(uploads):
+        image = io.BytesIO()
+        Image.new("RGB", (64, 64), (i * 40, 0, 0)).save(image, format="PNG")
+        images.append(image.getvalue())
+
+    started = time.perf_counter()
+    responses = await asyncio.gather(*(
+        ac_private.post(
+            "/memes/",
+            params={"title": f"Parallel {i}", "description": "Overlapping upload"},
+            files={"file": (f"test_{i}.png", io.BytesIO(images[i]), "image/png")},
+            headers={"Authorization": os.getenv("AUTH_TOKEN")}
+        )
+        for i in range(uploads)
+    ))
+    elapsed = time.perf_counter() - started
+
+    assert all(response.status_code == 201 for response in responses)
+    assert elapsed < delay * uploads / 2
+
+@pytest.mark.asyncio
+async def test_streaming_upload_memory_is_bounded():
+    """
+    Test that streaming an upload keeps peak memory bounded by the part size.
+
+    This test writes an object several times larger than the multipart part size to a
+    spooled temporary file and streams it to MinIO with 'storage.put_fileobj' while
+    tracing allocations. Peak memory must stay within a small multiple of the part size
+    rather than growing with the object size.
+    """
+    part_size = storage.MINIO_PART_SIZE
+    object_size = part_size * 4 + 123
+
+    with tempfile.SpooledTemporaryFile(max_size=1024 * 1024) as spool:
+        for _ in range(object_size // (1024 * 1024)):
+            spool.write(os.urandom(1024 * 1024))
+        spool.write(os.urandom(object_size % (1024 * 1024)))
+
+        tracemalloc.start()
+        try:
+            await storage.put_fileobj("test-memes", "streamed.bin", spool)
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+
+    assert minio_client.stat_object("test-memes", "streamed.bin").size == object_size
+    assert peak < part_size * 2
+
+@pytest.mark.asyncio
+async def test_create_memes_batch(ac_private: AsyncClient):
+    """
+    Test the creation of several memes in one request.
+
+    This test sends two images and one non-image file to the '/memes/batch' endpoint.
+    It checks that the two images are created and stored in the database, and that the
+    invalid file is reported as a 415 item without affecting the others.
+
+    Parameters:
+    - ac_private (AsyncClient): The HTTP client for sending requests to the private API.
+    """
+    with open("images/test.png", "rb") as file:
+        png_content = file.read()
+    with open("images/update_mem.jpg", "rb") as file:
+        jpg_content = file.read()
+
+    response = await ac_private.post(
+        "/memes/batch",
+        data={
+            "titles": ["First", "Broken", "Second"],
+            "descriptions": ["First meme", "Not an image", "Second meme"],
+        },
+        files=[
+            ("files", ("test.png", io.BytesIO(png_content), "image/png")),
+            ("files", ("broken.png", io.BytesIO(b"not an image"), "image/png")),
+            ("files", ("update_mem.jpg", io.BytesIO(jpg_content), "image/jpg")),
+        ],
+        headers={"Authorization": os.getenv("AUTH_TOKEN")}
+    )
+
+    assert response.status_code == 200
+    items = response.json()
+    assert [item["status"] for item in items] == [201, 415, 201]
+    assert items[0]["meme"]["title"] == "First"
+    assert items[1]["meme"] is None
+    assert items[2]["meme"]["title"] == "Second"
+
+    async with async_session_maker() as session:
+        for item in (items[0], items[2]):
+            db_meme = await session.get(Meme, item["meme"]["id"])
+            assert db_meme is not None
+            assert db_meme.title == item["meme"]["title"]
+
+@pytest.mark.asyncio
+async def test_delete_memes_bulk(ac_private: AsyncClient):
+    """
+    Test the deletion of several memes in one request.
+
+    This test creates three memes, two of them sharing a title, and deletes them with
+    the '/memes/delete' endpoint, first by title and then by ID. It checks that the
+    expected IDs are reported as deleted, that the shared image is only queued for removal
+    once its last meme is gone, and that the rows and, after the outbox is drained, the
+    images are gone. Requests with out-of-range IDs or too many IDs are rejected with 422.
+
+    Parameters:
+    - ac_private (AsyncClient): The HTTP client for sending requests to the private API.
+    """
+    with open("images/test.png", "rb") as file:
+        file_content = file.read()
+
+    meme_ids = []
+    for index, title in enumerate(["Purge", "Purge", "Keep"]):
+        response = await ac_private.post(
+            "/memes/",
+            params={"title": title, "description": "Bulk delete"},
+            files={"file": (f"test_{index}.png", io.BytesIO(file_content), "image/png")},
+            headers={"Authorization": os.getenv("AUTH_TOKEN")}
+        )
+        assert response.status_code == 201
+        meme_ids.append(response.json()["id"])
+
+    response = await ac_private.post(
+        "/memes/delete",
+        json={"title": "Purge"},
+        headers={"Authorization": os.getenv("AUTH_TOKEN")}
+    )
+    assert response.status_code == 200
+    result = response.json()
+    assert sorted(result["deleted"]) == meme_ids[:2]
+    assert result["queued_objects"] == []
+
+    response = await ac_private.post(
+        "/memes/delete",
+        json={"ids": meme_ids},
+        headers={"Authorization": os.getenv("AUTH_TOKEN")}
+    )
+    assert response.status_code == 200
+    assert response.json()["deleted"] == meme_ids[2:]
+    assert len(response.json()["queued_objects"]) > 0
+
+    async with async_session_maker() as session:
+        for meme_id in meme_ids:
+            assert await session.get(Meme, meme_id) is None
+    await drain_once(async_session_maker)
+    assert list(minio_client.list_objects("test-memes")) == []
+
+    from db.schemas import BULK_DELETE_MAX_IDS
+    for ids in ([0], [2 ** 31], list(range(1, BULK_DELETE_MAX_IDS + 2))):
+        response = await ac_private.post(
+            "/memes/delete",
+            json={"ids": ids},
+            headers={"Authorization": os.getenv("AUTH_TOKEN")}
+        )
+        assert response.status_code == 422
+
+@pytest.mark.asyncio
+async def test_create_meme_variants(ac_private: AsyncClient):
+    """
+    Test that resized variants are generated for a new meme.
+
+    This test creates a meme and checks that the response lists the thumbnail and medium
+    WebP variants, that each variant object exists in the bucket next to the original,
+    and that the thumbnail is no larger than its target size.
+
+    Parameters:
+    - ac_private (AsyncClient): The HTTP client for sending requests to the private API.
+    """
+    with open("images/test.png", "rb") as file:
+        file_content = file.read()
+
+    response = await ac_private.post(
+        "/memes/",
+        params={"title": "Variants", "description": "Resized meme"},
+        files={"file": ("test.png", io.BytesIO(file_content), "image/png")},
+        headers={"Authorization": os.getenv("AUTH_TOKEN")}
+    )
+    assert response.status_code == 201
+    variants = response.json()["variants"]
+    assert {"thumb.webp", "medium.webp"} <= set(variants)
+
+    digest = hashlib.sha256(file_content).hexdigest()
+    for url in variants.values():
+        name = url.split("/")[-1]
+        assert name.startswith(f"{digest}.")
+        assert minio_client.stat_object("test-memes", name).size > 0
+
+    thumb = minio_client.get_object("test-memes", variants["thumb.webp"].split("/")[-1])
+    try:
+        assert max(Image.open(io.BytesIO(thumb.read())).size) <= 320
+    finally:
+        thumb.close()
+        thumb.release_conn()
+
+@pytest.mark.asyncio
+async def test_duplicate_images_are_stored_once(ac_private: AsyncClient):
+    """
+    Test content-addressed deduplication of meme images.
+
+    This test creates two memes with the same image and checks that both reference the
+    same object, which is stored only once. It then deletes the memes one by one and
+    verifies that the object is kept while it is still referenced and removed together
+    with its variants by the outbox workers after the last reference is gone.
+
+    Parameters:
+    - ac_private (AsyncClient): The HTTP client for sending requests to the private API.
+    """
+    with open("images/test.png", "rb") as file:
+        file_content = file.read()
+    digest = hashlib.sha256(file_content).hexdigest()
+
+    memes = []
+    for title in ("Original", "Repost"):
+        response = await ac_private.post(
+            "/memes/",
+            params={"title": title, "description": "Same picture"},
+            files={"file": ("test.png", io.BytesIO(file_content), "image/png")},
+            headers={"Authorization": os.getenv("AUTH_TOKEN")}
+        )
+        assert response.status_code == 201
+        memes.append(response.json())
+
+    assert memes[0]["image_url"] == memes[1]["image_url"] == f"http://test-memes/{digest}"
+    assert memes[0]["variants"] == memes[1]["variants"]
+    assert [obj.object_name for obj in minio_client.list_objects("test-memes")].count(digest) == 1
+
+    response = await ac_private.delete(f"/memes/{memes[0]['id']}", headers={"Authorization": os.getenv("AUTH_TOKEN")})
+    assert response.status_code == 200
+    assert minio_client.stat_object("test-memes", digest).size == len(file_content)
+
+    response = await ac_private.delete(f"/memes/{memes[1]['id']}", headers={"Authorization": os.getenv("AUTH_TOKEN")})
+    assert response.status_code == 200
+    await drain_once(async_session_maker)
+    assert list(minio_client.list_objects("test-memes")) == []
+
+@pytest.mark.asyncio
+async def test_presigned_upload(ac_private: AsyncClient):
+    """
+    Test the direct-to-S3 upload flow.
+
+    This test requests a presigned PUT URL, uploads the image straight to MinIO with it,
+    and finalizes the upload. It checks that the meme is created, that the object is moved
+    from its pending name to its permanent name with the sniffed content type, and that
+    the same upload cannot be finalized twice.
+
+    Parameters:
+    - ac_private (AsyncClient): The HTTP client for sending requests to the private API.
+    """
+    with open("images/test.png", "rb") as file:
+        file_content = file.read()
+
+    response = await ac_private.post("/memes/uploads", headers={"Authorization": os.getenv("AUTH_TOKEN")})
+    assert response.status_code == 201
+    upload = response.json()
+
+    async with AsyncClient() as s3_client:
+        put_response = await s3_client.put(upload["url"], content=file_content)
+    assert put_response.status_code == 200
+
+    response = await ac_private.post(
+        f"/memes/uploads/{upload['upload_id']}",
+        params={"title": "Direct", "description": "Uploaded to S3"},
+        headers={"Authorization": os.getenv("AUTH_TOKEN")}
+    )
+    assert response.status_code == 201
+    meme = response.json()
+    assert meme["image_url"] == f"http://test-memes/{upload['upload_id']}"
+
+    stat = minio_client.stat_object("test-memes", upload["upload_id"])
+    assert stat.size == len(file_content)
+    assert stat.content_type == "image/png"
+    assert [obj.object_name for obj in minio_client.list_objects("test-memes")] == [upload["upload_id"]]
+
+    response = await ac_private.post(
+        f"/memes/uploads/{upload['upload_id']}",
+        params={"title": "Direct", "description": "Uploaded to S3"},
+        headers={"Authorization": os.getenv("AUTH_TOKEN")}
+    )
+    assert response.status_code == 404
+
+@pytest.mark.asyncio
+async def test_presigned_upload_rejects_non_images(ac_private: AsyncClient):
+    """
+    Test that finalizing a direct upload of a non-image fails.
+
+    This test uploads plain text through a presigned URL and checks that finalizing it
+    returns 415, creates no meme and removes the pending object.
+
+    Parameters:
+    - ac_private (AsyncClient): The HTTP client for sending requests to the private API.
+    """
+    response = await ac_private.post("/memes/uploads", headers={"Authorization": os.getenv("AUTH_TOKEN")})
+    upload = response.json()
+
+    async with AsyncClient() as s3_client:
+        put_response = await s3_client.put(upload["url"], content=b"definitely not an image")
+    assert put_response.status_code == 200
+
+    response = await ac_private.post(
+        f"/memes/uploads/{upload['upload_id']}",
+        params={"title": "Broken", "description": "Not a picture"},
+        headers={"Authorization": os.getenv("AUTH_TOKEN")}
+    )
+    assert response.status_code == 415
+    assert list(minio_client.list_objects("test-memes")) == []
+
+    async with async_session_maker() as session:
+        assert (await session.execute(select(Meme))).scalars().all() == []
+
+@pytest.mark.asyncio
+async def test_abandoned_pending_uploads_are_swept(ac_private: AsyncClient):
+    """
+    Test that pending objects of uploads that were never finalized are removed.
+
+    This test uploads two images through presigned URLs without finalizing them, one of
+    them standing in for an assembled resumable upload that is still recorded. It checks
+    that nothing is removed before the pending objects expire, that afterwards only the
+    direct upload is removed, and that an expired direct upload can no longer be finalized.
+
+    Parameters:
+    - ac_private (AsyncClient): The HTTP client for sending requests to the private API.
+    """
+    from fastapi import HTTPException
+    from datetime import datetime, timedelta, timezone
+    from private_routes.resumable import sweep_pending_uploads
+    from private_routes.uploads import finalize_upload, pending_object_name
+
+    upload_ids = []
+    async with AsyncClient() as s3_client:
+        for _ in range(2):
+            response = await ac_private.post("/memes/uploads", headers={"Authorization": os.getenv("AUTH_TOKEN")})
+            upload = response.json()
+            put_response = await s3_client.put(upload["url"], content=b"never finalized")
+            assert put_response.status_code == 200
+            upload_ids.append(upload["upload_id"])
+    direct_id, resumable_id = upload_ids
+
+    async with async_session_maker() as session:
+        session.add(ResumableUpload(
+            id=resumable_id,
+            bucket="test-memes",
+            s3_upload_id="assembled",
+            size=15,
+            chunk_size=15,
+            expires_at=datetime.now(timezone.utc) + timedelta(hours=1)
+        ))
+        await session.commit()
+
+    assert await sweep_pending_uploads("test-memes", async_session_maker) == 0
+    with pytest.raises(HTTPException) as exc_info:
+        await finalize_upload("test-memes", direct_id, expiry=0)
+    assert exc_info.value.status_code == 404
+
+    assert await sweep_pending_uploads("test-memes", async_session_maker, expiry=0) == 1
+    assert [obj.object_name for obj in minio_client.list_objects("test-memes")] == [pending_object_name(resumable_id)]
+
+@pytest.mark.asyncio
+async def test_verification_keeps_read_latency_flat(ac_public: AsyncClient, ac_private: AsyncClient, monkeypatch):
+    """
+    Test that image verification does not stall the event loop.
+
+    This test measures how late the event loop wakes up a sleeping task, first on an idle
+    loop and then while cached memes are read during a burst of large image uploads.
+    Storage is replaced with a stub so the burst only exercises request parsing and
+    verification. Verification runs in the process pool, so the loop lag during the burst
+    must stay close to the idle one; decoding the images on the loop would stall it for
+    tens of milliseconds per image.
+
+    Parameters:
+    - ac_public (AsyncClient): The HTTP client for sending requests to the public API.
+    - ac_private (AsyncClient): The HTTP client for sending requests to the private API.
+    - monkeypatch: The pytest fixture used to replace image storage.
+    """
+    async def fake_store_image(session, bucket, file):
+        return f"http://{bucket}/{file.filename}", {}
+
+    monkeypatch.setattr("private_routes.media.store_image", fake_store_image)
+
+    async with async_session_maker() as session:
+        meme = Meme(title="Read me", image_url="http://test-memes/read.png", description="Hot path")
+        session.add(meme)
+        await session.commit()
+    await ac_public.get(f"/memes/{meme.id}")
+
+    async def loop_lag(done: asyncio.Event, interval: float = 0.005):
+        lags = []
+        while not done.is_set():
+            started = time.perf_counter()
+            await asyncio.sleep(interval)
+            lags.append(time.perf_counter() - started - interval)
+        return sorted(lags)[int(len(lags) * 0.9)]
+
+    async def read_memes(count: int):
+        for _ in range(count):
+            response = await ac_public.get(f"/memes/{meme.id}")
+            assert response.status_code == 200
+            await asyncio.sleep(0.001)
+
+    image = Image.frombytes("RGB", (1500, 1500), os.urandom(1500 * 1500 * 3))
+    buffer = io.BytesIO()
+    image.save(buffer, format="PNG", compress_level=1)
+    file_content = buffer.getvalue()
+
+    async def upload(index: int):
+        return await ac_private.post(
+            "/memes/",
+            params={"title": f"Burst {index}", "description": "Large image"},
+            files={"file": (f"burst-{index}.png", io.BytesIO(file_content), "image/png")},
+            headers={"Authorization": os.getenv("AUTH_TOKEN")}
+        )
+
+    async def measure(*work):
+        done = asyncio.Event()
+        lag = asyncio.create_task(loop_lag(done))
+        results = await asyncio.gather(*work)
+        done.set()
+        return await lag, results
+
+    idle_lag, _ = await measure(read_memes(100))
+    burst_lag, results = await measure(read_memes(100), *(upload(index) for index in range(16)))
+    responses = results[1:]
+
+    assert all(response.status_code in (201, 503) for response in responses)
+    assert any(response.status_code == 201 for response in responses)
+    assert burst_lag <= idle_lag + 0.05
+
+@pytest.mark.asyncio
+async def test_verification_limits(ac_private: AsyncClient, monkeypatch):
+    """
+    Test the limits of the image verification pool.
+
+    This test checks that an image exceeding the dimension limit is rejected with 413,
+    and that uploads are turned away with 503 and a `Retry-After` header while the
+    verification pool is at capacity.
+
+    Parameters:
+    - ac_private (AsyncClient): The HTTP client for sending requests to the private API.
+    - monkeypatch: The pytest fixture used to lower the limits.
+    """
+    with open("images/test.png", "rb") as file:
+        file_content = file.read()
+
+    async def upload():
+        return await ac_private.post(
+            "/memes/",
+            params={"title": "Limited", "description": "Too big"},
+            files={"file": ("test.png", io.BytesIO(file_content), "image/png")},
+            headers={"Authorization": os.getenv("AUTH_TOKEN")}
+        )
+
+    monkeypatch.setattr("private_routes.verification.VERIFY_MAX_DIMENSION", 10)
+    assert (await upload()).status_code == 413
+
+    monkeypatch.setattr("private_routes.verification.slots", asyncio.Semaphore(0))
+    response = await upload()
+    assert response.status_code == 503
+    assert response.headers["retry-after"] == "1"
+
+@pytest.mark.asyncio
+async def test_verification_timeout_and_batch_waiting(ac_private: AsyncClient, monkeypatch):
+    """
+    Test that slow verifications are cut off and that batch items wait for the pool.
+
+    This test lets verification time out at once and checks that the upload fails with
+    503, that the pool was replaced with a fresh one whose slot is free again, and that
+    the next upload is verified normally. It then leaves a single slot in the pool and
+    checks that every item of a batch uploaded with a higher parallelism still succeeds,
+    because batch items wait for a slot instead of being turned away.
+
+    Parameters:
+    - ac_private (AsyncClient): The HTTP client for sending requests to the private API.
+    - monkeypatch: The pytest fixture used to lower the timeout and the number of slots.
+    """
+    from private_routes import verification
+
+    headers = {"Authorization": os.getenv("AUTH_TOKEN")}
+    with open("images/test.png", "rb") as file:
+        file_content = file.read()
+
+    async def upload():
+        return await ac_private.post(
+            "/memes/",
+            params={"title": "Slow", "description": "Takes a while"},
+            files={"file": ("test.png", io.BytesIO(file_content), "image/png")},
+            headers=headers
+        )
+
+    stuck = verification.pool.executor
+    monkeypatch.setattr("private_routes.verification.VERIFY_TIMEOUT", 0)
+    response = await upload()
+    assert response.status_code == 503
+    assert response.json()["detail"] == "Image took too long to verify"
+    assert verification.pool.executor is not stuck
+    assert not verification.slots.locked()
+
+    monkeypatch.setattr("private_routes.verification.VERIFY_TIMEOUT", 30)
+    assert (await upload()).status_code == 201
+
+    monkeypatch.setattr("private_routes.verification.slots", asyncio.Semaphore(1))
+    response = await ac_private.post(
+        "/memes/batch",
+        params={"parallelism": 3},
+        files=[("files", (f"test-{n}.png", io.BytesIO(file_content), "image/png")) for n in range(3)],
+        data={"titles": ["A", "B", "C"], "descriptions": ["a", "b", "c"]},
+        headers=headers
+    )
+    assert response.status_code == 200
+    assert [item["status"] for item in response.json()] == [201, 201, 201]
+
+@pytest.mark.asyncio
+async def test_variant_failure_cleans_up(ac_private: AsyncClient, monkeypatch):
+    """
+    Test that an image whose variants cannot be rendered is rejected without leftovers.
+
+    Verification does not decode every image completely, so rendering the variants can
+    still fail. This test makes the render worker fail and checks that the upload is
+    rejected with 415, and that neither the original stored before rendering nor any
+    meme or image row is left behind.
+
+    Parameters:
+    - ac_private (AsyncClient): The HTTP client for sending requests to the private API.
+    - monkeypatch: The pytest fixture used to make rendering fail.
+    """
+    from db.models import StoredImage
+    from private_routes import variants
+
+    async def broken_run(timeout, func, *args):
+        raise OSError("image file is truncated")
+
+    monkeypatch.setattr(variants.pool, "run", broken_run)
+    with open("images/test.png", "rb") as file:
+        response = await ac_private.post(
+            "/memes/",
+            params={"title": "Truncated", "description": "Cannot be resized"},
+            files={"file": ("test.png", file, "image/png")},
+            headers={"Authorization": os.getenv("AUTH_TOKEN")}
+        )
+    assert response.status_code == 415
+    assert list(minio_client.list_objects("test-memes", recursive=True)) == []
+    async with async_session_maker() as session:
+        assert (await session.execute(select(Meme))).scalars().all() == []
+        assert (await session.execute(select(StoredImage))).scalars().all() == []
+
+@pytest.mark.asyncio
+async def test_outbox_removes_objects_in_background(ac_private: AsyncClient, monkeypatch):
+    """
+    Test that image removal goes through the transactional outbox.
+
+    This test deletes a meme and checks that its objects are still stored and a removal
+    event per object was committed with the delete. A failed drain must keep the events
+    and schedule a retry with backoff; a successful drain must remove the objects and
+    the events. Finally it checks that re-uploading an image whose removal is pending
+    cancels the removal instead of losing the object.
+
+    Parameters:
+    - ac_private (AsyncClient): The HTTP client for sending requests to the private API.
+    - monkeypatch: The pytest fixture used to make removals fail.
+    """
+    with open("images/test.png", "rb") as file:
+        file_content = file.read()
+
+    async def create():
+        response = await ac_private.post(
+            "/memes/",
+            params={"title": "Outbox", "description": "Removed later"},
+            files={"file": ("test.png", io.BytesIO(file_content), "image/png")},
+            headers={"Authorization": os.getenv("AUTH_TOKEN")}
+        )
+        assert response.status_code == 201
+        return response.json()
+
+    meme = await create()
+    stored = sorted(obj.object_name for obj in minio_client.list_objects("test-memes"))
+    assert (await ac_private.delete(f"/memes/{meme['id']}", headers={"Authorization": os.getenv("AUTH_TOKEN")})).status_code == 200
+    assert sorted(obj.object_name for obj in minio_client.list_objects("test-memes")) == stored
+
+    async with async_session_maker() as session:
+        events = (await session.execute(select(OutboxEvent))).scalars().all()
+    assert sorted(event.object_name for event in events) == stored
+
+    async def failing_remove_objects(bucket_name, object_names, batch_size=1000):
+        return list(object_names)
+
+    with monkeypatch.context() as patch:
+        patch.setattr(storage, "remove_objects", failing_remove_objects)
+        assert await drain_once(async_session_maker) == len(stored)
+    async with async_session_maker() as session:
+        events = (await session.execute(select(OutboxEvent))).scalars().all()
+    assert all(event.attempts == 1 and event.last_error for event in events)
+    assert await drain_once(async_session_maker) == 0
+
+    async with async_session_maker() as session:
+        await session.execute(update(OutboxEvent).values(available_at=func.now()))
+        await session.commit()
+    assert await drain_once(async_session_maker) == len(stored)
+    assert list(minio_client.list_objects("test-memes")) == []
+    async with async_session_maker() as session:
+        assert (await session.execute(select(OutboxEvent))).scalars().all() == []
+
+    meme = await create()
+    assert (await ac_private.delete(f"/memes/{meme['id']}", headers={"Authorization": os.getenv("AUTH_TOKEN")})).status_code == 200
+    await create()
+    await drain_once(async_session_maker)
+    assert sorted(obj.object_name for obj in minio_client.list_objects("test-memes")) == stored
+
+@pytest.mark.asyncio
+async def test_near_duplicate_detection(ac_private: AsyncClient):
+    """
+    Test perceptual-hash near-duplicate detection.
+
+    This test creates a meme, then uploads a resized and recompressed JPEG copy of its
+    image with 'reject_duplicates' and checks that it is refused with 409 naming the
+    original. Uploaded without the flag, the copy is accepted, and an unrelated image is
+    accepted even with the flag. Finally it checks that '/memes/{meme_id}/similar' lists
+    the copy but not the unrelated meme, and stops listing the copy once it is deleted.
+
+    Parameters:
+    - ac_private (AsyncClient): The HTTP client for sending requests to the private API.
+    """
+    headers = {"Authorization": os.getenv("AUTH_TOKEN")}
+    with open("images/test.png", "rb") as file:
+        original = file.read()
+    with Image.open(io.BytesIO(original)) as image:
+        copy = image.convert("RGB").resize((image.width * 9 // 10, image.height * 9 // 10))
+        buffer = io.BytesIO()
+        copy.save(buffer, format="JPEG", quality=60)
+        recompressed = buffer.getvalue()
+    with open("images/update_mem.jpg", "rb") as file:
+        unrelated = file.read()
+
+    async def create(title, content, content_type, reject_duplicates):
+        return await ac_private.post(
+            "/memes/",
+            params={"title": title, "description": "Lookalike", "reject_duplicates": reject_duplicates},
+            files={"file": ("meme", io.BytesIO(content), content_type)},
+            headers=headers
+        )
+
+    response = await create("Original", original, "image/png", False)
+    assert response.status_code == 201
+    original_id = response.json()["id"]
+
+    response = await create("Repost", recompressed, "image/jpeg", True)
+    assert response.status_code == 409
+    assert str(original_id) in response.json()["detail"]
+
+    response = await create("Repost", recompressed, "image/jpeg", False)
+    assert response.status_code == 201
+    copy_id = response.json()["id"]
+    response = await create("Other", unrelated, "image/jpeg", True)
+    assert response.status_code == 201
+    other_id = response.json()["id"]
+
+    async with async_session_maker() as session:
+        phashes = dict((await session.execute(select(Meme.id, Meme.phash))).all())
+    assert all(phash is not None for phash in phashes.values())
+
+    response = await ac_private.get(f"/memes/{original_id}/similar", headers=headers)
+    assert response.status_code == 200
+    similar = response.json()
+    assert [match["meme"]["id"] for match in similar] == [copy_id]
+    assert similar[0]["distance"] <= 4
+    assert other_id not in [match["meme"]["id"] for match in similar]
+
+    await ac_private.delete(f"/memes/{copy_id}", headers=headers)
+    assert (await ac_private.get(f"/memes/{original_id}/similar", headers=headers)).json() == []
+    assert (await ac_private.get("/memes/999999/similar", headers=headers)).status_code == 404
+
+@pytest.mark.asyncio
+async def test_similarity_index_staleness(ac_private: AsyncClient, monkeypatch):
+    """
+    Test that a stale similarity index neither hides duplicates nor blocks requests.
+
+    This test loads the index, then deletes the closest lookalikes behind its back, as
+    another process would, and checks that the duplicate check still finds the live
+    near-duplicate further down. It then lets the index expire and checks that the full
+    reload runs in the background, keeps a meme added by this process meanwhile, and
+    drops the deleted memes. Finally it checks that the similarity search, a read, does
+    not set the last-write cookie.
+
+    Parameters:
+    - ac_private (AsyncClient): The HTTP client for sending requests to the private API.
+    - monkeypatch: The pytest fixture for shortening the index lifetime.
+    """
+    from private_routes import similarity
+    from private_routes.similarity import find_duplicates, meme_index
+
+    async with async_session_maker() as session:
+        stale = [Meme(title="Stale", description="Gone soon", image_url="http://test-memes/stale", phash=0) for _ in range(5)]
+        live = Meme(title="Live", description="Still here", image_url="http://test-memes/live", phash=0b111)
+        session.add_all(stale + [live])
+        await session.commit()
+        await meme_index.refresh(session)
+        await session.execute(delete(Meme).where(Meme.id.in_([meme.id for meme in stale])))
+        await session.commit()
+
+        assert await find_duplicates(session, {0: 0}) == {0: live.id}
+
+        monkeypatch.setattr(similarity, "SIMILARITY_INDEX_TTL", 0)
+        index = await meme_index.refresh(session)
+        assert meme_index.reloading is not None
+        assert len(index) == 6
+        meme_index.add(live.id + 1000, 0)
+        await meme_index.reloading
+    assert meme_index.index is not index
+    assert [meme_id for meme_id, _ in meme_index.index.search(0)] == [live.id + 1000, live.id]
+
+    response = await ac_private.get(f"/memes/{live.id}/similar", headers={"Authorization": os.getenv("AUTH_TOKEN")})
+    assert response.status_code == 200
+    assert "last_write" not in response.cookies
+
+@pytest.mark.asyncio
+async def test_resumable_upload(ac_private: AsyncClient, monkeypatch):
+    """
+    Test resumable chunked uploads backed by a MinIO multipart upload.
+
+    This test starts a resumable upload of a two-chunk PNG and sends the second chunk
+    first. It checks that the progress lists only that chunk, that completing too early
+    fails with 409, and that misaligned offsets and wrong chunk lengths are rejected.
+    It then sends the first chunk again in parallel with a repeat of the second,
+    completes the upload and verifies the meme and the assembled object. Finally it
+    checks that aborted uploads and uploads swept after expiring are gone.
+
+    Parameters:
+    - ac_private (AsyncClient): The HTTP client for sending requests to the private API.
+    - monkeypatch: The pytest fixture used to lower the chunk size to the S3 minimum.
+    """
+    monkeypatch.setattr("private_routes.resumable.RESUMABLE_CHUNK_SIZE", 5 * 1024 * 1024)
+    headers = {"Authorization": os.getenv("AUTH_TOKEN")}
+    image = Image.frombytes("RGB", (1400, 1400), os.urandom(1400 * 1400 * 3))
+    buffer = io.BytesIO()
+    image.save(buffer, format="PNG", compress_level=0)
+    data = buffer.getvalue()
+
+    response = await ac_private.post("/memes/resumable", params={"size": len(data)}, headers=headers)
+    assert response.status_code == 201
+    upload = response.json()
+    chunk_size, url = upload["chunk_size"], f"/memes/resumable/{upload['upload_id']}"
+    assert upload["parts"] == 2 and chunk_size < len(data)
+
+    async def patch(offset, body):
+        return await ac_private.patch(url, content=body, headers={**headers, "Upload-Offset": str(offset)})
+
+    response = await patch(chunk_size, data[chunk_size:])
+    assert response.status_code == 204
+    assert response.headers["upload-offset"] == str(len(data))
+    assert (await ac_private.get(url, headers=headers)).json()["received_parts"] == [2]
+
+    complete_params = {"title": "Large", "description": "Sent in chunks"}
+    assert (await ac_private.post(f"{url}/complete", params=complete_params, headers=headers)).status_code == 409
+    assert (await patch(1, data[1:chunk_size + 1])).status_code == 409
+    assert (await patch(0, data[:chunk_size - 1])).status_code == 422
+
+    responses = await asyncio.gather(patch(0, data[:chunk_size]), patch(chunk_size, data[chunk_size:]))
+    assert [response.status_code for response in responses] == [204, 204]
+    assert (await ac_private.get(url, headers=headers)).json()["received_parts"] == [1, 2]
+
+    response = await ac_private.post(f"{url}/complete", params=complete_params, headers=headers)
+    assert response.status_code == 201
+    meme = response.json()
+    assert meme["title"] == "Large"
+    stat = minio_client.stat_object("test-memes", meme["image_url"].split("/")[-1])
+    assert stat.size == len(data)
+    assert stat.content_type == "image/png"
+    assert (await ac_private.get(url, headers=headers)).status_code == 404
+
+    response = await ac_private.post("/memes/resumable", params={"size": len(data)}, headers=headers)
+    aborted_url = f"/memes/resumable/{response.json()['upload_id']}"
+    assert (await ac_private.delete(aborted_url, headers=headers)).status_code == 204
+    assert (await ac_private.get(aborted_url, headers=headers)).status_code == 404
+
+    response = await ac_private.post("/memes/resumable", params={"size": len(data)}, headers=headers)
+    expired_id = response.json()["upload_id"]
+    async with async_session_maker() as session:
+        await session.execute(
+            update(ResumableUpload).where(ResumableUpload.id == expired_id).values(expires_at=func.now())
+        )
+        await session.commit()
+    assert await sweep_expired_uploads(async_session_maker) == 1
+    assert (await ac_private.get(f"/memes/resumable/{expired_id}", headers=headers)).status_code == 404
+    async with async_session_maker() as session:
+        assert await session.get(ResumableUpload, expired_id) is None
+
+@pytest.mark.asyncio
+async def test_catalogue_round_trip(ac_private: AsyncClient, monkeypatch, tmp_path):
+    """
+    Test that a catalogue export imports back into an empty database and bucket unchanged.
+
+    This test creates two memes with different images, exports the catalogue to a tar
+    archive, empties the database and the bucket, and imports the archive. It checks
+    that the meme and image rows, including variants and perceptual hashes, and the
+    objects with their content types are the same as before, and that new memes get
+    IDs after the imported ones.
+
+    Parameters:
+    - ac_private (AsyncClient): The HTTP client for sending requests to the private API.
+    - monkeypatch: The pytest fixture for pointing the script at the test database.
+    - tmp_path: The pytest fixture providing a directory for the archive.
+    """
+    from scripts import catalogue
+    from db.models import Base, StoredImage
+    from tests.conftest import engine_test
+
+    monkeypatch.setattr(catalogue, "engine", engine_test)
+    headers = {"Authorization": os.getenv("AUTH_TOKEN")}
+    for title, path, content_type in [("PNG", "images/test.png", "image/png"), ("JPEG", "images/update_mem.jpg", "image/jpeg")]:
+        with open(path, "rb") as file:
+            response = await ac_private.post(
+                "/memes/",
+                params={"title": title, "description": "Exported"},
+                files={"file": (path, file, content_type)},
+                headers=headers
+            )
+        assert response.status_code == 201
+
+    async def snapshot():
+        async with async_session_maker() as session:
+            memes = (await session.execute(
+                select(*(getattr(Meme, column) for column in catalogue.MEME_COLUMNS)).order_by(Meme.id)
+            )).all()
+            images = (await session.execute(
+                select(*(getattr(StoredImage, column) for column in catalogue.IMAGE_COLUMNS)).order_by(StoredImage.object_name)
+            )).all()
+        objects = {}
+        for obj in minio_client.list_objects("test-memes", recursive=True):
+            response = minio_client.get_object("test-memes", obj.object_name)
+            try:
+                objects[obj.object_name] = (response.read(), response.headers.get("Content-Type"))
+            finally:
+                response.close()
+                response.release_conn()
+        return memes, images, objects
+
+    before = await snapshot()
+    assert len(before[0]) == 2 and all(meme.phash is not None and meme.variants for meme in before[0])
+    assert len(before[2]) > 2
+
+    archive = str(tmp_path / "catalogue.tar")
+    await catalogue.export_catalogue(archive, "test-memes")
+
+    async with engine_test.begin() as conn:
+        await conn.run_sync(Base.metadata.drop_all)
+        await conn.run_sync(Base.metadata.create_all)
+    for name in before[2]:
+        minio_client.remove_object("test-memes", name)
+    assert await snapshot() == ([], [], {})
+
+    await catalogue.import_catalogue(archive, "test-memes", parallelism=4)
+    assert await snapshot() == before
+
+    async with async_session_maker() as session:
+        meme = Meme(title="After import", description="New", image_url="http://test-memes/new")
+        session.add(meme)
+        await session.commit()
+    assert meme.id > max(row.id for row in before[0])